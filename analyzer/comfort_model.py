@@ -4,9 +4,25 @@
 """
 
 import numpy as np
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Tuple
 
+from common.reading import COMFORT_DTYPE, ComfortResult
+from .running_stats import RollingStats, RunningStats
+
+# 参与统计的数据类型
+STAT_FIELDS = ("temperature", "humidity", "pressure")
+
+# 舒适度等级：(分数下限, 等级, 中文名)，按分数从高到低排列
+COMFORT_LEVELS = [
+    (80, "very_comfortable", "非常舒适"),
+    (60, "comfortable", "舒适"),
+    (40, "moderate", "一般"),
+    (20, "uncomfortable", "不舒适"),
+    (float("-inf"), "very_uncomfortable", "非常不舒适"),
+]
+
 
 class ComfortModel:
     """舒适度计算模型"""
@@ -22,11 +38,14 @@ class ComfortModel:
     SHANGHAI_YEARLY_TEMPS = [6.8, 8.2, 12.1, 17.3, 22.1, 25.6, 29.5, 29.2, 25.6, 20.6, 15.0, 9.3]
     
     def __init__(self):
-        self.history_data = []
         self.max_history = 1000
+        self.history_data = deque(maxlen=self.max_history)
+        # 流式统计：全局累计 + 最近 max_history 条的滑动窗口
+        self.global_stats = {field: RunningStats() for field in STAT_FIELDS}
+        self.window_stats = {field: RollingStats(self.max_history) for field in STAT_FIELDS}
         
-    def calculate_comfort_index(self, temp: float, humidity: float, pressure: float) -> Dict:
-        """计算综合舒适度指数"""
+    def calculate_comfort_index(self, temp: float, humidity: float, pressure: float) -> ComfortResult:
+        """计算综合舒适度指数（返回的 ComfortResult 支持 dict 式访问）"""
         # THI（温湿指数）
         thi = 0.8 * temp + humidity * 0.01 * (0.8 * temp - 14.3) + 46.3
         
@@ -34,7 +53,8 @@ class ComfortModel:
         feels_like = temp + 0.3 * humidity * 0.01 - 2.7
         
         # 压力舒适度
-        current_month = datetime.now().month - 1
+        now = datetime.now()
+        current_month = now.month - 1
         pressure_ref = self.SHANGHAI_REFERENCE["pressure"][current_month]
         pressure_comfort = 100 - abs(pressure - pressure_ref) * 0.5
         
@@ -46,33 +66,69 @@ class ComfortModel:
         )
         
         # 舒适度等级
-        if comfort_score >= 80:
-            level = "very_comfortable"
-            level_cn = "非常舒适"
-        elif comfort_score >= 60:
-            level = "comfortable"
-            level_cn = "舒适"
-        elif comfort_score >= 40:
-            level = "moderate"
-            level_cn = "一般"
-        elif comfort_score >= 20:
-            level = "uncomfortable"
-            level_cn = "不舒适"
-        else:
-            level = "very_uncomfortable"
-            level_cn = "非常不舒适"
+        for threshold, level, level_cn in COMFORT_LEVELS:
+            if comfort_score >= threshold:
+                break
         
-        return {
-            "temperature": temp,
-            "humidity": humidity,
-            "pressure": pressure,
-            "thi": round(thi, 1),
-            "feels_like": round(feels_like, 1),
-            "comfort_score": round(comfort_score, 1),
-            "comfort_level": level,
-            "comfort_level_cn": level_cn,
-            "timestamp": datetime.now().isoformat()
-        }
+        return ComfortResult(
+            temperature=temp,
+            humidity=humidity,
+            pressure=pressure,
+            thi=round(thi, 1),
+            feels_like=round(feels_like, 1),
+            comfort_score=round(comfort_score, 1),
+            comfort_level=level,
+            comfort_level_cn=level_cn,
+            timestamp=now.isoformat()
+        )
+    
+    def calculate_comfort_batch(self, temps, hums, pressures, months=None) -> np.ndarray:
+        """批量计算舒适度，返回 COMFORT_DTYPE 结构化数组
+        
+        months 为 1-12 的月份（数组或标量），默认取当前月份；
+        各数值与 calculate_comfort_index 逐条计算的结果一致。
+        """
+        temps = np.asarray(temps, dtype=np.float64)
+        hums = np.asarray(hums, dtype=np.float64)
+        pressures = np.asarray(pressures, dtype=np.float64)
+        if months is None:
+            months = datetime.now().month
+        month_idx = np.clip(np.asarray(months, dtype=np.int64), 1, 12) - 1
+        temps, hums, pressures, month_idx = np.broadcast_arrays(temps, hums, pressures, month_idx)
+        
+        thi = 0.8 * temps + hums * 0.01 * (0.8 * temps - 14.3) + 46.3
+        feels_like = temps + 0.3 * hums * 0.01 - 2.7
+        
+        # 温度评分（18-26℃为最佳）
+        temp_dev = np.maximum(18 - temps, 0) + np.maximum(temps - 26, 0)
+        temp_score = np.clip(100 - temp_dev * 5, 0, 100)
+        # 湿度评分（40-60%为最佳）
+        hum_score = np.select(
+            [hums < 40, hums > 60],
+            [100 - (40 - hums) * 2, 100 - (hums - 60) * 1.5],
+            default=100
+        )
+        hum_score = np.maximum(hum_score, 0)
+        # 压力舒适度
+        pressure_ref = np.asarray(self.SHANGHAI_REFERENCE["pressure"])[month_idx]
+        pressure_comfort = np.minimum(100 - np.abs(pressures - pressure_ref) * 0.5, 100)
+        
+        comfort_score = 0.5 * temp_score + 0.3 * hum_score + 0.2 * pressure_comfort
+        
+        # 舒适度等级
+        conditions = [comfort_score >= threshold for threshold, _, _ in COMFORT_LEVELS[:-1]]
+        level_idx = np.select(conditions, np.arange(len(conditions)), default=len(COMFORT_LEVELS) - 1)
+        
+        result = np.empty(temps.shape, dtype=COMFORT_DTYPE)
+        result["temperature"] = temps
+        result["humidity"] = hums
+        result["pressure"] = pressures
+        result["thi"] = np.round(thi, 1)
+        result["feels_like"] = np.round(feels_like, 1)
+        result["comfort_score"] = np.round(comfort_score, 1)
+        result["comfort_level"] = np.array([level for _, level, _ in COMFORT_LEVELS])[level_idx]
+        result["comfort_level_cn"] = np.array([cn for _, _, cn in COMFORT_LEVELS])[level_idx]
+        return result
     
     def _temp_score(self, temp: float) -> float:
         """温度评分（18-26℃为最佳）"""
@@ -93,34 +149,45 @@ class ComfortModel:
             return max(0, 100 - (humidity - 60) * 1.5)
     
     def add_historical_data(self, data: Dict):
-        """添加历史数据"""
+        """添加历史数据（同时更新流式统计，O(1)）"""
         self.history_data.append(data)
-        if len(self.history_data) > self.max_history:
-            self.history_data = self.history_data[-self.max_history:]
+        for field in STAT_FIELDS:
+            value = data.get(field, 0)
+            # 值为 0 视为无效数据，只占用窗口位置
+            if value:
+                value = float(value)
+                self.global_stats[field].add(value)
+                self.window_stats[field].add(value)
+            else:
+                self.window_stats[field].add(None)
     
     def get_statistics(self) -> Dict:
-        """获取统计信息"""
-        if not self.history_data:
-            return {}
-        
-        temps = [d.get("temperature", 0) for d in self.history_data]
-        hums = [d.get("humidity", 0) for d in self.history_data]
-        pressures = [d.get("pressure", 0) for d in self.history_data]
+        """获取统计信息（O(1)）
         
-        # 过滤有效数据
-        temps = [t for t in temps if t != 0]
-        hums = [h for h in hums if h != 0]
-        pressures = [p for p in pressures if p != 0]
+        *_avg/*_std/*_min/*_max 为最近 max_history 条的统计，
+        "global" 为启动以来全部数据的累计统计。
+        """
+        data_count = len(self.window_stats["temperature"])
+        if not data_count:
+            return {}
         
-        return {
-            "temperature_avg": np.mean(temps) if temps else 0,
-            "temperature_std": np.std(temps) if temps else 0,
-            "humidity_avg": np.mean(hums) if hums else 0,
-            "humidity_std": np.std(hums) if hums else 0,
-            "pressure_avg": np.mean(pressures) if pressures else 0,
-            "pressure_std": np.std(pressures) if pressures else 0,
-            "data_count": len(self.history_data)
-        }
+        stats = {}
+        for field in STAT_FIELDS:
+            window = self.window_stats[field].to_dict()
+            stats[f"{field}_avg"] = window["mean"]
+            stats[f"{field}_std"] = window["std"]
+            stats[f"{field}_min"] = window["min"]
+            stats[f"{field}_max"] = window["max"]
+        stats["data_count"] = data_count
+        stats["global"] = {field: self.global_stats[field].to_dict() for field in STAT_FIELDS}
+        return stats
+    
+    def reset_statistics(self):
+        """清空历史数据与统计"""
+        self.history_data.clear()
+        for field in STAT_FIELDS:
+            self.global_stats[field].reset()
+            self.window_stats[field].reset()
     
     def get_shanghai_reference(self) -> Dict:
         """获取上海市参考值"""
@@ -0,0 +1,193 @@
+# analyzer/event_calendar.py
+"""
+校园事件日历 - 从 JSON / YAML / CSV 文件加载带日期规则的事件，并监视文件变化
+
+每条事件的字段（CSV 中列表用 ; 或 , 分隔）：
+    name, type, location("*" 表示任意地点), description, suggestions, priority
+    time_range: [开始小时, 结束小时] 或 "8-12"（也可用 start_hour / end_hour）
+    trigger_conditions: {"temperature": [20, 26], ...}
+        （也可用 temperature_min / temperature_max 等平铺字段）
+    start_date / end_date: 生效日期范围（YYYY-MM-DD）
+    weekdays: 星期几（1-7 或 mon..sun）
+    recurrence: daily（默认）/ weekly / biweekly / once
+    dates / exclude_dates: 额外指定 / 排除的日期
+"""
+
+import csv
+import json
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .event_context import CampusEvent
+
+_WEEKDAY_NAMES = {"mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6, "sun": 7}
+_TRIGGER_FIELDS = ("temperature", "humidity", "pressure")
+
+
+def _split(value) -> List[str]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    text = str(value).replace(";", ",")
+    return [part.strip() for part in text.split(",") if part.strip()]
+
+
+def _parse_date(value) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip()[:10])
+
+
+def _parse_weekdays(value) -> Optional[frozenset]:
+    days = set()
+    for part in _split(value):
+        key = part.lower()[:3]
+        days.add(_WEEKDAY_NAMES[key] if key in _WEEKDAY_NAMES else int(part))
+    return frozenset(days) or None
+
+
+def _parse_time_range(record: Dict) -> tuple:
+    value = record.get("time_range")
+    if value in (None, ""):
+        return (int(record.get("start_hour", 0) or 0), int(record.get("end_hour", 24) or 24))
+    if isinstance(value, str):
+        start, _, end = value.partition("-")
+        return (int(start), int(end or start))
+    start, end = value
+    return (int(start), int(end))
+
+
+def _parse_conditions(record: Dict) -> Dict[str, tuple]:
+    conditions = {}
+    raw = record.get("trigger_conditions") or {}
+    for field, bounds in raw.items():
+        low, high = bounds
+        conditions[field] = (float(low), float(high))
+    # 平铺字段（CSV）：缺少一端时视为不限
+    for field in _TRIGGER_FIELDS:
+        low, high = record.get(f"{field}_min"), record.get(f"{field}_max")
+        if low in (None, "") and high in (None, ""):
+            continue
+        conditions[field] = (float(low) if low not in (None, "") else float("-inf"),
+                             float(high) if high not in (None, "") else float("inf"))
+    return conditions
+
+
+def event_from_record(record: Dict) -> CampusEvent:
+    """将一条文件记录转换为 CampusEvent"""
+    if not record.get("name"):
+        raise ValueError(f"事件缺少 name 字段: {record}")
+    return CampusEvent(
+        name=str(record["name"]),
+        event_type=str(record.get("type") or "custom"),
+        time_range=_parse_time_range(record),
+        location=str(record.get("location") or "*"),
+        trigger_conditions=_parse_conditions(record),
+        description=str(record.get("description") or ""),
+        suggestions=_split(record.get("suggestions")),
+        priority=int(record.get("priority") or 1),
+        start_date=_parse_date(record.get("start_date")),
+        end_date=_parse_date(record.get("end_date")),
+        weekdays=_parse_weekdays(record.get("weekdays")),
+        recurrence=(str(record.get("recurrence") or "daily").strip().lower()),
+        dates=[_parse_date(d) for d in _split(record.get("dates"))],
+        exclude_dates=[_parse_date(d) for d in _split(record.get("exclude_dates"))],
+    )
+
+
+def _read_records(path: Path) -> List[Dict]:
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with path.open("r", encoding="utf-8-sig", newline="") as f:
+            return list(csv.DictReader(f))
+    text = path.read_text(encoding="utf-8")
+    if suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("读取 YAML 日历需要安装 PyYAML")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("events", [])
+    if not isinstance(data, list):
+        raise ValueError(f"日历文件格式不正确: {path}")
+    return data
+
+
+def load_calendar(path) -> List[CampusEvent]:
+    """加载日历文件（按扩展名识别 .json / .yaml / .yml / .csv）"""
+    return [event_from_record(record) for record in _read_records(Path(path))]
+
+
+class CalendarWatcher:
+    """后台轮询日历文件，文件变化（mtime 或大小）时重新加载并回调
+
+    解析在监视线程中完成，解析失败时保留旧日历并记录 last_error。
+    on_tick 在每次轮询后于监视线程中调用，用于执行预编译等后台维护。
+    """
+
+    def __init__(self, path, on_change: Callable[[List[CampusEvent]], None],
+                 interval: float = 2.0, on_tick: Optional[Callable[[], None]] = None):
+        self.path = Path(path)
+        self.on_change = on_change
+        self.on_tick = on_tick
+        self.interval = interval
+        self.last_error: Optional[str] = None
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="calendar-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def check(self) -> bool:
+        """检查一次文件变化，已重新加载时返回 True"""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        try:
+            events = load_calendar(self.path)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"日历重新加载失败: {e}")
+            return False
+        self._signature = signature
+        self.last_error = None
+        self.on_change(events)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+            if self.on_tick:
+                try:
+                    self.on_tick()
+                except Exception as e:
+                    print(f"日历维护任务失败: {e}")
+
+
+__all__ = ["load_calendar", "event_from_record", "CalendarWatcher"]
@@ -3,8 +3,16 @@
 校园事件匹配 - 根据时间、地点、数据匹配校园事件
 """
 
-from datetime import datetime, time
-from typing import Dict, List, Optional
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .event_index import EventIndex
+
+# 默认日历文件（存在时自动加载），格式见 analyzer/event_calendar.py
+DEFAULT_CALENDAR_FILE = Path(__file__).parent / "campus_events.json"
 
 
 class CampusEvent:
@@ -13,7 +21,11 @@ class CampusEvent:
     def __init__(self, name: str, event_type: str, 
                  time_range: tuple, location: str, 
                  trigger_conditions: Dict, 
-                 description: str, suggestions: List[str]):
+                 description: str, suggestions: List[str],
+                 priority: int = 1,
+                 start_date: date = None, end_date: date = None,
+                 weekdays: Iterable[int] = None, recurrence: str = "daily",
+                 dates: Iterable[date] = None, exclude_dates: Iterable[date] = None):
         self.name = name
         self.type = event_type
         self.time_range = time_range  # (start_hour, end_hour)
@@ -21,15 +33,148 @@ class CampusEvent:
         self.trigger_conditions = trigger_conditions
         self.description = description
         self.suggestions = suggestions
-        self.priority = 1
+        self.priority = priority
+        
+        # 日期规则（均为空时每天生效）
+        self.start_date = start_date
+        self.end_date = end_date
+        self.weekdays = frozenset(weekdays) if weekdays else None  # ISO 星期 1-7
+        self.recurrence = recurrence or "daily"  # daily / weekly / biweekly / once
+        self.dates = frozenset(dates or ())
+        self.exclude_dates = frozenset(exclude_dates or ())
+    
+    def occurs_on(self, day: date) -> bool:
+        """事件是否在指定日期生效"""
+        if day in self.exclude_dates:
+            return False
+        if day in self.dates:
+            return True
+        if self.dates and self.start_date is None and self.recurrence == "daily" and not self.weekdays:
+            # 只给出日期列表的事件
+            return False
+        if self.start_date and day < self.start_date:
+            return False
+        if self.end_date and day > self.end_date:
+            return False
+        
+        if self.recurrence == "once":
+            return day == self.start_date
+        if self.recurrence in ("weekly", "biweekly"):
+            weekdays = self.weekdays or ({self.start_date.isoweekday()} if self.start_date else None)
+            if weekdays and day.isoweekday() not in weekdays:
+                return False
+            if self.recurrence == "biweekly" and self.start_date:
+                return ((day - self.start_date).days // 7) % 2 == 0
+            return True
+        return not self.weekdays or day.isoweekday() in self.weekdays
+    
+    def to_dict(self) -> Dict:
+        """匹配结果中使用的字典形式"""
+        return {
+            "name": self.name,
+            "type": self.type,
+            "description": self.description,
+            "suggestions": self.suggestions,
+            "priority": self.priority,
+            "time_range": self.time_range,
+            "location": self.location
+        }
 
 
 class EventContext:
     """校园事件上下文匹配引擎"""
     
-    def __init__(self):
+    # 按日期缓存的编译索引个数
+    MAX_CACHED_DAYS = 8
+    # 距午夜不足该秒数时，由监视线程提前编译次日的索引
+    PRECOMPILE_LEAD = 600
+    
+    def __init__(self, calendar_file=None, watch_interval: float = 2.0):
         self.events = self._init_events()
+        self.calendar_events: List[CampusEvent] = []
         self.current_events = []
+        self.calendar_file = None
+        self._watcher = None
+        self._index_cache: Dict[date, EventIndex] = {}
+        self.rebuild_index()
+        
+        if calendar_file is None and DEFAULT_CALENDAR_FILE.exists():
+            calendar_file = DEFAULT_CALENDAR_FILE
+        if calendar_file:
+            try:
+                self.load_calendar(calendar_file, watch_interval)
+            except Exception as e:
+                print(f"日历加载失败: {e}")
+    
+    def rebuild_index(self):
+        """重新编译事件索引（修改 self.events 后调用）"""
+        self._swap_calendar(self.calendar_events)
+    
+    def load_calendar(self, path, watch_interval: float = 2.0) -> int:
+        """加载日历文件（JSON/YAML/CSV），watch_interval > 0 时监视文件变化并热加载
+        
+        返回加载的事件数；热加载在后台线程中解析与编译，完成后整体替换，匹配不会暂停。
+        """
+        from .event_calendar import CalendarWatcher, load_calendar
+        
+        self.stop_watching()
+        # 先记录文件状态再解析，解析期间发生的修改会被监视线程捕获
+        watcher = CalendarWatcher(path, self._swap_calendar, watch_interval,
+                                  on_tick=self.precompile_upcoming)
+        events = load_calendar(path)
+        self.calendar_file = Path(path)
+        self._swap_calendar(events)
+        if watch_interval and watch_interval > 0:
+            self._watcher = watcher
+            watcher.start()
+        return len(events)
+    
+    def stop_watching(self):
+        """停止监视日历文件"""
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
+    
+    def _upcoming_days(self) -> List[date]:
+        """需要预编译的日期：当天，临近午夜时加上次日"""
+        now = datetime.now()
+        days = [now.date()]
+        midnight = datetime.combine(now.date() + timedelta(days=1), time())
+        if (midnight - now).total_seconds() <= self.PRECOMPILE_LEAD:
+            days.append(midnight.date())
+        return days
+    
+    def _swap_calendar(self, calendar_events: List[CampusEvent]):
+        """预编译当天（临近午夜时含次日）的索引后再整体替换日历"""
+        cache = {day: self._compile(day, calendar_events) for day in self._upcoming_days()}
+        self.calendar_events = calendar_events
+        self._index_cache = cache
+    
+    def precompile_upcoming(self):
+        """在后台线程中提前编译当天与临近的次日索引，避免跨日后首次匹配时在接收路径上编译"""
+        for day in self._upcoming_days():
+            self.index_for(day)
+    
+    def _compile(self, day: date, calendar_events: List[CampusEvent]) -> EventIndex:
+        return EventIndex([event for event in self.events + calendar_events
+                           if event.occurs_on(day)])
+    
+    def index_for(self, day: date) -> EventIndex:
+        """指定日期生效事件的编译索引（按日期缓存）"""
+        cache = self._index_cache
+        index = cache.get(day)
+        if index is None:
+            index = self._compile(day, self.calendar_events)
+            # 写时复制：读取方始终看到完整的字典
+            cache = dict(cache) if len(cache) < self.MAX_CACHED_DAYS else {}
+            cache[day] = index
+            self._index_cache = cache
+        return index
+    
+    @property
+    def index(self) -> EventIndex:
+        """当天的编译索引"""
+        return self.index_for(date.today())
         
     def _init_events(self) -> List[CampusEvent]:
         """初始化校园事件库"""
@@ -100,44 +245,37 @@ class EventContext:
         ]
     
     def match_events(self, sensor_data: Dict, location: str = None) -> List[Dict]:
-        """匹配当前可能发生的校园事件"""
-        current_hour = datetime.now().hour
-        matched_events = []
-        
-        for event in self.events:
-            # 检查时间范围
-            if not (event.time_range[0] <= current_hour <= event.time_range[1]):
-                continue
-            
-            # 检查地点匹配
-            if event.location != "*" and location and event.location != location:
-                continue
-            
-            # 检查触发条件
-            conditions_met = True
-            for key, (min_val, max_val) in event.trigger_conditions.items():
-                if key in sensor_data:
-                    value = sensor_data[key]
-                    if not (min_val <= value <= max_val):
-                        conditions_met = False
-                        break
-            
-            if conditions_met:
-                matched_events.append({
-                    "name": event.name,
-                    "type": event.type,
-                    "description": event.description,
-                    "suggestions": event.suggestions,
-                    "priority": event.priority,
-                    "time_range": event.time_range,
-                    "location": event.location
-                })
-        
-        # 按优先级排序
-        matched_events.sort(key=lambda x: x["priority"], reverse=True)
+        """匹配当前可能发生的校园事件（结果已按优先级排序）"""
+        now = datetime.now()
+        matched = self.index_for(now.date()).match(sensor_data, location, now.hour)
+        matched_events = [event.to_dict() for event in matched]
         self.current_events = matched_events
         return matched_events
     
+    def match_events_batch(self, readings, hours=None, location: str = None,
+                           dates=None) -> List[List[Dict]]:
+        """批量匹配：readings 为数据类型到数组的映射或结构化数组，
+        hours 为各读数的小时（默认当前小时），dates 为各读数的日期（默认当天），
+        返回与读数一一对应的事件列表"""
+        if dates is None:
+            matched = self.index.match_batch(readings, hours, location)
+        else:
+            days = np.asarray(dates, dtype="datetime64[D]")
+            if hours is not None:
+                hours = np.broadcast_to(np.asarray(hours), days.shape)
+            matched = [None] * len(days)
+            for day in np.unique(days):
+                rows = np.flatnonzero(days == day)
+                if isinstance(readings, np.ndarray):
+                    subset = readings[rows]
+                else:
+                    subset = {key: np.asarray(values)[rows] for key, values in readings.items()}
+                results = self.index_for(day.astype(date)).match_batch(
+                    subset, None if hours is None else hours[rows], location)
+                for row, events in zip(rows.tolist(), results):
+                    matched[row] = events
+        return [[event.to_dict() for event in events] for events in matched]
+    
     def generate_natural_language(self, sensor_data: Dict, events: List[Dict]) -> str:
         """根据传感器数据和匹配的事件生成自然语言提示"""
         if not events:
@@ -0,0 +1,192 @@
+# analyzer/event_index.py
+"""
+校园事件编译索引 - 将事件的时间、地点与触发条件预编译为查找表
+
+事件按地点分组；每组内：
+- 小时掩码 hour_mask[h] 标记第 h 小时处于时间范围内的事件；
+- 每个数据类型把所有区间端点排序去重为 points，端点与端点之间的开区间
+  依次编号为基本段，pass[段号] 标记该段内的值满足条件的事件
+  （对该数据类型没有条件的事件恒为 True，最后一行对应读数缺少该数据）。
+
+单条匹配使用同一查找表的整数位图形式：每个数据类型一次二分查找，
+几个整数按位与，再逐个取出置位，开销约为 O(log n + k)；
+批量匹配直接在布尔矩阵上向量化。
+"""
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+# 可作为触发条件的数据类型
+TRIGGER_FIELDS = ("temperature", "humidity", "pressure")
+
+# 批量匹配时单块布尔矩阵的元素上限（读数数 × 组内事件数）
+_BATCH_CELLS = 1 << 22
+
+
+def _to_bits(row: np.ndarray) -> int:
+    """布尔行 -> 整数位图（第 j 位对应第 j 个事件）"""
+    return int.from_bytes(np.packbits(row, bitorder="little").tobytes(), "little")
+
+
+class _EventGroup:
+    """同一地点（或通配地点 "*"）的事件及其查找表"""
+
+    def __init__(self, events: List, orders: List[int]):
+        self.events = events
+        self.orders = orders
+        n = len(events)
+
+        self.hour_mask = np.zeros((24, n), dtype=bool)
+        for j, event in enumerate(events):
+            start, end = event.time_range
+            self.hour_mask[max(0, int(start)):min(23, int(end)) + 1, j] = True
+
+        # 数据类型 -> (points, pass 矩阵)
+        self.bounds: Dict[str, tuple] = {}
+        for field in TRIGGER_FIELDS:
+            conditions = [(j, event.trigger_conditions[field])
+                          for j, event in enumerate(events)
+                          if field in event.trigger_conditions]
+            if not conditions:
+                continue
+            points = np.unique(np.array([bound for _, pair in conditions for bound in pair],
+                                        dtype=np.float64))
+            # 各基本段的代表值：偶数段为开区间，奇数段为端点本身
+            segments = 2 * len(points) + 1
+            samples = np.empty(segments, dtype=np.float64)
+            samples[1::2] = points
+            samples[0] = points[0] - 1
+            samples[-1] = points[-1] + 1
+            samples[2:-1:2] = (points[:-1] + points[1:]) / 2
+            passed = np.ones((segments + 1, n), dtype=bool)
+            for j, (low, high) in conditions:
+                passed[:segments, j] = (samples >= low) & (samples <= high)
+            self.bounds[field] = (points, passed)
+
+        # 单条匹配用的位图形式
+        self.hour_bits = [_to_bits(row) for row in self.hour_mask]
+        self.bound_bits = {field: (points.tolist(), [_to_bits(row) for row in passed])
+                           for field, (points, passed) in self.bounds.items()}
+
+    @staticmethod
+    def _segments(points: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """值 -> 基本段号；NaN（缺失）映射到最后一行"""
+        pos = np.searchsorted(points, values, side="left")
+        exact = points[np.minimum(pos, len(points) - 1)] == values
+        codes = 2 * pos + exact
+        codes[np.isnan(values)] = 2 * len(points) + 1
+        return codes
+
+    def match(self, hour: int, values: Dict[str, float]) -> List[int]:
+        """单条读数：返回组内命中事件的下标"""
+        mask = self.hour_bits[hour]
+        for field, (points, passed) in self.bound_bits.items():
+            if not mask:
+                break
+            value = values.get(field)
+            if value is None:
+                continue
+            pos = bisect_left(points, value)
+            code = 2 * pos + (1 if pos < len(points) and points[pos] == value else 0)
+            mask &= passed[code]
+        hits = []
+        while mask:
+            low = mask & -mask
+            hits.append(low.bit_length() - 1)
+            mask ^= low
+        return hits
+
+    def match_batch(self, hours: np.ndarray, values: Dict[str, np.ndarray]):
+        """批量读数：返回 (读数下标, 组内事件下标) 两个数组"""
+        codes = {field: self._segments(points, values[field])
+                 for field, (points, _) in self.bounds.items() if field in values}
+        step = max(1, _BATCH_CELLS // max(1, len(self.events)))
+        rows, cols = [], []
+        for start in range(0, len(hours), step):
+            stop = start + step
+            mask = self.hour_mask[hours[start:stop]]
+            for field, field_codes in codes.items():
+                mask &= self.bounds[field][1][field_codes[start:stop]]
+            r, c = np.nonzero(mask)
+            rows.append(r + start)
+            cols.append(c)
+        if not rows:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        return np.concatenate(rows), np.concatenate(cols)
+
+
+class EventIndex:
+    """编译后的事件匹配器
+
+    语义与逐条遍历一致：小时落在 time_range 闭区间内；事件地点为 "*" 或
+    查询地点为空时不限地点；读数中存在的数据类型须落在对应触发区间内，
+    读数缺少的数据类型不作限制。结果按优先级降序，同优先级保持事件定义顺序。
+    """
+
+    def __init__(self, events: Iterable):
+        self.events = list(events)
+        by_location: Dict[str, List[int]] = {}
+        for order, event in enumerate(self.events):
+            by_location.setdefault(event.location, []).append(order)
+        self._groups: Dict[str, _EventGroup] = {
+            location: _EventGroup([self.events[i] for i in orders], orders)
+            for location, orders in by_location.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def _select_groups(self, location: Optional[str]) -> List[_EventGroup]:
+        if not location:
+            return list(self._groups.values())
+        return [group for key in ("*", location)
+                for group in (self._groups.get(key),) if group is not None]
+
+    def _sorted(self, hits: List[tuple]) -> List:
+        hits.sort(key=lambda item: (-item[1].priority, item[0]))
+        return [event for _, event in hits]
+
+    def match(self, values: Mapping, location: str = None, hour: int = None) -> List:
+        """匹配单条读数，返回 CampusEvent 列表"""
+        if hour is None:
+            from datetime import datetime
+            hour = datetime.now().hour
+        present = {field: float(values[field]) for field in TRIGGER_FIELDS if field in values}
+        hits = []
+        for group in self._select_groups(location):
+            for j in group.match(hour, present):
+                hits.append((group.orders[j], group.events[j]))
+        return self._sorted(hits)
+
+    def match_batch(self, values, hours: Sequence[int] = None,
+                    location: str = None) -> List[List]:
+        """批量匹配
+
+        values 为数据类型到数组的映射，或含 temperature/humidity/pressure 字段的
+        结构化数组（如 COMFORT_DTYPE）；缺少的类型或 NaN 视为读数中没有该数据。
+        hours 默认为当前小时。返回与读数一一对应的 CampusEvent 列表。
+        """
+        names = values.dtype.names if isinstance(values, np.ndarray) else tuple(values)
+        columns = {field: np.asarray(values[field], dtype=np.float64).ravel()
+                   for field in TRIGGER_FIELDS if field in names}
+        if columns:
+            size = len(next(iter(columns.values())))
+        else:
+            size = len(hours) if hours is not None else 0
+        if hours is None:
+            from datetime import datetime
+            hours = np.full(size, datetime.now().hour, dtype=np.intp)
+        else:
+            hours = np.broadcast_to(np.asarray(hours, dtype=np.intp), (size,))
+
+        hits: List[List[tuple]] = [[] for _ in range(size)]
+        for group in self._select_groups(location):
+            rows, cols = group.match_batch(hours, columns)
+            for r, c in zip(rows.tolist(), cols.tolist()):
+                hits[r].append((group.orders[c], group.events[c]))
+        return [self._sorted(row) for row in hits]
+
+
+__all__ = ["EventIndex", "TRIGGER_FIELDS"]
@@ -0,0 +1,118 @@
+# analyzer/history_store.py
+"""
+历史时间序列存储 - 预分配的 NumPy 环形缓冲区
+
+每个点同时写入位置 i 与 i + capacity（双写），因此任意最近 n 个点在底层数组中
+总是连续的，窗口读取直接返回视图而无需拷贝；追加为 O(1)，与容量无关。
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+# 存储的列（timestamp 为 epoch 秒）
+HISTORY_FIELDS = ("timestamp", "temperature", "humidity", "pressure")
+_FIELD_INDEX = {name: i for i, name in enumerate(HISTORY_FIELDS)}
+
+DEFAULT_CAPACITY = 20000
+
+
+class HistoryStore:
+    """定长环形缓冲区，保存最近 capacity 个 (时间戳, 温度, 湿度, 气压) 点
+
+    view()/window() 返回的是底层数组的视图，后续追加可能覆盖其内容；
+    需要长期持有时请自行 copy() 或 tolist()。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于 0")
+        self.capacity = int(capacity)
+        # 每列一行，行内连续，便于返回单列视图
+        self._data = np.zeros((len(HISTORY_FIELDS), 2 * self.capacity), dtype=np.float64)
+        self._pos = 0      # 下一个写入位置 [0, capacity)
+        self._count = 0    # 当前有效点数
+        self._total = 0    # 累计写入点数（含已被覆盖的）
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def total(self) -> int:
+        """累计追加的点数"""
+        return self._total
+
+    def append(self, timestamp: float, temperature: float,
+               humidity: float, pressure: float):
+        """追加一个点（O(1)）"""
+        pos = self._pos
+        row = (timestamp, temperature, humidity, pressure)
+        self._data[:, pos] = row
+        self._data[:, pos + self.capacity] = row
+        self._pos = pos + 1 if pos + 1 < self.capacity else 0
+        if self._count < self.capacity:
+            self._count += 1
+        self._total += 1
+
+    def extend(self, timestamps: Iterable[float], temperatures: Iterable[float],
+               humidities: Iterable[float], pressures: Iterable[float]):
+        """批量追加（各序列等长），只保留最后 capacity 个点"""
+        block = np.vstack([np.asarray(timestamps, dtype=np.float64),
+                           np.asarray(temperatures, dtype=np.float64),
+                           np.asarray(humidities, dtype=np.float64),
+                           np.asarray(pressures, dtype=np.float64)])
+        n = block.shape[1]
+        self._total += n
+        if n >= self.capacity:
+            block = block[:, -self.capacity:]
+            self._data[:, :self.capacity] = block
+            self._data[:, self.capacity:] = block
+            self._pos = 0
+            self._count = self.capacity
+            return
+        # 分两段写入以处理回绕
+        first = min(n, self.capacity - self._pos)
+        for offset in (0, self.capacity):
+            self._data[:, self._pos + offset:self._pos + offset + first] = block[:, :first]
+            self._data[:, offset:offset + n - first] = block[:, first:]
+        self._pos = (self._pos + n) % self.capacity
+        self._count = min(self.capacity, self._count + n)
+
+    def view(self, field: str, n: Optional[int] = None) -> np.ndarray:
+        """某一列最近 n 个点（默认全部）的只读视图，按时间升序"""
+        n = self._count if n is None else max(0, min(int(n), self._count))
+        end = self._pos + self.capacity
+        column = self._data[_FIELD_INDEX[field], end - n:end]
+        column.flags.writeable = False
+        return column
+
+    def window(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """最近 n 个点的全部列视图"""
+        return {field: self.view(field, n) for field in HISTORY_FIELDS}
+
+    def last(self, field: str) -> Optional[float]:
+        """某一列最新的值"""
+        if not self._count:
+            return None
+        return float(self._data[_FIELD_INDEX[field], self._pos + self.capacity - 1])
+
+    def resize(self, capacity: int):
+        """调整容量，保留最近的点（最多 capacity 个）"""
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于 0")
+        window = self.window()
+        total = self._total
+        self.capacity = int(capacity)
+        self._data = np.zeros((len(HISTORY_FIELDS), 2 * self.capacity), dtype=np.float64)
+        self.clear()
+        self.extend(*(window[field].copy() for field in HISTORY_FIELDS))
+        self._total = total
+
+    def clear(self):
+        """清空（不释放预分配的内存）"""
+        self._pos = 0
+        self._count = 0
+        self._total = 0
+
+
+__all__ = ["HistoryStore", "HISTORY_FIELDS", "DEFAULT_CAPACITY"]
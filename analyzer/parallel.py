@@ -0,0 +1,354 @@
+# analyzer/parallel.py
+"""
+多进程分析 - 按 sensor_id 哈希把读数分区到多个 XiaojiaBrain 工作进程
+
+同一传感器的读数总是落在同一个工作进程，各进程独立完成对齐、舒适度计算与
+趋势预测，互不加锁。读数在父进程中按分区攒批后经 multiprocessing.Queue
+发送，结果同样成批经共享的结果队列返回，由父进程的收集线程回调 on_result。
+
+无界面运行：python -m analyzer.parallel --workers 4
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from .shards import LocationRollup
+
+# 队列元素：(sensor_id, type, value, timestamp, location)
+ReadingItem = tuple
+
+# 结果队列中的消息类型
+_MSG_RESULTS = "results"
+_MSG_DONE = "done"
+
+
+def partition_for(sensor_id: str, partitions: int) -> int:
+    """sensor_id -> 分区号（crc32，跨进程稳定；内置 hash() 每个进程的种子不同）"""
+    return zlib.crc32(sensor_id.encode("utf-8")) % partitions
+
+
+def compact_result(response: Dict) -> Dict:
+    """从 process_sensor_data 的完整响应中取出跨进程传递的精简结果"""
+    raw = response.get("raw_data") or {}
+    comfort = response.get("comfort_analysis") or {}
+    prediction = response.get("prediction_result") or {}
+    return {
+        "sensor_id": response.get("sensor_id"),
+        "location": response.get("location"),
+        "timestamp": raw.get("timestamp") or response.get("timestamp"),
+        "temperature": raw.get("temperature"),
+        "humidity": raw.get("humidity"),
+        "pressure": raw.get("pressure"),
+        "comfort_score": comfort.get("comfort_score"),
+        "comfort_level": comfort.get("comfort_level"),
+        "comfort_prompt": response.get("comfort_prompt"),
+        "predictions": prediction.get("predictions"),
+        "trend": prediction.get("trend"),
+        "confidence": prediction.get("confidence"),
+        "error": response.get("error"),
+    }
+
+
+def _worker_main(index: int, inbox, outbox, full_results: bool):
+    """工作进程：每个进程持有一个不连接 MQTT 的 XiaojiaBrain"""
+    from .predictor import XiaojiaBrain
+
+    brain = XiaojiaBrain(with_mqtt=False)
+    joined = []
+    brain.set_realtime_callback(lambda reading, location, sensor_id: joined.append(reading))
+    readings = analyzed = 0
+    busy = 0.0
+
+    def analyze() -> List[Dict]:
+        results = []
+        for reading in joined:
+            response = brain.process_sensor_data(reading, reading.location, reading.sensor_id)
+            results.append(response if full_results else compact_result(response))
+        joined.clear()
+        return results
+
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            break
+        started = time.perf_counter()
+        for sensor_id, data_type, value, timestamp, location in batch:
+            brain.ingest_reading(sensor_id, data_type, value, timestamp, location)
+        results = analyze()
+        busy += time.perf_counter() - started
+        readings += len(batch)
+        analyzed += len(results)
+        if results:
+            outbox.put((_MSG_RESULTS, index, results))
+
+    # 停止时输出未完成但已有温度与湿度的分组
+    with brain.data_lock:
+        brain.joiner.flush()
+    results = analyze()
+    analyzed += len(results)
+    if results:
+        outbox.put((_MSG_RESULTS, index, results))
+    brain.event_context.stop_watching()
+    outbox.put((_MSG_DONE, index, {
+        "pid": os.getpid(),
+        "readings": readings,
+        "analyzed": analyzed,
+        "sensors": len(brain.shards),
+        "busy_seconds": busy,
+        "join": brain.joiner.stats(),
+    }))
+
+
+class ParallelAnalyzer:
+    """按传感器分区的多进程分析器
+
+    submit() 可在任意线程中调用（如 paho 网络线程），读数按分区攒够 batch_size
+    条或等待超过 flush_interval 秒后发送；工作进程的输入队列有界（queue_size 批），
+    满时 submit() 阻塞，形成背压。on_result(result) 在收集线程中回调。
+    """
+
+    def __init__(self, workers: int = None, on_result: Callable[[Dict], None] = None,
+                 batch_size: int = 256, queue_size: int = 64,
+                 flush_interval: float = 0.05, full_results: bool = False):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.on_result = on_result
+        self.batch_size = max(1, int(batch_size))
+        self.queue_size = max(1, int(queue_size))
+        self.flush_interval = flush_interval
+        self.full_results = full_results
+
+        # spawn：各平台行为一致，子进程不继承父进程的线程与 Qt 状态
+        self._ctx = mp.get_context("spawn")
+        self._inboxes = []
+        self._outbox = None
+        self._processes = []
+        self._buffers: List[List[ReadingItem]] = []
+        self._buffer_lock = threading.Lock()
+        self._collector: Optional[threading.Thread] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._stop_flusher = threading.Event()
+        self._running = False
+
+        # 统计与地点汇总（收集线程更新）
+        self._stats_lock = threading.Lock()
+        self._rollups: Dict[str, LocationRollup] = {}
+        self.submitted = 0
+        self.results = 0
+        self.errors = 0
+        self.worker_stats: Dict[int, Dict] = {}
+        self._started_at = 0.0
+
+    # -------- 生命周期 --------
+    def start(self):
+        if self._running:
+            return
+        self._inboxes = [self._ctx.Queue(self.queue_size) for _ in range(self.workers)]
+        self._outbox = self._ctx.Queue()
+        self._buffers = [[] for _ in range(self.workers)]
+        self._processes = [
+            self._ctx.Process(target=_worker_main, name=f"analyzer-{i}",
+                              args=(i, self._inboxes[i], self._outbox, self.full_results),
+                              daemon=True)
+            for i in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+        self.worker_stats = {}
+        self._running = True
+        self._started_at = time.monotonic()
+        self._collector = threading.Thread(target=self._collect, name="analyzer-collector", daemon=True)
+        self._collector.start()
+        self._stop_flusher.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="analyzer-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop(self, timeout: float = 10.0):
+        """发送剩余读数并等待各工作进程处理完毕后退出"""
+        if not self._running:
+            return
+        self._stop_flusher.set()
+        if self._flusher:
+            self._flusher.join(timeout=timeout)
+        self.flush()
+        self._running = False
+        for inbox in self._inboxes:
+            inbox.put(None)
+        if self._collector:
+            self._collector.join(timeout=timeout)
+        for process in self._processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._inboxes = []
+        self._collector = self._flusher = None
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -------- 生产端 --------
+    def submit(self, sensor_id: str, data_type: str, value: float,
+               timestamp: str = None, location: str = None):
+        """提交一条读数，按 sensor_id 分区"""
+        index = partition_for(sensor_id, self.workers)
+        with self._buffer_lock:
+            buffer = self._buffers[index]
+            buffer.append((sensor_id, data_type, value, timestamp, location))
+            self.submitted += 1
+            if len(buffer) >= self.batch_size:
+                # 在锁内入队，保证同一分区的批次按提交顺序到达
+                self._buffers[index] = []
+                self._inboxes[index].put(buffer)
+
+    def submit_message(self, message) -> bool:
+        """提交订阅端解析出的消息（SensorReading 或 dict），缺少字段时返回 False"""
+        data_type = message.get("type")
+        value = message.get("value")
+        if data_type not in ("temperature", "humidity", "pressure") or value is None:
+            return False
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        self.submit(message.get("sensor_id") or "unknown", data_type, value,
+                    message.get("timestamp"), message.get("location"))
+        return True
+
+    def flush(self):
+        """立即发送所有分区中攒下的读数"""
+        with self._buffer_lock:
+            for index, buffer in enumerate(self._buffers):
+                if buffer:
+                    self._buffers[index] = []
+                    self._inboxes[index].put(buffer)
+
+    def _flush_loop(self):
+        while not self._stop_flusher.wait(self.flush_interval):
+            self.flush()
+
+    # -------- 消费端 --------
+    def _collect(self):
+        remaining = self.workers
+        while remaining:
+            try:
+                kind, index, payload = self._outbox.get(timeout=0.5)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self._processes):
+                    return
+                continue
+            if kind == _MSG_DONE:
+                self.worker_stats[index] = payload
+                remaining -= 1
+                continue
+            with self._stats_lock:
+                self.results += len(payload)
+                for result in payload:
+                    if result.get("error"):
+                        self.errors += 1
+                    elif result.get("location") and result.get("temperature") is not None:
+                        rollup = self._rollups.get(result["location"])
+                        if rollup is None:
+                            rollup = self._rollups[result["location"]] = LocationRollup(result["location"])
+                        rollup.update(result["sensor_id"], (result["temperature"],
+                                                            result["humidity"],
+                                                            result.get("pressure") or 1013.0))
+            if self.on_result:
+                for result in payload:
+                    try:
+                        self.on_result(result)
+                    except Exception:
+                        pass
+
+    # -------- 统计 --------
+    def location_rollups(self) -> Dict[str, Dict]:
+        """各地点全部传感器（跨工作进程）最新读数的均值"""
+        with self._stats_lock:
+            return {location: rollup.snapshot() for location, rollup in self._rollups.items()}
+
+    def stats(self) -> Dict:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "results": self.results,
+                "errors": self.errors,
+                "elapsed_seconds": elapsed,
+                "readings_per_second": self.submitted / elapsed if elapsed else 0.0,
+                "queue_depths": [self._qsize(inbox) for inbox in self._inboxes],
+                "worker_stats": dict(self.worker_stats),
+            }
+
+    @staticmethod
+    def _qsize(q) -> int:
+        try:
+            return q.qsize()
+        except NotImplementedError:  # macOS 不支持 qsize
+            return -1
+
+
+def run_headless(broker: str = "127.0.0.1", port: int = 1883, workers: int = None,
+                 batch_size: int = 256, report_interval: float = 5.0,
+                 duration: float = None) -> Dict:
+    """订阅 sensor/# 并用多进程分析，定期打印吞吐；duration 秒后（或 Ctrl+C）停止"""
+    from subscriber.subscriber_logic import SubscriberLogic
+
+    analyzer = ParallelAnalyzer(workers, batch_size=batch_size)
+    analyzer.start()
+    # queue_size=0：解析后直接在网络线程中分区入队，背压由工作进程队列提供
+    subscriber = SubscriberLogic(broker=broker, port=port, queue_size=0)
+    subscriber.set_on_message(analyzer.submit_message)
+    subscriber.connect()
+    subscriber.subscribe("sensor/#")
+
+    started = time.monotonic()
+    try:
+        while duration is None or time.monotonic() - started < duration:
+            time.sleep(report_interval if duration is None
+                       else max(0.0, min(report_interval, duration - (time.monotonic() - started))))
+            stats = analyzer.stats()
+            print(f"[{stats['elapsed_seconds']:.0f}s] 读数 {stats['submitted']} "
+                  f"({stats['readings_per_second']:.0f}/s)，分析结果 {stats['results']}，"
+                  f"队列 {stats['queue_depths']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
+        analyzer.stop()
+    return analyzer.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="小嘉多进程分析（无界面）")
+    parser.add_argument("--broker", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=None, help="运行秒数（默认一直运行）")
+    args = parser.parse_args(argv)
+    stats = run_headless(args.broker, args.port, args.workers, args.batch_size,
+                         args.report_interval, args.duration)
+    for index, worker in sorted(stats["worker_stats"].items()):
+        print(f"工作进程 {index}: 读数 {worker['readings']}，分析 {worker['analyzed']}，"
+              f"传感器 {worker['sensors']}，计算耗时 {worker['busy_seconds']:.2f}s")
+
+
+__all__ = ["ParallelAnalyzer", "partition_for", "compact_result", "run_headless"]
+
+
+if __name__ == "__main__":
+    main()
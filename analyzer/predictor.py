@@ -7,19 +7,26 @@ from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 import numpy as np
 import json
-from sklearn.linear_model import LinearRegression
 import warnings
 import threading
 warnings.filterwarnings('ignore')
 
 from .comfort_model import ComfortModel
 from .event_context import EventContext
+from .shards import ShardManager
+from .snapshot import BrainSnapshot, thaw
+from .stream_join import StreamJoiner
+from common.downsample import lttb_indices
+from common.reading import CombinedReading, SensorReading
 
 
 class XiaojiaBrain:
     """小嘉智能大脑（规则引擎），只使用实时数据，支持多主题数据合并"""
     
-    def __init__(self):
+    # 每追加多少个点检查一次空闲分片
+    SHARD_EVICT_INTERVAL = 256
+    
+    def __init__(self, with_mqtt: bool = True, history_db=None):
         self.comfort_model = ComfortModel()
         self.event_context = EventContext()
         self.location = "JX_Teach"
@@ -27,18 +34,28 @@ class XiaojiaBrain:
         
         # 预测器相关 - 修改为基于20个点预测
         self.window_size = 20  # 基于20个点进行预测
-        self.temp_history = []
-        self.humidity_history = []
-        self.pressure_history = []
-        self.timestamps = []
-        self.max_history = 100
+        self.max_history = 20000      # 载入归档时当前传感器的历史容量
+        self.shard_capacity = 512     # 每个传感器分片的历史容量
+        # 按传感器分片：各自的环形缓冲区、滑动窗口趋势与统计，按地点汇总
+        self.shards = ShardManager(self.shard_capacity, self.window_size)
+        # 图表用的采样历史：(传感器, 点数) -> (数据版本, 结果)，按需生成
+        self._history_cache: Dict[tuple, tuple] = {}
+        
+        # SQLite 历史库（可选：传入 history_db 路径时由订阅器写入，get_historical_data 查询其汇总表；
+        # 默认只用内存中的历史，读数的持久化由订阅页的时序存储负责）
+        self.history_db = None
+        self.history_span = 24 * 3600   # 历史对比默认时间跨度（秒）
+        self.history_points = 30        # 历史对比的点数
         
         # MQTT订阅器
         self.subscriber = None
         self._mqtt_connected = False
-        self.realtime_data = None
         self.realtime_callback = None
         
+        # 对外可读状态的不可变快照：写入方整体替换引用，读取方无锁读取
+        self._snapshot = BrainSnapshot(sensor_id=self.sensor_id, location=self.location)
+        self._publish_lock = threading.Lock()  # 只串行化"生成并替换快照"这一步
+        
         # 数据缓存，用于合并来自不同主题的数据
         self.data_cache = {
             "temperature": None,
@@ -56,11 +73,15 @@ class XiaojiaBrain:
             }
         }
         
-        # 数据同步窗口（秒）
+        # 数据同步窗口（秒，按读数自身的事件时间）
         self.sync_window = 5
+        # 多主题流式对齐：按 sensor_id 与事件时间合并温度/湿度/气压
+        self.joiner = self._create_joiner()
         
-        # 线程锁确保线程安全
+        # 线程锁：data_lock 保护接收/对齐状态（MQTT 接收线程），
+        # analysis_lock 保护分片、舒适度统计等分析状态（分析线程），两者互不等待
         self.data_lock = threading.Lock()
+        self.analysis_lock = threading.Lock()
         
         # 舒适度语言提示
         self.comfort_messages = {
@@ -91,8 +112,11 @@ class XiaojiaBrain:
             ]
         }
         
-        # 初始化MQTT订阅
-        self._init_mqtt_subscriber()
+        # 初始化MQTT订阅（无界面的多进程工作者由父进程分发读数，不需要订阅器）
+        if with_mqtt:
+            if history_db is not None:
+                self._init_history_db(history_db)
+            self._init_mqtt_subscriber()
         
         # 情绪状态映射
         self.mood_map = {
@@ -116,6 +140,63 @@ class XiaojiaBrain:
         self.conversation_history = []
         self.max_history_dialog = 50
     
+    # ===== 快照 =====
+    @property
+    def snapshot(self) -> BrainSnapshot:
+        """当前的不可变状态快照（无锁读取）"""
+        return self._snapshot
+
+    @property
+    def realtime_data(self) -> Optional[CombinedReading]:
+        return self._snapshot.realtime
+
+    def _publish(self, **changes):
+        """基于当前快照生成新快照并原子替换"""
+        with self._publish_lock:
+            self._snapshot = self._snapshot.evolve(**changes)
+
+    def _shard(self, sensor_id: str = None):
+        """取得传感器分片（默认为当前传感器），不存在时创建；地点在追加数据时更新"""
+        return self.shards.get(sensor_id or self.sensor_id)
+
+    @property
+    def history(self):
+        """当前传感器的历史（HistoryStore）"""
+        return self._shard().history
+
+    @property
+    def trend(self):
+        """当前传感器的滑动窗口趋势"""
+        return self._shard().trend
+
+    # 历史序列（HistoryStore 的只读视图，按时间升序）
+    @property
+    def temp_history(self) -> np.ndarray:
+        return self.history.view("temperature")
+
+    @property
+    def humidity_history(self) -> np.ndarray:
+        return self.history.view("humidity")
+
+    @property
+    def pressure_history(self) -> np.ndarray:
+        return self.history.view("pressure")
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.history.view("timestamp")
+
+    def _init_history_db(self, path):
+        """打开 SQLite 历史库（打不开时只使用内存中的历史）"""
+        import sqlite3
+        from subscriber.sql_history import SQLiteHistory
+        
+        try:
+            self.history_db = SQLiteHistory(path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"历史库不可用: {e}")
+            self.history_db = None
+    
     def _init_mqtt_subscriber(self):
         """初始化MQTT订阅器"""
         try:
@@ -124,7 +205,8 @@ class XiaojiaBrain:
             self.subscriber = SubscriberLogic(
                 broker="127.0.0.1",
                 port=1883,
-                keepalive=60
+                keepalive=60,
+                storage=self.history_db
             )
             
             # 设置消息回调
@@ -161,11 +243,25 @@ class XiaojiaBrain:
                 pass
         self._mqtt_connected = False
     
+    def close(self):
+        """断开MQTT、停止订阅器并关闭历史库（写完队列中的读数）"""
+        self.disconnect_mqtt()
+        if self.subscriber:
+            self.subscriber.close()
+        if self.history_db:
+            self.history_db.close()
+            self.history_db = None
+    
     def _on_mqtt_message(self, mqtt_data: Dict):
         """处理MQTT消息 - 适配publish_logic的消息格式"""
         try:
             # 使用线程锁确保线程安全
             with self.data_lock:
+                # 订阅端已按发布端格式解析出的记录直接使用，不再二次解析
+                if isinstance(mqtt_data, SensorReading):
+                    self._parse_mqtt_message(mqtt_data.topic, mqtt_data)
+                    return
+
                 # 解析payload
                 payload = mqtt_data.get("payload", "")
                 topic = mqtt_data.get("topic", "")
@@ -185,23 +281,18 @@ class XiaojiaBrain:
         except Exception:
             pass
     
+    def _create_joiner(self) -> StreamJoiner:
+        return StreamJoiner(self._on_joined, tolerance=self.sync_window, lateness=self.sync_window)
+    
     def _parse_mqtt_message(self, topic: str, payload: Dict):
         """解析MQTT消息，适配publish_logic格式"""
-        current_time = datetime.now()
-        
         # 提取消息中的关键信息
         data_type = payload.get("type", "")
         value = payload.get("value", None)
-        sensor_id = payload.get("sensor_id", "")
-        location = payload.get("location", "")
+        sensor_id = payload.get("sensor_id", "") or self.sensor_id
+        location = payload.get("location", "") or self.location
         timestamp_str = payload.get("timestamp", "")
         
-        # 更新传感器ID和位置（如果提供了）
-        if sensor_id:
-            self.sensor_id = sensor_id
-        if location:
-            self.location = location
-        
         # 如果没有明确类型，尝试从主题推断
         if not data_type and "temperature" in topic.lower():
             data_type = "temperature"
@@ -211,79 +302,41 @@ class XiaojiaBrain:
             data_type = "pressure"
         
         # 处理不同类型的数据
-        if data_type == "temperature" and value is not None:
-            try:
-                temp_value = float(value)
-                self.data_cache["temperature"] = temp_value
-                self.data_cache["last_updated"]["temperature"] = current_time
-                self.data_cache["raw_messages"]["temperature"] = payload
-            except (ValueError, TypeError):
-                pass
-        
-        elif data_type == "humidity" and value is not None:
-            try:
-                humid_value = float(value)
-                self.data_cache["humidity"] = humid_value
-                self.data_cache["last_updated"]["humidity"] = current_time
-                self.data_cache["raw_messages"]["humidity"] = payload
-            except (ValueError, TypeError):
-                pass
-        
-        elif data_type == "pressure" and value is not None:
-            try:
-                pressure_value = float(value)
-                self.data_cache["pressure"] = pressure_value
-                self.data_cache["last_updated"]["pressure"] = current_time
-                self.data_cache["raw_messages"]["pressure"] = payload
-            except (ValueError, TypeError):
-                pass
-        else:
+        if data_type not in ("temperature", "humidity", "pressure") or value is None:
             return
-        
-        # 检查是否收集到完整的数据集
-        self._check_and_process_complete_data(current_time)
-    
-    def _check_and_process_complete_data(self, current_time: datetime):
-        """检查是否收集到完整的数据并进行处理"""
-        # 检查是否有温度和湿度数据（必需）
-        has_temp = self.data_cache["temperature"] is not None
-        has_humid = self.data_cache["humidity"] is not None
-        has_pressure = self.data_cache["pressure"] is not None
-        
-        if not (has_temp and has_humid):
-            return
-        
-        # 检查数据时间是否在同步窗口内
-        temp_time = self.data_cache["last_updated"]["temperature"]
-        humid_time = self.data_cache["last_updated"]["humidity"]
-        pressure_time = self.data_cache["last_updated"]["pressure"]
-        
-        # 计算时间差
-        time_diffs = []
-        if temp_time:
-            time_diffs.append(abs((temp_time - current_time).total_seconds()))
-        if humid_time:
-            time_diffs.append(abs((humid_time - current_time).total_seconds()))
-        if pressure_time:
-            time_diffs.append(abs((pressure_time - current_time).total_seconds()))
-        
-        # 检查最大时间差
-        if time_diffs and max(time_diffs) > self.sync_window:
+        try:
+            num_value = float(value)
+        except (ValueError, TypeError):
             return
+        self.data_cache["raw_messages"][data_type] = payload
+        self._ingest(sensor_id, data_type, num_value, timestamp_str, location)
+    
+    def _ingest(self, sensor_id: str, data_type: str, value: float,
+                timestamp: str = None, location: str = None):
+        self.data_cache[data_type] = value
+        self.data_cache["last_updated"][data_type] = datetime.now()
         
-        # 构建完整传感器数据
-        complete_data = {
-            "temperature": self.data_cache["temperature"],
-            "humidity": self.data_cache["humidity"],
-            "pressure": self.data_cache["pressure"] if has_pressure else 1013.0,
-            "topic": "sensor/combined",
-            "timestamp": current_time.isoformat(),
-            "sensor_id": self.sensor_id,
-            "location": self.location
-        }
-        
-        # 更新实时数据
-        self.realtime_data = complete_data
+        # 交给对齐阶段，凑齐同一时刻的数据后由 _on_joined 输出
+        self.joiner.add(sensor_id, data_type, value, timestamp, location)
+    
+    def ingest_reading(self, sensor_id: str, data_type: str, value: float,
+                       timestamp: str = None, location: str = None):
+        """直接送入一条已解析的读数（不经过 MQTT），对齐完成时调用实时回调"""
+        with self.data_lock:
+            self._ingest(sensor_id or self.sensor_id, data_type, float(value),
+                         timestamp, location or self.location)
+    
+    def _on_joined(self, complete_data: CombinedReading):
+        """对齐完成的合并读数"""
+        self.sensor_id = complete_data.sensor_id
+        if complete_data.location:
+            self.location = complete_data.location
+        
+        # 发布新的实时数据（读取方无需加锁）
+        self._publish(realtime=complete_data)
+        shard = self.shards.peek(complete_data.sensor_id)
+        if shard is not None:
+            shard.realtime = complete_data
         
         # 如果有回调函数，调用它
         if self.realtime_callback and self.realtime_data:
@@ -299,38 +352,48 @@ class XiaojiaBrain:
         """设置实时数据回调"""
         self.realtime_callback = callback
     
-    def get_realtime_data(self) -> Optional[Dict]:
-        """获取最新的实时数据"""
-        with self.data_lock:
-            return self.realtime_data
+    def get_realtime_data(self, sensor_id: str = None) -> Optional[CombinedReading]:
+        """获取最新的实时数据（指定 sensor_id 时取该传感器的最新读数），无锁"""
+        if sensor_id is None:
+            return self._snapshot.realtime
+        shard = self.shards.peek(sensor_id)
+        return shard.realtime if shard else None
     
     def process_sensor_data(self, sensor_data: Dict = None, location: str = None, sensor_id: str = None) -> Dict:
         """
         处理传感器数据，生成综合响应
         如果没有传入sensor_data，使用实时数据
+        
+        分析只持有 analysis_lock，不阻塞 MQTT 接收线程；结果发布为新快照。
         """
         try:
-            with self.data_lock:
+            # 如果没有传入数据，使用实时数据（快照读取，无锁）
+            if not sensor_data:
+                sensor_data = self._snapshot.realtime
+                if not sensor_data:
+                    # 尝试从缓存构建数据
+                    with self.data_lock:
+                        sensor_data = self._get_data_from_cache()
+                    if not sensor_data:
+                        return self._create_empty_response("没有可用的传感器数据")
+            
+            # 检查数据完整性
+            if "temperature" not in sensor_data or "humidity" not in sensor_data:
+                return self._create_empty_response("传感器数据不完整")
+            
+            # 读数自带来源时归入对应传感器的分片
+            if not sensor_id and sensor_data.get("sensor_id"):
+                sensor_id = sensor_data["sensor_id"]
+                if not location:
+                    location = sensor_data.get("location")
+            
+            with self.analysis_lock:
                 if location:
                     self.location = location
                 if sensor_id:
                     self.sensor_id = sensor_id
-                
-                # 如果没有传入数据，使用实时数据
-                if not sensor_data:
-                    if not self.realtime_data:
-                        # 尝试从缓存构建数据
-                        cache_data = self._get_data_from_cache()
-                        if cache_data:
-                            sensor_data = cache_data
-                        else:
-                            return self._create_empty_response("没有可用的传感器数据")
-                    else:
-                        sensor_data = self.realtime_data
-                
-                # 检查数据完整性
-                if "temperature" not in sensor_data or "humidity" not in sensor_data:
-                    return self._create_empty_response("传感器数据不完整")
+                # 接收线程可能随时改写 self.sensor_id，本次分析固定使用局部变量
+                sensor_id, location = self.sensor_id, self.location
                 
                 # 1. 计算舒适度
                 comfort_result = self.comfort_model.calculate_comfort_index(
@@ -342,45 +405,59 @@ class XiaojiaBrain:
                 
                 # 2. 获取舒适度语言提示
                 comfort_level = comfort_result.get("comfort_level", "moderate")
-                comfort_messages = self.comfort_messages.get(comfort_level, ["环境数据正常"])
-                comfort_prompt = comfort_messages[0]  # 使用第一个提示
+                comfort_prompt = self.comfort_messages.get(comfort_level, ["环境数据正常"])[0]  # 使用第一个提示
                 
                 # 3. 更新预测器数据
-                self._add_prediction_data(sensor_data)
+                shard = self._add_prediction_data(sensor_data, sensor_id, location)
+                history_count = len(shard.history)
                 
                 # 4. 获取预测结果
-                prediction_result = self._get_prediction_result()
-                
-                # 5. 获取历史数据用于对比
-                history_data = self._get_history_data()
+                prediction_result = self._get_prediction_result(shard)
                 
-                # 6. 构建响应
-                response = {
-                    "timestamp": datetime.now().isoformat(),
-                    "sensor_id": self.sensor_id,
-                    "location": self.location,
-                    "raw_data": sensor_data,
-                    "comfort_analysis": comfort_result,
-                    "comfort_prompt": comfort_prompt,
-                    "prediction_result": prediction_result,
-                    "history_data": history_data,
-                    "prediction_available": len(self.temp_history) >= self.window_size,
-                    "data_source": "realtime",
-                    "prediction_stats": {
-                        "temperature_history": len(self.temp_history),
-                        "humidity_history": len(self.humidity_history),
-                        "pressure_history": len(self.pressure_history),
-                        "window_size": self.window_size
-                    }
+                # 5. 发布快照（统计等读取方无需加锁；图表用的采样历史由
+                #    get_historical_data 按需生成）
+                rollup = self.shards.location_rollup(location)
+                self._publish_analysis(shard, prediction_result)
+            
+            # 6. 构建响应
+            response = {
+                "timestamp": datetime.now().isoformat(),
+                "sensor_id": sensor_id,
+                "location": location,
+                "raw_data": sensor_data,
+                "comfort_analysis": comfort_result,
+                "comfort_prompt": comfort_prompt,
+                "prediction_result": prediction_result,
+                "prediction_available": history_count >= self.window_size,
+                "location_rollup": rollup,
+                "data_source": "realtime",
+                "prediction_stats": {
+                    "temperature_history": history_count,
+                    "humidity_history": history_count,
+                    "pressure_history": history_count,
+                    "window_size": self.window_size
                 }
-                
-                return response
+            }
+            
+            return response
                 
         except Exception as e:
             return self._create_empty_response(f"数据处理错误: {str(e)}")
     
+    def _publish_analysis(self, shard, prediction_result: Dict):
+        """把一次分析的结果发布为新快照（调用方持有 analysis_lock）"""
+        self._publish(
+            sensor_id=shard.sensor_id,
+            location=shard.location,
+            prediction=prediction_result,
+            trend=prediction_result.get("trend", "stable"),
+            statistics=self._statistics_for(shard),
+            history_count=len(shard.history)
+        )
+    
     def _create_empty_response(self, message: str) -> Dict:
         """创建空响应"""
+        history_count = self._snapshot.history_count
         return {
             "timestamp": datetime.now().isoformat(),
             "error": message,
@@ -398,79 +475,75 @@ class XiaojiaBrain:
             "comfort_prompt": "⚠️ " + message,
             "prediction_available": False,
             "prediction_stats": {
-                "temperature_history": len(self.temp_history),
-                "humidity_history": len(self.humidity_history),
-                "pressure_history": len(self.pressure_history),
+                "temperature_history": history_count,
+                "humidity_history": history_count,
+                "pressure_history": history_count,
                 "window_size": self.window_size
             }
         }
     
-    def _get_data_from_cache(self) -> Optional[Dict]:
+    def _get_data_from_cache(self) -> Optional[CombinedReading]:
         """从缓存获取数据"""
         if (self.data_cache["temperature"] is not None and 
             self.data_cache["humidity"] is not None):
-            return {
-                "temperature": self.data_cache["temperature"],
-                "humidity": self.data_cache["humidity"],
-                "pressure": self.data_cache["pressure"] if self.data_cache["pressure"] is not None else 1013.0,
-                "timestamp": datetime.now().isoformat(),
-                "sensor_id": self.sensor_id,
-                "location": self.location
-            }
+            return CombinedReading(
+                temperature=self.data_cache["temperature"],
+                humidity=self.data_cache["humidity"],
+                pressure=self.data_cache["pressure"] if self.data_cache["pressure"] is not None else 1013.0,
+                timestamp=datetime.now().isoformat(),
+                sensor_id=self.sensor_id,
+                location=self.location,
+                topic=None
+            )
         return None
     
-    def _add_prediction_data(self, data: Dict):
-        """添加数据点到预测历史"""
-        current_time = datetime.now()
-        
+    def _add_prediction_data(self, data: Dict, sensor_id: str = None, location: str = None):
+        """添加数据点到传感器分片的预测历史（环形缓冲区，O(1)），返回该分片"""
+        sensor_id = sensor_id or self.sensor_id
+        location = location or self.location
         # 从数据中提取数值
         temp = data.get("temperature")
         humidity = data.get("humidity")
         pressure = data.get("pressure", 1013.0)
-        
-        # 添加到历史记录
-        if temp is not None:
-            self.temp_history.append(float(temp))
-        if humidity is not None:
-            self.humidity_history.append(float(humidity))
-        if pressure is not None:
-            self.pressure_history.append(float(pressure))
-        self.timestamps.append(current_time)
-        
-        # 限制历史数据大小
-        if len(self.temp_history) > self.max_history:
-            self.temp_history = self.temp_history[-self.max_history:]
-        if len(self.humidity_history) > self.max_history:
-            self.humidity_history = self.humidity_history[-self.max_history:]
-        if len(self.pressure_history) > self.max_history:
-            self.pressure_history = self.pressure_history[-self.max_history:]
-        if len(self.timestamps) > self.max_history:
-            self.timestamps = self.timestamps[-self.max_history:]
-    
-    def _get_prediction_result(self) -> Dict:
+        if temp is None or humidity is None:
+            return self.shards.get(sensor_id, location)
+        
+        temp, humidity = float(temp), float(humidity)
+        pressure = float(pressure) if pressure is not None else 1013.0
+        shard = self.shards.update(sensor_id, location, datetime.now().timestamp(),
+                                   temp, humidity, pressure)
+        # 定期淘汰长时间没有数据的分片
+        if shard.history.total % self.SHARD_EVICT_INTERVAL == 0:
+            self.shards.evict_idle()
+        return shard
+    
+    def _get_prediction_result(self, shard=None) -> Dict:
         """获取预测结果 - 基于20个点进行预测"""
+        shard = shard or self._shard()
+        count = len(shard.history)
         # 获取上海市参考数据
         shanghai_ref = self.get_shanghai_reference()
         shanghai_ref_temp = shanghai_ref.get("temperature", 20.0)
         
-        if len(self.temp_history) < self.window_size:
+        if count < self.window_size:
             # 不足20个点，使用简单预测
-            predictions = self._simple_predict_without_enough_data()
+            predictions = self._simple_predict_without_enough_data(shard)
             return {
                 "predictions": predictions,
                 "shanghai_reference": shanghai_ref_temp,
                 "confidence": 0.3,
                 "has_enough_data": False,
                 "timestamps": self._generate_future_timestamps(len(predictions)),
-                "trend": self._get_trend(),
-                "prediction_type": f"简单平均（数据不足 {len(self.temp_history)}/{self.window_size}）"
+                "trend": self._get_trend(shard),
+                "prediction_type": f"简单平均（数据不足 {count}/{self.window_size}）"
             }
         
-        # 使用最近20个点进行线性回归预测
-        predictions = self._linear_regression_predict(5)
+        # 使用最近20个点进行线性回归预测（三类数据同时外推）
+        forecasts = shard.trend.predict_dict(5)
+        predictions = forecasts["temperature"]
         
         # 计算置信度（基于数据量）
-        confidence = min(0.95, len(self.temp_history) / 100)
+        confidence = min(0.95, count / 100)
         
         return {
             "predictions": predictions,
@@ -478,45 +551,26 @@ class XiaojiaBrain:
             "confidence": confidence,
             "has_enough_data": True,
             "timestamps": self._generate_future_timestamps(len(predictions)),
-            "trend": self._get_trend(),
+            "trend": self._get_trend(shard),
+            "forecasts": forecasts,
             "prediction_type": f"线性回归（基于最近{self.window_size}个点）"
         }
     
-    def _simple_predict_without_enough_data(self) -> List[float]:
+    def _simple_predict_without_enough_data(self, shard=None) -> List[float]:
         """数据不足时的简单预测"""
-        if not self.temp_history:
+        history = (shard or self._shard()).history
+        if not len(history):
             return [20.0, 20.0, 20.0, 20.0, 20.0]
         
         # 使用最近几个点的平均值
-        recent = self.temp_history[-min(5, len(self.temp_history)):]
-        avg = sum(recent) / len(recent)
+        avg = float(history.view("temperature", 5).mean())
         return [round(avg, 1)] * 5
     
     def _linear_regression_predict(self, steps: int) -> List[float]:
-        """基于最近20个点的线性回归预测"""
-        try:
-            # 使用最近20个点
-            X = np.arange(min(self.window_size, len(self.temp_history))).reshape(-1, 1)
-            y = self.temp_history[-self.window_size:] if len(self.temp_history) >= self.window_size else self.temp_history
-            
-            # 训练线性回归模型
-            model = LinearRegression()
-            model.fit(X, y)
-            
-            # 预测未来steps个点
-            X_pred = np.arange(len(y), len(y) + steps).reshape(-1, 1)
-            predictions = model.predict(X_pred)
-            
-            # 确保预测值在合理范围内
-            predictions = np.clip(predictions, -10, 45)
-            
-            return [round(pred, 1) for pred in predictions]
-        except Exception:
-            # 回退到简单平均
-            if self.temp_history:
-                avg = sum(self.temp_history[-self.window_size:]) / min(self.window_size, len(self.temp_history))
-                return [round(avg, 1)] * steps
+        """基于最近20个点的线性回归预测（温度）"""
+        if not len(self.trend):
             return [20.0] * steps
+        return self.trend.predict_dict(steps)["temperature"]
     
     def _generate_future_timestamps(self, steps: int) -> List[str]:
         """生成未来时间戳"""
@@ -529,13 +583,14 @@ class XiaojiaBrain:
         
         return timestamps
     
-    def _get_trend(self) -> str:
+    def _get_trend(self, shard=None) -> str:
         """获取温度趋势"""
-        if len(self.temp_history) < 3:
+        history = (shard or self._shard()).history
+        if len(history) < 3:
             return "stable"
         
         # 使用最近3个点判断趋势
-        recent = self.temp_history[-3:]
+        recent = history.view("temperature", 3)
         if recent[2] > recent[0] + 0.5:
             return "rising"
         elif recent[2] < recent[0] - 0.5:
@@ -543,65 +598,203 @@ class XiaojiaBrain:
         else:
             return "stable"
     
-    def _get_history_data(self) -> Dict:
-        """获取历史数据用于对比"""
-        # 限制显示的点数，让图表更宽松
-        history_count = min(30, len(self.temp_history))
-        
-        # 如果数据太多，进行采样
-        temp_data = []
-        humid_data = []
-        pressure_data = []
+    def _get_history_data(self, shard=None, points: int = 30) -> Dict:
+        """获取历史数据用于对比（调用方持有 analysis_lock）
         
-        if self.temp_history:
-            step = max(1, len(self.temp_history) // history_count)
-            temp_data = self.temp_history[-history_count*step::step][:history_count]
-        
-        if self.humidity_history:
-            step = max(1, len(self.humidity_history) // history_count)
-            humid_data = self.humidity_history[-history_count*step::step][:history_count]
-        
-        if self.pressure_history:
-            step = max(1, len(self.pressure_history) // history_count)
-            pressure_data = self.pressure_history[-history_count*step::step][:history_count]
+        只在图表请求时降采样到 points 个点：按温度做一次 LTTB（保留峰谷），三列共用
+        同一组下标，因此各点在时间上对齐。结果按 (传感器, 点数) 缓存，数据未变化时
+        直接返回。
+        """
+        shard = shard or self._shard()
+        history = shard.history
+        version = (id(history), history.total, history.last("timestamp"))
+        key = (shard.sensor_id, points)
+        cached = self._history_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
         
-        return {
-            "temperature": temp_data,
-            "humidity": humid_data,
-            "pressure": pressure_data,
-            "count": history_count
-        }
+        # 限制显示的点数，让图表更宽松
+        history_count = min(points, len(history))
+        result = {"temperature": [], "humidity": [], "pressure": [],
+                  "timestamps": [], "count": history_count}
+        if history_count:
+            # 在缓冲区视图上选点，只拷贝被选中的点
+            window = history.window()
+            indices = lttb_indices(window["temperature"], history_count, window["timestamp"])
+            result["timestamps"] = window["timestamp"][indices].tolist()
+            for field in ("temperature", "humidity", "pressure"):
+                result[field] = window[field][indices].tolist()
+        
+        if len(self._history_cache) >= 256:
+            self._history_cache.clear()
+        self._history_cache[key] = (version, result)
+        return result
     
-    # ===== 公共API =====
+    # ===== 公共API（读取快照，无锁） =====
     def predict_next(self, steps: int = 5) -> Dict:
         """预测未来steps个时间点的数值"""
-        return self._get_prediction_result()
+        prediction = self._snapshot.prediction
+        if prediction is not None:
+            return thaw(prediction)
+        with self.analysis_lock:
+            return self._get_prediction_result()
     
     def get_trend_analysis(self) -> Dict:
         """获取趋势分析"""
-        return {"temperature_trend": self._get_trend()}
+        return {"temperature_trend": self._snapshot.trend}
     
-    def get_historical_data(self, data_type: str = "temperature") -> Dict:
-        """获取历史数据"""
-        history_data = self._get_history_data()
+    def get_historical_data(self, data_type: str = "temperature", span: float = None,
+                            points: int = None) -> Dict:
+        """获取历史数据
+        
+        有历史库时查询当前传感器在最近 span 秒（默认 history_span）内的汇总表，
+        合并为 points 个时间段的均值（另含 timestamps/min/max/resolution）；
+        历史库不可用或尚无数据时返回最近一次分析的采样历史。
+        """
+        snapshot = self._snapshot
+        if self.history_db is not None:
+            types = [data_type] if data_type in ["temperature", "humidity", "pressure"] \
+                else ["temperature", "humidity", "pressure"]
+            result = {}
+            for name in types:
+                rollup = self.history_db.rollup(snapshot.sensor_id or self.sensor_id, name,
+                                                span=span or self.history_span,
+                                                points=points or self.history_points)
+                if not rollup["avg"]:
+                    break
+                result[name] = [round(value, 2) for value in rollup["avg"]]
+                if len(types) == 1:
+                    result.update(timestamps=rollup["timestamps"], min=rollup["min"],
+                                  max=rollup["max"], resolution=rollup["resolution"])
+            else:
+                result["count"] = len(result[types[0]])
+                return result
+        
+        # 历史库不可用时从内存历史按需降采样（结果有缓存）
+        with self.analysis_lock:
+            history_data = self._get_history_data(self._shard(snapshot.sensor_id),
+                                                  points or self.history_points)
         
         if data_type in ["temperature", "humidity", "pressure"]:
             return {
-                data_type: history_data[data_type],
+                data_type: list(history_data[data_type]),
+                "timestamps": list(history_data["timestamps"]),
                 "count": len(history_data[data_type])
             }
         
-        return history_data
+        return {name: list(value) if isinstance(value, list) else value
+                for name, value in history_data.items()}
+    
+    def load_archive_history(self, archive_dir: str = None) -> int:
+        """从列式归档（publisher/*.col）直接载入预测历史，返回载入的点数
+
+        三类数据按时间戳对齐后取最近 max_history 个点，直接在 memmap 上切片，
+        不经过 JSON 解析。
+        """
+        from pathlib import Path
+        from publisher.archive import ColumnArchive, archive_path_for
+
+        base_dir = Path(archive_dir) if archive_dir else Path(__file__).parent.parent / "publisher"
+        try:
+            temp = ColumnArchive(archive_path_for(base_dir / "temperature.txt"))
+            humid = ColumnArchive(archive_path_for(base_dir / "humidity.txt"))
+        except (OSError, ValueError):
+            return 0
+        try:
+            pressure = ColumnArchive(archive_path_for(base_dir / "pressure.txt"))
+        except (OSError, ValueError):
+            pressure = None
+
+        # 按时间戳对齐（各列均已按时间升序）
+        stamps, t_idx, h_idx = np.intersect1d(temp.timestamps, humid.timestamps,
+                                              return_indices=True)
+        stamps, t_idx, h_idx = stamps[-self.max_history:], t_idx[-self.max_history:], h_idx[-self.max_history:]
+        pressures = np.full(len(stamps), 1013.0)
+        if pressure is not None and len(pressure):
+            p_pos = np.clip(np.searchsorted(pressure.timestamps, stamps), 0, len(pressure) - 1)
+            found = pressure.timestamps[p_pos] == stamps
+            pressures[found] = pressure.values[p_pos[found]]
+
+        with self.analysis_lock:
+            shard = self.shards.get(self.sensor_id, self.location, capacity=self.max_history)
+            history = shard.history
+            history.clear()
+            history.extend(
+                stamps.astype(np.float64),
+                np.round(temp.values[t_idx].astype(float), 2),
+                np.round(humid.values[h_idx].astype(float), 2),
+                np.round(pressures.astype(float), 2)
+            )
+            shard.trend.extend(history.view("temperature", self.window_size),
+                               history.view("humidity", self.window_size),
+                               history.view("pressure", self.window_size))
+            shard.sync_window_stats()
+            self._publish_analysis(shard, self._get_prediction_result(shard))
+        return len(stamps)
+
+    def load_store_history(self, store, sensor_id: str = None) -> int:
+        """从订阅端时序存储（subscriber.storage.SegmentStore）载入某传感器的预测历史
+
+        温度与湿度按时间戳对齐后取最近 max_history 个点，气压缺失时取 1013.0。
+        返回载入的点数。
+        """
+        from subscriber.storage import to_unix_seconds
+
+        sensor_id = sensor_id or self.sensor_id
+        t_stamps, t_values = store.series(sensor_id, "temperature")
+        h_stamps, h_values = store.series(sensor_id, "humidity")
+        stamps, t_idx, h_idx = np.intersect1d(t_stamps, h_stamps, return_indices=True)
+        stamps, t_idx, h_idx = stamps[-self.max_history:], t_idx[-self.max_history:], h_idx[-self.max_history:]
+        if not len(stamps):
+            return 0
+        p_stamps, p_values = store.series(sensor_id, "pressure", stamps[0], stamps[-1])
+        pressures = np.full(len(stamps), 1013.0)
+        if len(p_stamps):
+            p_pos = np.clip(np.searchsorted(p_stamps, stamps), 0, len(p_stamps) - 1)
+            found = p_stamps[p_pos] == stamps
+            pressures[found] = p_values[p_pos[found]]
+
+        with self.analysis_lock:
+            shard = self.shards.get(sensor_id, capacity=self.max_history)
+            history = shard.history
+            history.clear()
+            history.extend(
+                to_unix_seconds(stamps.astype(np.int64)),
+                np.round(t_values[t_idx].astype(float), 2),
+                np.round(h_values[h_idx].astype(float), 2),
+                np.round(pressures, 2)
+            )
+            shard.trend.extend(history.view("temperature", self.window_size),
+                               history.view("humidity", self.window_size),
+                               history.view("pressure", self.window_size))
+            shard.sync_window_stats()
+            self._publish_analysis(shard, self._get_prediction_result(shard))
+        return len(stamps)
+
+    def get_comfort_statistics(self, sensor_id: str = None) -> Dict:
+        """获取舒适度统计（按传感器分片；分片尚无数据时使用全局统计）
+        
+        最近一次分析的传感器直接读取快照，无锁。
+        """
+        snapshot = self._snapshot
+        if snapshot.statistics and sensor_id in (None, snapshot.sensor_id):
+            return thaw(snapshot.statistics)
+        with self.analysis_lock:
+            return self._statistics_for(self._shard(sensor_id))
     
-    def get_comfort_statistics(self) -> Dict:
-        """获取舒适度统计"""
-        stats = self.comfort_model.get_statistics()
+    def _statistics_for(self, shard) -> Dict:
+        """分片统计 + 预测数据统计（调用方持有 analysis_lock）"""
+        stats = shard.statistics() or self.comfort_model.get_statistics()
+        count = len(shard.history)
         
         # 添加预测数据统计
         stats.update({
-            "prediction_data_count": len(self.temp_history),
+            "sensor_id": shard.sensor_id,
+            "prediction_data_count": count,
             "prediction_window_size": self.window_size,
-            "prediction_ready": len(self.temp_history) >= self.window_size
+            "prediction_ready": count >= self.window_size,
+            "location_rollup": self.shards.location_rollup(shard.location),
+            "shard_count": len(self.shards)
         })
         
         return stats
@@ -610,13 +803,20 @@ class XiaojiaBrain:
         """获取上海市参考值"""
         return self.comfort_model.get_shanghai_reference()
     
+    def reset_stream(self, sensor_id: str = None):
+        """数据流重新开始（重新发布/回放）时重置对齐水位线，保留已有历史"""
+        with self.data_lock:
+            self.joiner.reset(sensor_id)
+    
     def reset_predictor(self):
         """重置预测器数据"""
-        with self.data_lock:
-            self.temp_history = []
-            self.humidity_history = []
-            self.pressure_history = []
-            self.timestamps = []
+        with self.data_lock, self.analysis_lock:
+            self.shards.clear()
+            self._history_cache.clear()
+            self.joiner = self._create_joiner()
+            with self._publish_lock:
+                self._snapshot = BrainSnapshot(version=self._snapshot.version + 1,
+                                               sensor_id=self.sensor_id, location=self.location)
             
             # 同时重置数据缓存
             self.data_cache = {
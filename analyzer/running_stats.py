@@ -0,0 +1,137 @@
+# analyzer/running_stats.py
+"""
+流式统计 - Welford 算法维护计数、均值、M2（离差平方和）、最小值与最大值
+
+RunningStats 累计全部数据；RollingStats 只统计最近 window 个样本，
+移出窗口的样本按 Welford 逆运算扣除，窗口最值用单调队列维护。
+两者读取统计量均为 O(1)，不需要保留全部原始数据。
+"""
+
+import math
+from collections import deque
+from typing import Dict, Optional
+
+
+class RunningStats:
+    """全局累计统计（Welford）"""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def variance(self) -> float:
+        """总体方差（与 np.var 默认一致）"""
+        return max(self.m2, 0.0) / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict:
+        if not self.count:
+            return {"count": 0, "mean": 0, "std": 0, "min": 0, "max": 0}
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+class RollingStats(RunningStats):
+    """最近 window 个样本的滑动窗口统计
+
+    add(None) 占用一个窗口位置但不计入统计（对应缺失值）。
+    """
+
+    __slots__ = ("window", "_values", "_seq", "_min_queue", "_max_queue", "_since_refresh")
+
+    def __init__(self, window: int = 1000):
+        if window <= 0:
+            raise ValueError("window 必须大于 0")
+        self.window = int(window)
+        self._values: deque = deque()
+        super().__init__()
+
+    def reset(self):
+        super().reset()
+        self._values = deque()
+        self._seq = 0                      # 下一个样本的序号
+        self._min_queue: deque = deque()   # (序号, 值)，值单调递增
+        self._max_queue: deque = deque()   # (序号, 值)，值单调递减
+        self._since_refresh = 0
+
+    def __len__(self) -> int:
+        """窗口内的样本数（含缺失值）"""
+        return len(self._values)
+
+    def add(self, value: Optional[float]):
+        if len(self._values) == self.window:
+            self._remove(self._values.popleft())
+        self._values.append(value)
+        seq = self._seq
+        self._seq += 1
+
+        # 丢弃已滑出窗口的最值候选
+        oldest = seq - self.window
+        while self._min_queue and self._min_queue[0][0] <= oldest:
+            self._min_queue.popleft()
+        while self._max_queue and self._max_queue[0][0] <= oldest:
+            self._max_queue.popleft()
+
+        if value is not None:
+            super().add(value)
+            while self._min_queue and self._min_queue[-1][1] >= value:
+                self._min_queue.pop()
+            self._min_queue.append((seq, value))
+            while self._max_queue and self._max_queue[-1][1] <= value:
+                self._max_queue.pop()
+            self._max_queue.append((seq, value))
+        self.min = self._min_queue[0][1] if self._min_queue else math.inf
+        self.max = self._max_queue[0][1] if self._max_queue else -math.inf
+
+    def _remove(self, value: Optional[float]):
+        if value is None:
+            return
+        self.count -= 1
+        if self.count == 0:
+            self.mean = self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+
+        # 增删交替会累积舍入误差，定期由窗口数据精确重算
+        self._since_refresh += 1
+        if self._since_refresh >= 10 * self.window:
+            self._refresh()
+
+    def _refresh(self):
+        samples = [v for v in self._values if v is not None]
+        self.count = len(samples)
+        self.mean = math.fsum(samples) / self.count if samples else 0.0
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in samples)
+        self._since_refresh = 0
+
+
+__all__ = ["RunningStats", "RollingStats"]
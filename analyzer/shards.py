@@ -0,0 +1,229 @@
+# analyzer/shards.py
+"""
+按传感器分片的分析状态 - 每个传感器独立的历史、趋势与统计，按地点汇总
+
+分片在首次收到该传感器的数据时创建，按最近使用顺序保存；
+超过 max_shards 时淘汰最久未使用的分片，evict_idle() 淘汰空闲超时的分片，
+因此同一进程服务数千个传感器时内存有上界。
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .history_store import HistoryStore
+from .running_stats import RollingStats, RunningStats
+from .trend import IncrementalTrend
+
+SHARD_FIELDS = ("temperature", "humidity", "pressure")
+
+
+class SensorShard:
+    """单个传感器的分析状态"""
+
+    __slots__ = ("sensor_id", "location", "history", "trend", "stats",
+                 "window_stats", "realtime", "last_seen")
+
+    def __init__(self, sensor_id: str, location: str = None,
+                 capacity: int = 1024, window: int = 20):
+        self.sensor_id = sensor_id
+        self.location = location
+        self.history = HistoryStore(capacity)
+        self.trend = IncrementalTrend(window)
+        # 全部数据的累计统计，以及与 history 同窗口的滑动统计（读取均为 O(1)）
+        self.stats = {field: RunningStats() for field in SHARD_FIELDS}
+        self.window_stats = {field: RollingStats(capacity) for field in SHARD_FIELDS}
+        self.realtime = None          # 最新的 CombinedReading
+        self.last_seen = time.monotonic()
+
+    def add(self, timestamp: float, temperature: float, humidity: float, pressure: float):
+        self.history.append(timestamp, temperature, humidity, pressure)
+        self.trend.update(temperature, humidity, pressure)
+        self.stats["temperature"].add(temperature)
+        self.stats["humidity"].add(humidity)
+        self.stats["pressure"].add(pressure)
+        self.window_stats["temperature"].add(temperature)
+        self.window_stats["humidity"].add(humidity)
+        self.window_stats["pressure"].add(pressure)
+        self.last_seen = time.monotonic()
+
+    def reset(self):
+        self.history.clear()
+        self.trend.reset()
+        for stats in self.stats.values():
+            stats.reset()
+        for stats in self.window_stats.values():
+            stats.reset()
+
+    def sync_window_stats(self):
+        """直接改写 history（批量载入、扩容）后按当前窗口重建滑动统计"""
+        for field in SHARD_FIELDS:
+            stats = RollingStats(self.history.capacity)
+            for value in self.history.view(field).tolist():
+                stats.add(value)
+            self.window_stats[field] = stats
+
+    def statistics(self) -> Dict:
+        """*_avg/*_std/*_min/*_max 为历史窗口内的统计，global 为累计统计"""
+        count = len(self.history)
+        if not count:
+            return {}
+        result = {}
+        for field in SHARD_FIELDS:
+            stats = self.window_stats[field]
+            result[f"{field}_avg"] = stats.mean
+            result[f"{field}_std"] = stats.std
+            result[f"{field}_min"] = stats.min
+            result[f"{field}_max"] = stats.max
+        result["data_count"] = count
+        result["global"] = {field: self.stats[field].to_dict() for field in SHARD_FIELDS}
+        return result
+
+
+class LocationRollup:
+    """同一地点各传感器最新读数的汇总（增量维护总和）"""
+
+    __slots__ = ("location", "members", "sums")
+
+    def __init__(self, location: str):
+        self.location = location
+        self.members: Dict[str, tuple] = {}
+        self.sums = [0.0, 0.0, 0.0]
+
+    def update(self, sensor_id: str, values: tuple):
+        old = self.members.get(sensor_id)
+        if old is not None:
+            for i in range(3):
+                self.sums[i] += values[i] - old[i]
+        else:
+            for i in range(3):
+                self.sums[i] += values[i]
+        self.members[sensor_id] = values
+
+    def remove(self, sensor_id: str):
+        old = self.members.pop(sensor_id, None)
+        if old is not None:
+            for i in range(3):
+                self.sums[i] -= old[i]
+
+    def snapshot(self) -> Dict:
+        count = len(self.members)
+        result = {"location": self.location, "sensor_count": count}
+        for i, field in enumerate(SHARD_FIELDS):
+            result[field] = self.sums[i] / count if count else None
+        return result
+
+
+class ShardManager:
+    """传感器分片的惰性创建、LRU 淘汰与按地点汇总"""
+
+    def __init__(self, capacity: int = 1024, window: int = 20,
+                 max_shards: int = 4096, idle_timeout: float = 3600.0):
+        self.capacity = capacity
+        self.window = window
+        self.max_shards = max(1, int(max_shards))
+        self.idle_timeout = idle_timeout
+        self._shards: "OrderedDict[str, SensorShard]" = OrderedDict()
+        self._rollups: Dict[str, LocationRollup] = {}
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def __contains__(self, sensor_id: str) -> bool:
+        return sensor_id in self._shards
+
+    def peek(self, sensor_id: str) -> Optional[SensorShard]:
+        """返回已存在的分片（不创建、不更新使用顺序）"""
+        return self._shards.get(sensor_id)
+
+    def get(self, sensor_id: str, location: str = None,
+            capacity: int = None) -> SensorShard:
+        """取得分片，不存在时创建；capacity 大于现有容量时扩容"""
+        shard = self._shards.get(sensor_id)
+        if shard is None:
+            shard = SensorShard(sensor_id, location, capacity or self.capacity, self.window)
+            self._shards[sensor_id] = shard
+            if len(self._shards) > self.max_shards:
+                self._evict(next(iter(self._shards)))
+        else:
+            self._shards.move_to_end(sensor_id)
+            shard.last_seen = time.monotonic()
+            if capacity and capacity > shard.history.capacity:
+                shard.history.resize(capacity)
+                shard.sync_window_stats()
+        if location and location != shard.location:
+            # 传感器换了地点：最新读数从旧地点的汇总移到新地点
+            values = self._leave_rollup(sensor_id, shard.location)
+            shard.location = location
+            if values is not None:
+                self._rollup_for(location).update(sensor_id, values)
+        return shard
+
+    def _rollup_for(self, location: str) -> LocationRollup:
+        rollup = self._rollups.get(location)
+        if rollup is None:
+            rollup = self._rollups[location] = LocationRollup(location)
+        return rollup
+
+    def _leave_rollup(self, sensor_id: str, location: str) -> Optional[tuple]:
+        rollup = self._rollups.get(location)
+        if rollup is None:
+            return None
+        values = rollup.members.get(sensor_id)
+        rollup.remove(sensor_id)
+        if not rollup.members:
+            del self._rollups[location]
+        return values
+
+    def update(self, sensor_id: str, location: str, timestamp: float,
+               temperature: float, humidity: float, pressure: float) -> SensorShard:
+        """向分片追加一个点并更新地点汇总"""
+        shard = self.get(sensor_id, location)
+        shard.add(timestamp, temperature, humidity, pressure)
+        if shard.location:
+            self._rollup_for(shard.location).update(sensor_id, (temperature, humidity, pressure))
+        return shard
+
+    def _evict(self, sensor_id: str):
+        shard = self._shards.pop(sensor_id, None)
+        if shard is None:
+            return
+        self.evicted += 1
+        self._leave_rollup(sensor_id, shard.location)
+
+    def evict_idle(self, idle_timeout: float = None) -> int:
+        """淘汰空闲超过 idle_timeout 秒的分片，返回淘汰数"""
+        timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        if timeout is None or math.isinf(timeout):
+            return 0
+        deadline = time.monotonic() - timeout
+        # 按使用顺序排列，遇到第一个未超时的分片即可停止
+        stale = []
+        for sensor_id, shard in self._shards.items():
+            if shard.last_seen >= deadline:
+                break
+            stale.append(sensor_id)
+        for sensor_id in stale:
+            self._evict(sensor_id)
+        return len(stale)
+
+    def sensors(self, location: str = None) -> List[str]:
+        if location is None:
+            return list(self._shards)
+        return [sid for sid, shard in self._shards.items() if shard.location == location]
+
+    def location_rollup(self, location: str) -> Optional[Dict]:
+        rollup = self._rollups.get(location)
+        return rollup.snapshot() if rollup else None
+
+    def location_rollups(self) -> Dict[str, Dict]:
+        return {location: rollup.snapshot() for location, rollup in self._rollups.items()}
+
+    def clear(self):
+        self._shards.clear()
+        self._rollups.clear()
+
+
+__all__ = ["SensorShard", "LocationRollup", "ShardManager"]
@@ -0,0 +1,80 @@
+# analyzer/snapshot.py
+"""
+分析状态快照 - 写时复制的不可变对象
+
+写入方每次生成一个新快照并整体替换引用（引用赋值在 CPython 中是原子的），
+读取方拿到引用后即可无锁读取：已发布的快照及其包含的对象不会再被修改。
+prediction 与 statistics 在生成快照时冻结为只读映射与元组，对外返回时用 thaw()
+生成可修改的副本。
+"""
+
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Optional
+
+
+def freeze(value):
+    """dict -> 只读映射、list -> 元组（递归）；已冻结的值原样返回"""
+    if isinstance(value, MappingProxyType):
+        return value
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """freeze() 的逆操作：生成可自由修改的 dict / list 副本"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+class BrainSnapshot:
+    """XiaojiaBrain 对外可读状态的不可变快照
+
+    realtime    最新对齐完成的合并读数（CombinedReading）
+    prediction  最近一次预测结果（同 _get_prediction_result，已冻结）
+    statistics  当前传感器的统计（同 get_comfort_statistics，已冻结）
+    """
+
+    __slots__ = ("version", "realtime", "sensor_id", "location", "prediction",
+                 "trend", "statistics", "history_count", "updated_at")
+
+    def __init__(self, version: int = 0, realtime=None, sensor_id: str = None,
+                 location: str = None, prediction: Optional[Dict] = None,
+                 trend: str = "stable",
+                 statistics: Optional[Dict] = None, history_count: int = 0,
+                 updated_at: float = None):
+        set_field = object.__setattr__
+        set_field(self, "version", version)
+        set_field(self, "realtime", realtime)
+        set_field(self, "sensor_id", sensor_id)
+        set_field(self, "location", location)
+        set_field(self, "prediction", freeze(prediction))
+        set_field(self, "trend", trend)
+        set_field(self, "statistics", freeze(statistics if statistics is not None else {}))
+        set_field(self, "history_count", history_count)
+        set_field(self, "updated_at", updated_at if updated_at is not None else time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BrainSnapshot 是不可变的，请使用 evolve() 生成新快照")
+
+    def evolve(self, **changes) -> "BrainSnapshot":
+        """返回替换了部分字段的新快照（版本号加一）"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        fields["version"] = self.version + 1
+        fields["updated_at"] = time.time()
+        return BrainSnapshot(**fields)
+
+    def __repr__(self) -> str:
+        return (f"BrainSnapshot(version={self.version}, sensor_id={self.sensor_id!r}, "
+                f"history_count={self.history_count})")
+
+
+__all__ = ["BrainSnapshot", "freeze", "thaw"]
@@ -0,0 +1,232 @@
+# analyzer/stream_join.py
+"""
+多主题流式对齐 - 按 sensor_id 将温度/湿度/气压读数按事件时间对齐为合并读数
+
+每个传感器维护若干未完成的分组：新读数落入事件时间与分组锚点相差不超过
+tolerance 且尚缺该类型的分组，否则新建分组。三类数据到齐立即输出；
+水位线（该传感器已见的最大事件时间 - lateness）越过分组锚点时，
+已有温度与湿度的分组补上最近一次输出的气压后输出，其余丢弃；
+早于水位线到达的读数计为迟到并丢弃。事件时间回退超过 rewind 秒（重新回放、
+从更早的位置开始发布）时视为新的数据流：先输出旧流未完成的分组，再重置该传感器
+的水位线。长时间没有新数据的传感器由 sweep() 按到达时间（idle_timeout）清空
+未完成的分组。
+"""
+
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from common.reading import CombinedReading
+
+JOIN_FIELDS = ("temperature", "humidity", "pressure")
+_SLOT = {"temperature": 2, "humidity": 3, "pressure": 4}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def event_seconds(timestamp: str) -> Optional[float]:
+    """ISO 时间戳 -> 秒（无时区的时间按 1970-01-01 起算）；无法解析时返回 None"""
+    try:
+        dt = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is not None:
+        return dt.timestamp()
+    return (dt - _EPOCH).total_seconds()
+
+
+class _SensorState:
+    """单个传感器的对齐状态"""
+
+    __slots__ = ("groups", "max_time", "last_pressure", "location", "last_seen")
+
+    def __init__(self):
+        # 分组：[锚点秒数, 锚点时间戳字符串, 温度, 湿度, 气压]，按锚点升序
+        self.groups: List[list] = []
+        self.max_time = float("-inf")
+        self.last_pressure: Optional[float] = None
+        self.location: Optional[str] = None
+        self.last_seen = 0.0  # 最近一次收到读数的 monotonic 时刻
+
+
+class StreamJoiner:
+    """按传感器、按事件时间对齐多主题读数
+
+    on_join(CombinedReading) 在调用 add() 的线程中回调。
+    """
+
+    # 每处理多少条读数检查一次空闲传感器
+    SWEEP_INTERVAL = 1024
+
+    def __init__(self, on_join: Callable[[CombinedReading], None] = None,
+                 tolerance: float = 5.0, lateness: float = 5.0,
+                 idle_timeout: float = 10.0, default_pressure: float = 1013.0,
+                 rewind: float = 60.0):
+        self.on_join = on_join
+        self.tolerance = tolerance
+        self.lateness = lateness
+        # 回退超过该值（至少为 lateness）时按新数据流处理，而不是计为迟到
+        self.rewind = max(rewind, lateness)
+        self.idle_timeout = idle_timeout
+        self.default_pressure = default_pressure
+
+        self._sensors: Dict[str, _SensorState] = {}
+        self._time_cache: Dict[str, Optional[float]] = {}
+        self._since_sweep = 0
+
+        self.received = 0
+        self.joined = 0
+        self.late = 0
+        self.incomplete = 0
+        self.rewinds = 0
+
+    def __len__(self) -> int:
+        """当前跟踪的传感器数"""
+        return len(self._sensors)
+
+    def _event_time(self, timestamp: Optional[str]) -> Optional[float]:
+        # 同一时刻的多类读数/多个传感器共用时间戳，缓存最近的解析结果
+        cache = self._time_cache
+        seconds = cache.get(timestamp)
+        if seconds is None and timestamp not in cache:
+            seconds = event_seconds(timestamp) if timestamp else None
+            if len(cache) > 4096:
+                cache.clear()
+            cache[timestamp] = seconds
+        return seconds
+
+    def add(self, sensor_id: str, data_type: str, value: float,
+            timestamp: str = None, location: str = None) -> bool:
+        """加入一条读数；返回是否被接受（迟到或类型未知时为 False）"""
+        slot = _SLOT.get(data_type)
+        if slot is None:
+            return False
+        self.received += 1
+        seconds = self._event_time(timestamp)
+        if seconds is None:
+            # 没有可用的事件时间时按到达时刻处理
+            now = datetime.now()
+            seconds = (now - _EPOCH).total_seconds()
+            timestamp = now.isoformat()
+
+        state = self._sensors.get(sensor_id)
+        if state is None:
+            state = self._sensors[sensor_id] = _SensorState()
+        if location:
+            state.location = location
+        state.last_seen = time.monotonic()
+        if seconds < state.max_time - self.rewind:
+            self.rewinds += 1
+            self._restart(sensor_id, state)
+        elif seconds < state.max_time - self.lateness:
+            self.late += 1
+            return False
+
+        # 从最新的分组向前查找可以并入的分组
+        groups = state.groups
+        target = None
+        for group in reversed(groups):
+            if abs(group[0] - seconds) <= self.tolerance:
+                if group[slot] is None:
+                    target = group
+                    break
+            elif group[0] < seconds - self.tolerance:
+                break
+        if target is None:
+            target = [seconds, timestamp, None, None, None]
+            if not groups or groups[-1][0] <= seconds:
+                groups.append(target)
+            else:
+                pos = len(groups)
+                while pos and groups[pos - 1][0] > seconds:
+                    pos -= 1
+                groups.insert(pos, target)
+        target[slot] = value
+
+        if target[2] is not None and target[3] is not None and target[4] is not None:
+            groups.remove(target)
+            self._emit(sensor_id, state, target)
+
+        if seconds > state.max_time:
+            state.max_time = seconds
+            self._expire(sensor_id, state, seconds - self.lateness)
+        self._since_sweep += 1
+        if self._since_sweep >= self.SWEEP_INTERVAL:
+            self.sweep()
+        return True
+
+    def _emit(self, sensor_id: str, state: _SensorState, group: list):
+        pressure = group[4]
+        if pressure is None:
+            pressure = state.last_pressure if state.last_pressure is not None else self.default_pressure
+        else:
+            state.last_pressure = pressure
+        self.joined += 1
+        if self.on_join:
+            self.on_join(CombinedReading(
+                temperature=group[2],
+                humidity=group[3],
+                pressure=pressure,
+                timestamp=group[1],
+                sensor_id=sensor_id,
+                location=state.location
+            ))
+
+    def _expire(self, sensor_id: str, state: _SensorState, watermark: float):
+        """输出/丢弃锚点早于水位线的分组"""
+        groups = state.groups
+        while groups and groups[0][0] < watermark:
+            group = groups.pop(0)
+            if group[2] is not None and group[3] is not None:
+                self._emit(sensor_id, state, group)
+            else:
+                self.incomplete += 1
+
+    def _restart(self, sensor_id: str, state: _SensorState):
+        """结束旧数据流：输出其未完成的分组并重置水位线"""
+        self._expire(sensor_id, state, float("inf"))
+        state.max_time = float("-inf")
+
+    def sweep(self):
+        """清空空闲超过 idle_timeout 的传感器的未完成分组"""
+        self._since_sweep = 0
+        deadline = time.monotonic() - self.idle_timeout
+        for sensor_id, state in list(self._sensors.items()):
+            if state.groups and state.last_seen < deadline:
+                self._expire(sensor_id, state, float("inf"))
+
+    def flush(self):
+        """输出全部未完成但已有温度与湿度的分组（停止时调用）"""
+        for sensor_id, state in list(self._sensors.items()):
+            self._expire(sensor_id, state, float("inf"))
+
+    def reset(self, sensor_id: str = None):
+        """开始新的数据流（例如重新开始发布）：输出未完成的分组并重置水位线
+
+        sensor_id 为 None 时重置全部传感器。
+        """
+        if sensor_id is None:
+            states = list(self._sensors.items())
+        else:
+            state = self._sensors.get(sensor_id)
+            states = [(sensor_id, state)] if state is not None else []
+        for sid, state in states:
+            self._restart(sid, state)
+
+    def forget(self, sensor_id: str):
+        """丢弃某个传感器的对齐状态"""
+        self._sensors.pop(sensor_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            "sensors": len(self._sensors),
+            "pending": sum(len(state.groups) for state in self._sensors.values()),
+            "received": self.received,
+            "joined": self.joined,
+            "late": self.late,
+            "incomplete": self.incomplete,
+            "rewinds": self.rewinds,
+        }
+
+
+__all__ = ["StreamJoiner", "JOIN_FIELDS", "event_seconds"]
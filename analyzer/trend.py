@@ -0,0 +1,139 @@
+# analyzer/trend.py
+"""
+增量线性趋势预测 - 滑动窗口上的闭式最小二乘
+
+窗口内的点以 x = 0..n-1 编号，维护 Σx、Σx²、Σy、Σxy 四个充分统计量；
+每追加一个点只做 O(1) 的更新（窗口满时移除最旧点并把 x 整体左移一位），
+温度、湿度、气压三列在同一组向量运算中同时更新与预测。
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+TREND_FIELDS = ("temperature", "humidity", "pressure")
+
+# 预测值的合理范围
+TREND_LIMITS = {
+    "temperature": (-10.0, 45.0),
+    "humidity": (0.0, 100.0),
+    "pressure": (900.0, 1100.0),
+}
+
+
+class IncrementalTrend:
+    """三列滑动窗口线性回归
+
+    update() 为 O(1)；predict() 由闭式解直接外推，不拟合任何模型。
+    累加误差每 REFRESH_INTERVAL 次更新从窗口数据精确重算一次。
+    """
+
+    REFRESH_INTERVAL = 1000
+
+    def __init__(self, window: int = 20):
+        if window < 2:
+            raise ValueError("window 至少为 2")
+        self.window = int(window)
+        width = len(TREND_FIELDS)
+        self._values = np.zeros((self.window, width), dtype=np.float64)
+        self._head = 0              # 最旧点在 _values 中的位置
+        self._n = 0
+        self._sum_x = 0.0
+        self._sum_xx = 0.0
+        self._sum_y = np.zeros(width, dtype=np.float64)
+        self._sum_xy = np.zeros(width, dtype=np.float64)
+        self._updates = 0
+        self._lo = np.array([TREND_LIMITS[f][0] for f in TREND_FIELDS])
+        self._hi = np.array([TREND_LIMITS[f][1] for f in TREND_FIELDS])
+
+    def __len__(self) -> int:
+        return self._n
+
+    def reset(self):
+        self._head = 0
+        self._n = 0
+        self._sum_x = self._sum_xx = 0.0
+        self._sum_y[:] = 0.0
+        self._sum_xy[:] = 0.0
+        self._updates = 0
+
+    def update(self, temperature: float, humidity: float, pressure: float):
+        """追加一个点"""
+        y = np.array((temperature, humidity, pressure), dtype=np.float64)
+        n = self._n
+        if n < self.window:
+            self._values[(self._head + n) % self.window] = y
+            self._sum_x += n
+            self._sum_xx += n * n
+            self._sum_y += y
+            self._sum_xy += n * y
+            self._n = n + 1
+        else:
+            # 移除 x=0 的最旧点，其余点 x 减 1，新点放在 x=n-1
+            self._sum_y -= self._values[self._head]
+            self._sum_xy -= self._sum_y
+            self._values[self._head] = y
+            self._head = (self._head + 1) % self.window
+            self._sum_y += y
+            self._sum_xy += (n - 1) * y
+
+        self._updates += 1
+        if self._updates % self.REFRESH_INTERVAL == 0:
+            self._refresh()
+
+    def extend(self, temperatures: Iterable[float], humidities: Iterable[float],
+               pressures: Iterable[float]):
+        """以序列末尾的 window 个点重建窗口"""
+        block = np.column_stack([np.asarray(temperatures, dtype=np.float64),
+                                 np.asarray(humidities, dtype=np.float64),
+                                 np.asarray(pressures, dtype=np.float64)])[-self.window:]
+        self.reset()
+        self._values[:len(block)] = block
+        self._n = len(block)
+        self._refresh()
+
+    def _ordered(self) -> np.ndarray:
+        """按时间顺序排列的窗口数据"""
+        idx = (self._head + np.arange(self._n)) % self.window
+        return self._values[idx]
+
+    def _refresh(self):
+        """由窗口数据精确重算充分统计量"""
+        x = np.arange(self._n, dtype=np.float64)
+        y = self._ordered()
+        self._sum_x = float(x.sum())
+        self._sum_xx = float((x * x).sum())
+        self._sum_y = y.sum(axis=0)
+        self._sum_xy = x @ y
+
+    def coefficients(self):
+        """返回 (slope, intercept)，均为按 TREND_FIELDS 排列的数组"""
+        n = self._n
+        if n == 0:
+            return np.zeros(len(TREND_FIELDS)), np.zeros(len(TREND_FIELDS))
+        denom = n * self._sum_xx - self._sum_x * self._sum_x
+        if denom == 0:
+            slope = np.zeros(len(TREND_FIELDS))
+        else:
+            slope = (n * self._sum_xy - self._sum_x * self._sum_y) / denom
+        intercept = (self._sum_y - slope * self._sum_x) / n
+        return slope, intercept
+
+    def predict(self, steps: int = 5) -> Optional[np.ndarray]:
+        """外推未来 steps 个点，返回形状 (steps, 3) 的数组；窗口为空时返回 None"""
+        if not self._n:
+            return None
+        slope, intercept = self.coefficients()
+        x = np.arange(self._n, self._n + steps, dtype=np.float64)[:, None]
+        return np.clip(intercept + slope * x, self._lo, self._hi)
+
+    def predict_dict(self, steps: int = 5, digits: int = 1) -> Dict[str, list]:
+        """按数据类型返回预测列表"""
+        forecast = self.predict(steps)
+        if forecast is None:
+            return {field: [] for field in TREND_FIELDS}
+        forecast = np.round(forecast, digits)
+        return {field: forecast[:, i].tolist() for i, field in enumerate(TREND_FIELDS)}
+
+
+__all__ = ["IncrementalTrend", "TREND_FIELDS", "TREND_LIMITS"]
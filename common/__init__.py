@@ -0,0 +1,20 @@
+# common/__init__.py
+"""
+公共模块
+发布端、订阅端与分析端共用的数据结构
+"""
+
+from .reading import (
+    SensorReading, CombinedReading, ComfortResult,
+    READING_DTYPE, COMFORT_DTYPE, readings_to_array, array_to_readings,
+)
+
+__all__ = [
+    "SensorReading",
+    "CombinedReading",
+    "ComfortResult",
+    "READING_DTYPE",
+    "COMFORT_DTYPE",
+    "readings_to_array",
+    "array_to_readings",
+]
@@ -0,0 +1,144 @@
+# common/downsample.py
+"""
+序列降采样 - 把任意长度的序列缩减到约每个水平像素一个点，同时保留极值
+
+lttb_indices    Largest-Triangle-Three-Buckets：每个桶选与相邻桶构成最大三角形的点，
+                折线形状最接近原序列
+minmax_indices  每个桶保留最小值与最大值（按时间顺序），峰谷一个不丢
+
+两者都返回被选中点的下标（升序），调用方可以用同一组下标取时间戳等其他列。
+DownsampleCache 按缩放级别（范围与目标点数）缓存下标，数据未变化时重绘只需一次字典查找。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+
+METHOD_LTTB = "lttb"
+METHOD_MINMAX = "minmax"
+METHODS = (METHOD_LTTB, METHOD_MINMAX)
+
+
+def lttb_indices(values, threshold: int, x=None) -> np.ndarray:
+    """LTTB 降采样到 threshold 个点，首尾两点总被保留"""
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    threshold = int(threshold)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:max(threshold, 1)]
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # 中间 n-2 个点均分为 threshold-2 个桶；edges[i]..edges[i+1] 为第 i 个桶
+    every = (n - 2) / (threshold - 2)
+    edges = np.append((np.arange(threshold - 1) * every).astype(np.int64) + 1, n)
+    edges[threshold - 2] = n - 1
+    # 各桶均值由前缀和直接得到
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    counts = np.diff(edges)
+    mean_x = (cx[edges[1:]] - cx[edges[:-1]]) / counts
+    mean_y = (cy[edges[1:]] - cy[edges[:-1]]) / counts
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 三角形 (上一个选中点, 本桶候选点, 下一个桶的均值点) 的面积（省略常数 1/2）
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(values, buckets: int) -> np.ndarray:
+    """分为 buckets 个等长桶，每桶保留最小值与最大值的下标（最多 2*buckets+2 个点）"""
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    buckets = max(1, int(buckets))
+    if 2 * buckets >= n:
+        return np.arange(n)
+    size = -(-n // buckets)
+    rows = -(-n // size)
+    padded = np.pad(y, (0, rows * size - n), mode="edge").reshape(rows, size)
+    base = np.arange(rows) * size
+    lows = np.minimum(base + padded.argmin(axis=1), n - 1)
+    highs = np.minimum(base + padded.argmax(axis=1), n - 1)
+    selected = np.concatenate(([0], np.sort(np.stack([lows, highs], axis=1), axis=1).ravel(), [n - 1]))
+    # 去掉相邻重复（最小与最大为同一点，或与首尾点重合）
+    return selected[np.concatenate(([True], np.diff(selected) != 0))]
+
+
+def downsample_indices(values, points: int, method: str = METHOD_MINMAX, x=None) -> np.ndarray:
+    """降采样到约 points 个点；minmax 每两个输出点对应一个桶"""
+    if method == METHOD_LTTB:
+        return lttb_indices(values, points, x)
+    if method == METHOD_MINMAX:
+        return minmax_indices(values, max(1, points // 2))
+    raise ValueError(f"未知的降采样方法: {method}")
+
+
+class DownsampleCache:
+    """按 (方法, 范围, 目标点数) 缓存降采样下标与取值范围
+
+    version 由调用方在数据变化时递增；同一缩放级别在数据未变化时直接命中，
+    不同缩放级别各占一个条目（LRU，最多 maxsize 个）。
+    """
+
+    def __init__(self, method: str = METHOD_MINMAX, maxsize: int = 8):
+        if method not in METHODS:
+            raise ValueError(f"未知的降采样方法: {method}")
+        self.method = method
+        self.maxsize = max(1, int(maxsize))
+        self._data: "OrderedDict[Hashable, Tuple[int, np.ndarray, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, values: np.ndarray, points: int, version: int, start: int = 0,
+            stop: Optional[int] = None, x=None) -> Tuple[np.ndarray, float, float]:
+        """返回 values[start:stop] 降采样后的下标（相对 start）以及该范围的最小值、最大值"""
+        stop = len(values) if stop is None else stop
+        key = (self.method, start, stop, int(points))
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2], entry[3]
+        window = values[start:stop]
+        if len(window):
+            indices = downsample_indices(window, points, self.method,
+                                         None if x is None else x[start:stop])
+            low, high = float(np.min(window)), float(np.max(window))
+        else:
+            indices, low, high = np.arange(0), 0.0, 0.0
+        with self._lock:
+            self.misses += 1
+            self._data[key] = (version, indices, low, high)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return indices, low, high
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+__all__ = [
+    "lttb_indices",
+    "minmax_indices",
+    "downsample_indices",
+    "DownsampleCache",
+    "METHOD_LTTB",
+    "METHOD_MINMAX",
+]
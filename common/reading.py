@@ -0,0 +1,232 @@
+# common/reading.py
+"""
+传感器读数记录 - 发布端、订阅端与分析端共用的紧凑记录类型
+
+单条读数使用 __slots__ 记录（同时支持 dict 式访问，兼容沿用 dict 接口的代码），
+批量读数使用 NumPy 结构化数组（array-of-struct）。
+"""
+
+import json
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+# 数据类型编码（结构化数组中以 uint8 存储）
+SENSOR_TYPES = ("temperature", "humidity", "pressure")
+TYPE_CODES = {name: code for code, name in enumerate(SENSOR_TYPES)}
+
+# 批量读数的结构化数组布局（数值与归档、时序存储一致使用 float64；
+# 字符串字段定长，超长的传感器 ID / 位置由 check_text_width() 拒绝而不是截断）
+READING_DTYPE = np.dtype([
+    ("timestamp", "datetime64[s]"),
+    ("value", "f8"),
+    ("type", "u1"),
+    ("sensor_id", "U64"),
+    ("location", "U32"),
+])
+
+# 批量舒适度结果的结构化数组布局（字段与 ComfortResult 对应，不含时间戳）
+COMFORT_DTYPE = np.dtype([
+    ("temperature", "f4"),
+    ("humidity", "f4"),
+    ("pressure", "f4"),
+    ("thi", "f4"),
+    ("feels_like", "f4"),
+    ("comfort_score", "f4"),
+    ("comfort_level", "U18"),
+    ("comfort_level_cn", "U5"),
+])
+
+
+class _Record:
+    """slots 记录的 dict 式访问：get()/[]/in/keys()/to_dict()
+
+    子类通过 _fields 声明对外可见的字段，值为 None 的字段视为不存在。
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    def keys(self):
+        return [name for name in self._fields if getattr(self, name) is not None]
+
+    def __contains__(self, key) -> bool:
+        return key in self._fields and getattr(self, key) is not None
+
+    def __getitem__(self, key):
+        if key in self:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return getattr(self, key)
+        return default
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.keys()}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.keys())
+        return f"{type(self).__name__}({fields})"
+
+
+class SensorReading(_Record):
+    """单条传感器读数（与发布端载荷格式一一对应）
+
+    payload 为原始载荷：订阅端保留收到的字节并在首次访问时解码，
+    发布端则按需序列化。
+    """
+
+    __slots__ = ("topic", "timestamp", "value", "sensor_id", "location",
+                 "extra", "type", "_raw")
+    _fields = ("topic", "payload", "timestamp", "value", "sensor_id",
+               "location", "extra", "type")
+
+    # 发布端载荷字段
+    PAYLOAD_FIELDS = ("timestamp", "value", "sensor_id", "location", "extra", "type")
+
+    def __init__(self, type: str, value, timestamp: str = None,
+                 sensor_id: str = None, location: str = None, extra: str = None,
+                 topic: str = None, raw: Union[bytes, memoryview, str] = None):
+        self.type = type
+        self.value = value
+        self.timestamp = timestamp
+        self.sensor_id = sensor_id
+        self.location = location
+        self.extra = extra
+        self.topic = topic if topic is not None else f"sensor/{type}"
+        self._raw = raw
+
+    @property
+    def payload(self) -> str:
+        """原始载荷文本（首次访问时解码或序列化）"""
+        raw = self._raw
+        if raw is None:
+            raw = self.to_json()
+        elif not isinstance(raw, str):
+            raw = bytes(raw).decode("utf-8", errors="ignore").strip()
+        self._raw = raw
+        return raw
+
+    def to_payload(self) -> Dict:
+        """发布端载荷 dict"""
+        return {name: getattr(self, name) for name in self.PAYLOAD_FIELDS}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_payload(), ensure_ascii=False)
+
+    @classmethod
+    def from_payload(cls, data: Dict, topic: str = None, raw=None) -> "SensorReading":
+        return cls(data.get("type"), data.get("value"), data.get("timestamp"),
+                   data.get("sensor_id"), data.get("location"), data.get("extra"),
+                   topic, raw)
+
+
+class CombinedReading(_Record):
+    """同一传感器的温度/湿度/气压合并读数（分析端的输入）"""
+
+    __slots__ = ("temperature", "humidity", "pressure", "timestamp",
+                 "sensor_id", "location", "topic")
+    _fields = __slots__
+
+    def __init__(self, temperature: float, humidity: float, pressure: float = 1013.0,
+                 timestamp: str = None, sensor_id: str = None, location: str = None,
+                 topic: str = "sensor/combined"):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.pressure = pressure
+        self.timestamp = timestamp
+        self.sensor_id = sensor_id
+        self.location = location
+        self.topic = topic
+
+
+class ComfortResult(_Record):
+    """舒适度计算结果（ComfortModel.calculate_comfort_index 的返回值）"""
+
+    __slots__ = ("temperature", "humidity", "pressure", "thi", "feels_like",
+                 "comfort_score", "comfort_level", "comfort_level_cn", "timestamp")
+    _fields = __slots__
+
+    def __init__(self, temperature, humidity, pressure, thi, feels_like,
+                 comfort_score, comfort_level, comfort_level_cn, timestamp=None):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.pressure = pressure
+        self.thi = thi
+        self.feels_like = feels_like
+        self.comfort_score = comfort_score
+        self.comfort_level = comfort_level
+        self.comfort_level_cn = comfort_level_cn
+        self.timestamp = timestamp
+
+
+# ========== 批量形式 ==========
+def check_text_width(field: str, values: Iterable[str]):
+    """检查字符串是否放得进 READING_DTYPE 的定长字段，超长时抛出 ValueError"""
+    width = READING_DTYPE[field].itemsize // 4
+    for value in values:
+        if value and len(value) > width:
+            raise ValueError(f"{field} 超过 {width} 个字符: {value!r}")
+
+
+def readings_to_array(readings: Iterable[SensorReading]) -> np.ndarray:
+    """将读数序列打包为 READING_DTYPE 结构化数组（未知类型的读数被跳过）
+
+    传感器 ID 或位置超过字段宽度时抛出 ValueError。
+    """
+    rows = []
+    for r in readings:
+        code = TYPE_CODES.get(r.type)
+        if code is None:
+            continue
+        try:
+            value = float(r.value)
+        except (TypeError, ValueError):
+            continue
+        rows.append((np.datetime64(r.timestamp, "s") if r.timestamp else np.datetime64("NaT"),
+                     value, code, r.sensor_id or "", r.location or ""))
+    check_text_width("sensor_id", (row[3] for row in rows))
+    check_text_width("location", (row[4] for row in rows))
+    return np.array(rows, dtype=READING_DTYPE)
+
+
+def array_to_readings(batch: np.ndarray) -> List[SensorReading]:
+    """结构化数组还原为 SensorReading 列表"""
+    stamps = np.datetime_as_string(batch["timestamp"], unit="s")
+    return [
+        SensorReading(SENSOR_TYPES[code], float(value), None if ts == "NaT" else str(ts),
+                      str(sid) or None, str(loc) or None)
+        for ts, value, code, sid, loc in zip(stamps, batch["value"], batch["type"],
+                                             batch["sensor_id"], batch["location"])
+    ]
+
+
+def empty_batch(size: int = 0) -> np.ndarray:
+    """创建指定长度的空批量数组"""
+    return np.zeros(size, dtype=READING_DTYPE)
+
+
+def select_type(batch: np.ndarray, data_type: str) -> np.ndarray:
+    """从批量数组中筛选某一数据类型（返回副本）"""
+    code = TYPE_CODES.get(data_type)
+    if code is None:
+        return batch[:0]
+    return batch[batch["type"] == code]
+
+
+__all__ = [
+    "SensorReading",
+    "CombinedReading",
+    "ComfortResult",
+    "READING_DTYPE",
+    "COMFORT_DTYPE",
+    "SENSOR_TYPES",
+    "TYPE_CODES",
+    "readings_to_array",
+    "array_to_readings",
+    "empty_batch",
+    "select_type",
+    "check_text_width",
+]
@@ -1,4 +1,5 @@
 # publisher/__init__.py
 from .publish_logic import PublisherLogic
+from .fleet import FleetSimulator
 
-__all__ = ["PublisherLogic"]
+__all__ = ["PublisherLogic", "FleetSimulator"]
@@ -0,0 +1,192 @@
+# publisher/archive.py
+# 列式二进制归档：int64 时间戳（epoch 秒）+ float64 数值，使用 numpy.memmap 只读映射
+#
+# 文件布局（小端）：
+#   [0:8)    魔数 b"XJCOL002"（旧版 b"XJCOL001" 的数值列为 float32）
+#   [8:16)   记录数 N（uint64）
+#   [16:16+8N)        时间戳列（int64，按时间升序）
+#   [16+8N:16+16N)    数值列（float64，与 txt 中解析出的数值完全一致）
+#
+# 用法：python -m publisher.archive [txt文件...]   将 txt 数据一次性转换为 *.col
+
+import shutil
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .replay import FileIndex
+
+ARCHIVE_MAGIC = b"XJCOL002"
+# 魔数 -> 数值列类型；旧版 float32 归档仍可读取，但回放时视为过期（见 open_archive）
+_VALUE_DTYPES = {ARCHIVE_MAGIC: "<f8", b"XJCOL001": "<f4"}
+ARCHIVE_SUFFIX = ".col"
+_HEADER = struct.Struct("<8sQ")
+_CHUNK = 4096
+
+
+def archive_path_for(source) -> Path:
+    """返回 txt 数据文件对应的归档路径（temperature.txt -> temperature.col）"""
+    return Path(source).with_suffix(ARCHIVE_SUFFIX)
+
+
+def iso_to_epoch(ts: str) -> int:
+    """ISO 时间戳（无时区）转换为 epoch 秒"""
+    return int(np.datetime64(ts, "s").astype(np.int64))
+
+
+def epoch_to_iso(values: np.ndarray) -> np.ndarray:
+    """epoch 秒数组批量转换为 ISO 时间戳字符串数组"""
+    return np.datetime_as_string(np.asarray(values, dtype=np.int64).astype("datetime64[s]"), unit="s")
+
+
+class ColumnArchive:
+    """只读列式归档，时间戳与数值两列均为 numpy.memmap，不占用常驻内存"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.timestamps: np.ndarray = np.empty(0, dtype=np.int64)
+        self.values: np.ndarray = np.empty(0, dtype=np.float64)
+        self.magic = ARCHIVE_MAGIC
+        self._open()
+
+    def _open(self):
+        with self.path.open("rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"归档文件头不完整: {self.path}")
+        magic, count = _HEADER.unpack(header)
+        value_dtype = _VALUE_DTYPES.get(magic)
+        if value_dtype is None:
+            raise ValueError(f"不是有效的归档文件: {self.path}")
+        self.magic = magic
+        if count:
+            self.timestamps = np.memmap(self.path, dtype="<i8", mode="r",
+                                        offset=_HEADER.size, shape=(count,))
+            self.values = np.memmap(self.path, dtype=value_dtype, mode="r",
+                                    offset=_HEADER.size + 8 * count, shape=(count,))
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def seek(self, start: str) -> int:
+        """二分查找第一条时间戳 >= start 的记录位置"""
+        return int(np.searchsorted(self.timestamps, iso_to_epoch(start), side="left"))
+
+    def iter_records(self, start: str = None) -> Iterator[Tuple[str, float]]:
+        """按时间顺序产出 (ISO时间戳, 数值)，分块转换以保持内存平稳"""
+        first = self.seek(start) if start else 0
+        for pos in range(first, len(self), _CHUNK):
+            stamps = epoch_to_iso(self.timestamps[pos:pos + _CHUNK])
+            values = self.values[pos:pos + _CHUNK].tolist()
+            yield from zip(stamps.tolist(), values)
+
+    def to_batch(self, data_type: str, start: str = None, end: str = None) -> np.ndarray:
+        """将 [start, end) 范围内的记录转换为 READING_DTYPE 结构化数组"""
+        from common.reading import TYPE_CODES, empty_batch
+
+        first = self.seek(start) if start else 0
+        last = self.seek(end) if end else len(self)
+        batch = empty_batch(max(0, last - first))
+        batch["timestamp"] = self.timestamps[first:last]
+        batch["value"] = self.values[first:last]
+        batch["type"] = TYPE_CODES[data_type]
+        return batch
+
+
+def write_archive(path, records: Iterator[Tuple[int, float]]) -> int:
+    """将按时间排序的 (epoch秒, 数值) 流写成归档文件，返回记录数
+
+    数值列先写入临时文件，最后拼接到时间戳列之后，整个过程只缓存一个分块。
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    with tmp_path.open("wb") as out, tempfile.TemporaryFile() as value_col:
+        out.write(_HEADER.pack(ARCHIVE_MAGIC, 0))
+        stamps, values = [], []
+        for ts, val in records:
+            stamps.append(ts)
+            values.append(val)
+            if len(stamps) >= _CHUNK:
+                out.write(np.asarray(stamps, dtype="<i8").tobytes())
+                value_col.write(np.asarray(values, dtype="<f8").tobytes())
+                count += len(stamps)
+                stamps, values = [], []
+        if stamps:
+            out.write(np.asarray(stamps, dtype="<i8").tobytes())
+            value_col.write(np.asarray(values, dtype="<f8").tobytes())
+            count += len(stamps)
+        value_col.seek(0)
+        shutil.copyfileobj(value_col, out)
+        out.seek(0)
+        out.write(_HEADER.pack(ARCHIVE_MAGIC, count))
+    tmp_path.replace(path)
+    return count
+
+
+def convert_text_file(source, target=None) -> Path:
+    """将一个 {时间戳: 值} 格式的 txt 文件转换为列式归档，无法解析的数值会被跳过"""
+    source = Path(source)
+    target = Path(target) if target else archive_path_for(source)
+
+    def _records():
+        for ts, val in FileIndex(source).iter_records():
+            try:
+                yield iso_to_epoch(ts), float(val)
+            except (TypeError, ValueError):
+                continue
+
+    write_archive(target, _records())
+    return target
+
+
+def open_archive(source) -> Optional[ColumnArchive]:
+    """若 txt 文件存在不旧于它的归档，则打开归档；否则返回 None
+
+    旧版（float32 数值列）归档在 txt 存在时视为过期，回放改读 txt 以保持数值不变。
+    """
+    source = Path(source)
+    target = archive_path_for(source)
+    try:
+        if source.exists() and target.stat().st_mtime_ns < source.stat().st_mtime_ns:
+            return None
+        archive = ColumnArchive(target)
+    except (OSError, ValueError):
+        return None
+    if archive.magic != ARCHIVE_MAGIC and source.exists():
+        return None
+    return archive
+
+
+def convert_all(files: Dict[str, Path]) -> Dict[str, Path]:
+    """批量转换，返回 数据类型 -> 归档路径"""
+    return {dtype: convert_text_file(path) for dtype, path in files.items() if Path(path).exists()}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        files = {Path(p).stem: Path(p) for p in argv}
+    else:
+        base_dir = Path(__file__).parent
+        files = {name: base_dir / f"{name}.txt" for name in ("temperature", "humidity", "pressure")}
+    for dtype, target in convert_all(files).items():
+        print(f"{dtype}: {target} ({len(ColumnArchive(target))} 条)")
+
+
+__all__ = [
+    "ColumnArchive",
+    "archive_path_for",
+    "convert_text_file",
+    "convert_all",
+    "open_archive",
+    "write_archive",
+]
+
+
+if __name__ == "__main__":
+    main()
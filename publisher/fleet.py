@@ -0,0 +1,237 @@
+# publisher/fleet.py
+# 多传感器车队模拟：基于 PublisherLogic 的档案回放，模拟成百上千个传感器同时发布
+
+import math
+import random
+import threading
+from typing import Callable, Dict, List, Optional
+
+import paho.mqtt.client as mqtt
+
+from common.map_points import DEFAULT_LOCATION_POINTS, DEFAULT_SENSOR_POINTS
+from common.reading import SensorReading
+from .publish_logic import PublisherLogic
+from .replay import check_start_at, iso_seconds
+from .scheduler import ReplayClock, TokenBucket, default_batch_size
+
+# 各数据类型的传感器固有偏差（标准差），每条消息另加 NOISE_RATIO 倍的随机噪声
+DEFAULT_JITTER = {
+    "temperature": 1.5,
+    "humidity": 5.0,
+    "pressure": 2.0,
+}
+NOISE_RATIO = 0.2
+
+
+class SimulatedSensor:
+    """车队中的单个模拟传感器：固定的 ID/位置 + 各数据类型的固有偏差"""
+
+    __slots__ = ("sensor_id", "location", "extra", "offsets")
+
+    def __init__(self, sensor_id: str, location: str, extra: str = "",
+                 offsets: Dict[str, float] = None):
+        self.sensor_id = sensor_id
+        self.location = location
+        self.extra = extra
+        self.offsets = offsets or {}
+
+
+def build_fleet(count: int, locations: List[str] = None, id_prefix: str = None,
+                jitter: Dict[str, float] = None, seed: int = None) -> List[SimulatedSensor]:
+    """生成 count 个模拟传感器，轮流分布到各个位置
+
+    locations 默认取地图预设坐标中的全部位置（DEFAULT_LOCATION_POINTS 与
+    DEFAULT_SENSOR_POINTS 的标签），id_prefix 默认取 DEFAULT_SENSOR_POINTS 的首个 ID。
+    """
+    if not locations:
+        locations = list(DEFAULT_LOCATION_POINTS)
+        for _, _, label in DEFAULT_SENSOR_POINTS.values():
+            if label not in locations:
+                locations.append(label)
+    if not id_prefix:
+        id_prefix = next(iter(DEFAULT_SENSOR_POINTS), "Sensor")
+    jitter = DEFAULT_JITTER if jitter is None else jitter
+    rng = random.Random(seed)
+
+    fleet = []
+    for i in range(count):
+        location = locations[i % len(locations)]
+        offsets = {dtype: rng.gauss(0, sigma) for dtype, sigma in jitter.items()}
+        fleet.append(SimulatedSensor(f"{id_prefix}_{i + 1:04d}", location,
+                                     f"模拟节点{i + 1}", offsets))
+    return fleet
+
+
+class FleetSimulator:
+    """车队模式：N 个传感器共享少量发布线程与 MQTT 连接
+
+    传感器按序号分片到 pool_size 个工作线程，每个线程持有一个 MQTT 连接，
+    各自流式回放同一份档案，并为分片内的每个传感器叠加偏差与噪声后发布。
+    """
+
+    def __init__(self,
+                 count: int = 100,
+                 broker: str = "127.0.0.1",
+                 port: int = 1883,
+                 keepalive: int = 60,
+                 pool_size: int = 4,
+                 jitter: Dict[str, float] = None,
+                 seed: int = None,
+                 logic: PublisherLogic = None):
+        self.broker = broker
+        self.port = port
+        self.keepalive = keepalive
+        self.pool_size = max(1, int(pool_size))
+        self.jitter = DEFAULT_JITTER if jitter is None else jitter
+
+        # 复用 PublisherLogic 的数据文件、索引与类型过滤
+        self.logic = logic or PublisherLogic(broker, port, keepalive)
+        self.sensors = build_fleet(count, jitter=self.jitter, seed=seed)
+
+        self._rng = random.Random(seed)
+        self._threads: List[threading.Thread] = []
+        self._clients: List[mqtt.Client] = []
+        self._stop_flag = False
+        # 每个工作线程只写自己的计数槽，无需加锁
+        self._sent: List[int] = []
+
+        self._on_publish_complete_cb: Optional[Callable] = None
+
+    # -------- 对外接口 --------
+    def set_on_publish_complete(self, callback: Callable):
+        """设置全部工作线程发布完成后的回调"""
+        self._on_publish_complete_cb = callback
+
+    def start(self, rate: float = None, speed: float = None,
+              start_at: str = None, batch_size: int = None) -> bool:
+        """启动车队发布
+
+        rate: 全车队总速率（条/秒），平均分配到各工作线程；默认不限速
+        speed: 指定后按档案时间间隔回放（见 PublisherLogic.start_publish_from_files）
+        start_at: 起始 ISO 时间戳；格式无效时抛出 ValueError
+        """
+        if self.is_running():
+            return False
+        check_start_at(start_at)
+
+        shards = [self.sensors[i::self.pool_size] for i in range(self.pool_size)]
+        shards = [shard for shard in shards if shard]
+        if not shards:
+            return False
+
+        # 预先建立时间索引，避免各工作线程并发重建
+        self.logic.count_records()
+
+        self._stop_flag = False
+        self._sent = [0] * len(shards)
+        self._clients = []
+        self._threads = []
+        for i, shard in enumerate(shards):
+            client = mqtt.Client(client_id=f"xiaojia-fleet-{i}")
+            try:
+                client.connect(self.broker, self.port, self.keepalive)
+                client.loop_start()
+            except Exception as e:
+                print(f"车队连接失败: {e}")
+                self._shutdown_clients()
+                return False
+            self._clients.append(client)
+
+            if speed is not None:
+                pacer = ReplayClock(speed)
+            else:
+                shard_rate = math.inf if rate is None else rate / len(shards)
+                pacer = TokenBucket(shard_rate, batch_size or default_batch_size(shard_rate))
+            thread = threading.Thread(
+                target=self._shard_worker,
+                args=(i, client, shard, pacer, start_at),
+                daemon=True
+            )
+            self._threads.append(thread)
+
+        for thread in self._threads:
+            thread.start()
+        threading.Thread(target=self._wait_complete, daemon=True).start()
+        return True
+
+    def stop(self):
+        """停止发布并断开全部连接"""
+        self._stop_flag = True
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._shutdown_clients()
+
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    @property
+    def published(self) -> int:
+        """已发布的消息总数"""
+        return sum(self._sent)
+
+    # -------- 内部方法 --------
+    def _payload(self, sensor: SimulatedSensor, rng: random.Random,
+                 ts: str, dtype: str, value: float) -> str:
+        sigma = self.jitter.get(dtype, 0.0) * NOISE_RATIO
+        jittered = value + sensor.offsets.get(dtype, 0.0)
+        if sigma:
+            jittered += rng.gauss(0, sigma)
+        return SensorReading(dtype, round(jittered, 2), ts, sensor.sensor_id,
+                             sensor.location, sensor.extra).to_json()
+
+    def _shard_worker(self, slot: int, client: mqtt.Client,
+                      shard: List[SimulatedSensor], pacer, start_at: str = None):
+        """单个工作线程：回放档案，每条记录为分片内全部传感器各发布一次"""
+        rng = random.Random(self._rng.random())
+        should_stop = lambda: self._stop_flag
+        timed = isinstance(pacer, ReplayClock)
+        tokens = 0
+
+        for ts, dtype, val in self.logic.iter_records(start_at):
+            if self._stop_flag:
+                break
+            try:
+                num_val = float(val)
+            except (TypeError, ValueError):
+                continue
+            if dtype not in self.logic.enabled_types:
+                continue
+
+            if timed:
+                try:
+                    if not pacer.wait_until(iso_seconds(ts), should_stop):
+                        break
+                except ValueError:
+                    continue
+
+            topic = f"sensor/{dtype}"
+            for sensor in shard:
+                if not timed:
+                    if tokens == 0:
+                        tokens = pacer.acquire(should_stop=should_stop)
+                        if tokens == 0:
+                            break
+                    tokens -= 1
+                try:
+                    client.publish(topic, self._payload(sensor, rng, ts, dtype, num_val))
+                    self._sent[slot] += 1
+                except Exception:
+                    pass
+
+    def _wait_complete(self):
+        for thread in self._threads:
+            thread.join()
+        if self._on_publish_complete_cb and not self._stop_flag:
+            self._on_publish_complete_cb()
+
+    def _shutdown_clients(self):
+        for client in self._clients:
+            try:
+                client.loop_stop()
+                client.disconnect()
+            except Exception:
+                pass
+        self._clients = []
+
+
+__all__ = ["FleetSimulator", "SimulatedSensor", "build_fleet"]
@@ -2,6 +2,7 @@
 # MQTT 发布端逻辑封装，供 GUI 调用
 
 import json
+import math
 import threading
 import time
 from pathlib import Path
@@ -9,6 +10,10 @@ from typing import Callable, Optional
 
 import paho.mqtt.client as mqtt
 
+from common.reading import SensorReading
+from .replay import ReplayEngine, check_start_at, iso_seconds
+from .scheduler import ReplayClock, TokenBucket, default_batch_size
+
 
 class PublisherLogic:
     """封装 paho-mqtt 发布端，提供数据发布接口"""
@@ -28,6 +33,7 @@ class PublisherLogic:
             "humidity": self.base_dir / "humidity.txt",
             "pressure": self.base_dir / "pressure.txt",
         }
+        self._replay = ReplayEngine(self.files)
 
         # 传感器配置
         self.sensor_id = "JX_Teach_01"
@@ -49,8 +55,8 @@ class PublisherLogic:
         self._on_publish_complete_cb: Optional[Callable, None] = None
 
     # -------- 对外接口 --------
-    def set_on_message(self, callback: Callable[[str, dict], None]):
-        """设置消息发布回调，参数为 (topic, payload_dict)"""
+    def set_on_message(self, callback: Callable[[str, SensorReading], None]):
+        """设置消息发布回调，参数为 (topic, SensorReading)，读数支持 dict 式访问"""
         self._on_message_cb = callback
 
     def set_on_connection(self, callback: Callable[[bool], None]):
@@ -110,34 +116,49 @@ class PublisherLogic:
             from datetime import datetime
             timestamp = datetime.now().isoformat()
 
-        payload = {
-            "timestamp": timestamp,
-            "value": value,
-            "sensor_id": self.sensor_id,
-            "location": self.location,
-            "extra": self.extra,
-            "type": data_type,
-        }
-        topic = f"sensor/{data_type}"
-        
+        reading = SensorReading(data_type, value, timestamp,
+                                self.sensor_id, self.location, self.extra)
+        topic = reading.topic
+
         try:
-            self._client.publish(topic, json.dumps(payload, ensure_ascii=False))
+            self._client.publish(topic, reading.payload)
             if self._on_message_cb:
-                self._on_message_cb(topic, payload)
+                self._on_message_cb(topic, reading)
             return True
         except Exception as e:
             print(f"发布失败: {e}")
             return False
 
-    def start_publish_from_files(self, interval: float = 0.2):
-        """从文件读取数据并开始发布（后台线程）"""
+    def start_publish_from_files(self, interval: float = 0.2,
+                                 rate: float = None, batch_size: int = None,
+                                 speed: float = None, start_at: str = None):
+        """从文件读取数据并开始发布（后台线程）
+
+        interval: 每条消息的间隔（秒），未指定 rate 时等价于 rate = 1 / interval，
+                  为 0 时不限速
+        rate: 目标发布速率（条/秒），math.inf 表示尽可能快
+        batch_size: 每次唤醒最多发布的条数，默认按速率自动估算
+        speed: 指定后按档案时间戳的原始间隔回放，间隔除以 speed
+               （1 为实时，60 为 60 倍速，math.inf 为尽可能快），此时忽略 interval/rate
+        start_at: 起始 ISO 时间戳，通过索引直接定位；格式无效时抛出 ValueError
+        """
         if self._publish_thread and self._publish_thread.is_alive():
             return False
+        check_start_at(start_at)
+
+        if rate is None:
+            rate = 1.0 / interval if interval > 0 else math.inf
+        if batch_size is None:
+            batch_size = default_batch_size(rate)
 
         self._stop_flag = False
+        if speed is not None:
+            target, args = self._replay_worker, (ReplayClock(speed), start_at)
+        else:
+            target, args = self._publish_worker, (rate, batch_size, start_at)
         self._publish_thread = threading.Thread(
-            target=self._publish_worker,
-            args=(interval,),
+            target=target,
+            args=args,
             daemon=True
         )
         self._publish_thread.start()
@@ -153,52 +174,73 @@ class PublisherLogic:
         """检查是否正在发布"""
         return self._publish_thread and self._publish_thread.is_alive()
 
+    def iter_records(self, start: str = None):
+        """按时间顺序流式产出 (ts, dtype, val)，不会一次性载入全部数据
+
+        start: 起始 ISO 时间戳，通过索引定位而不扫描之前的数据
+        """
+        return self._replay.iter_records(start)
+
+    def count_records(self) -> int:
+        """基于时间索引统计记录总数"""
+        return self._replay.count()
+
     def load_records(self):
-        """加载并排序所有数据记录"""
-        all_items = []
-        for dtype, path in self.files.items():
-            if not path.exists():
-                continue
-            with path.open(encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        data = json.loads(line)
-                        for ts, val in data.items():
-                            all_items.append((ts, dtype, val))
-                    except json.JSONDecodeError:
-                        continue
-        # 按时间排序
-        all_items.sort(key=lambda x: x[0])
-        return all_items
+        """加载并排序所有数据记录（一次性列表，兼容旧接口）"""
+        return list(self.iter_records())
 
     # -------- 内部方法 --------
-    def _publish_worker(self, interval: float):
-        """后台发布线程"""
-        records = self.load_records()
-        total = len(records)
+    def _publish_worker(self, rate: float, batch_size: int, start_at: str = None):
+        """后台发布线程：令牌桶限速，被过滤的记录不占用发送配额"""
+        bucket = TokenBucket(rate, batch_size)
+        records = self.iter_records(start_at)
         published = 0
+        exhausted = False
+
+        while not exhausted and not self._stop_flag:
+            tokens = bucket.acquire(batch_size, lambda: self._stop_flag)
+            while tokens > 0:
+                record = next(records, None)
+                if record is None:
+                    exhausted = True
+                    break
+                ts, dtype, val = record
+
+                try:
+                    num_val = float(val)
+                except (TypeError, ValueError):
+                    continue
+
+                # 根据启用的类型进行过滤
+                if dtype not in self.enabled_types:
+                    continue
+
+                if self.publish_single(dtype, num_val, ts):
+                    published += 1
+                tokens -= 1
+
+        # 发布完成
+        if self._on_publish_complete_cb:
+            self._on_publish_complete_cb()
 
-        for ts, dtype, val in records:
+    def _replay_worker(self, clock: ReplayClock, start_at: str = None):
+        """后台发布线程：保持档案时间戳的原始间隔（按倍速缩放）"""
+        for ts, dtype, val in self.iter_records(start_at):
             if self._stop_flag:
                 break
 
             try:
                 num_val = float(val)
+                archive_time = iso_seconds(ts)
             except (TypeError, ValueError):
                 continue
 
-            # 根据启用的类型进行过滤
             if dtype not in self.enabled_types:
-                time.sleep(interval)
                 continue
 
-            if self.publish_single(dtype, num_val, ts):
-                published += 1
-
-            time.sleep(interval)
+            if not clock.wait_until(archive_time, lambda: self._stop_flag):
+                break
+            self.publish_single(dtype, num_val, ts)
 
         # 发布完成
         if self._on_publish_complete_cb:
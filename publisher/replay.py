@@ -0,0 +1,232 @@
+# publisher/replay.py
+# 流式回放引擎：为数据文件建立时间索引，并对多路数据做惰性 k 路归并
+
+import bisect
+import heapq
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+# 索引文件后缀与版本（格式变化时递增版本号，旧索引自动重建）
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def iso_seconds(ts: str) -> float:
+    """ISO 时间戳转换为 epoch 秒（无时区按 UTC 处理），用于计算档案内的时间间隔"""
+    dt = datetime.fromisoformat(ts)
+    if dt.tzinfo is not None:
+        return dt.timestamp()
+    return (dt - _EPOCH).total_seconds()
+
+
+def check_start_at(start_at: str = None):
+    """校验起始时间戳，无效时在调用方线程中抛出 ValueError（None 表示从头开始）"""
+    if start_at is None:
+        return
+    try:
+        datetime.fromisoformat(start_at)
+    except (TypeError, ValueError):
+        raise ValueError(f"start_at 不是有效的 ISO 时间戳: {start_at!r}") from None
+
+
+class FileIndex:
+    """单个数据文件的时间索引
+
+    数据文件每行是一个 {ISO时间戳: 值} 的 JSON 对象。索引为每一行记录
+    [最小时间戳, 最大时间戳, 字节偏移, 字节长度, 记录数]，按最小时间戳排序，
+    并持久化到数据文件旁的 *.idx 文件中，文件大小或修改时间变化时自动重建。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + INDEX_SUFFIX)
+        self.blocks: List[list] = []
+        self.count = 0
+        self._signature = None
+        # 各块最大时间戳的前缀最大值（单调不减），用于二分定位起始块
+        self._reach: List[str] = []
+
+    # -------- 索引构建 --------
+    def _file_signature(self) -> Tuple[int, int]:
+        stat = self.path.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def ensure(self) -> "FileIndex":
+        """确保索引可用：优先使用内存/磁盘上的索引，失效时重建"""
+        signature = self._file_signature()
+        if self._signature == signature:
+            return self
+        if not self._load(signature):
+            self._build(signature)
+            self._save()
+        return self
+
+    def _load(self, signature) -> bool:
+        """从磁盘加载索引，签名不一致时返回 False"""
+        try:
+            with self.index_path.open(encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (data.get("version") != INDEX_VERSION
+                or data.get("size") != signature[0]
+                or data.get("mtime_ns") != signature[1]):
+            return False
+        self.blocks = data.get("blocks", [])
+        self.count = data.get("count", 0)
+        self._signature = signature
+        self._update_reach()
+        return True
+
+    def _build(self, signature):
+        """扫描一遍数据文件，只记录每行的时间范围与位置"""
+        blocks = []
+        count = 0
+        offset = 0
+        with self.path.open("rb") as f:
+            for raw in f:
+                length = len(raw)
+                line = raw.strip()
+                if line:
+                    try:
+                        data = json.loads(line)
+                    except ValueError:
+                        data = None
+                    if isinstance(data, dict) and data:
+                        keys = list(data.keys())
+                        blocks.append([min(keys), max(keys), offset, length, len(keys)])
+                        count += len(keys)
+                offset += length
+        blocks.sort(key=lambda b: b[0])
+        self.blocks = blocks
+        self.count = count
+        self._signature = signature
+        self._update_reach()
+
+    def _update_reach(self):
+        reach = []
+        current = ""
+        for block in self.blocks:
+            current = max(current, block[1])
+            reach.append(current)
+        self._reach = reach
+
+    def seek(self, start: str) -> int:
+        """返回第一个可能包含 >= start 记录的块序号（之前的块全部早于 start）"""
+        self.ensure()
+        return bisect.bisect_left(self._reach, start)
+
+    def _save(self):
+        """持久化索引（目录不可写时静默跳过）"""
+        data = {
+            "version": INDEX_VERSION,
+            "size": self._signature[0],
+            "mtime_ns": self._signature[1],
+            "count": self.count,
+            "blocks": self.blocks,
+        }
+        try:
+            with self.index_path.open("w", encoding="utf-8") as f:
+                json.dump(data, f)
+        except OSError:
+            pass
+
+    # -------- 流式读取 --------
+    def _read_block(self, f, block) -> Dict[str, object]:
+        f.seek(block[2])
+        try:
+            data = json.loads(f.read(block[3]))
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def iter_records(self, start: str = None) -> Iterator[Tuple[str, object]]:
+        """按时间顺序惰性产出 (时间戳, 值)，start 不为空时从该时间戳开始
+
+        块按最小时间戳依次载入；只有当下一块可能早于当前待发记录时才继续
+        载入，因此内存中只保留相互重叠的块（通常只有一行）。
+        """
+        self.ensure()
+        blocks = self.blocks
+        pending: List[Tuple[str, object]] = []
+        i = self.seek(start) if start else 0
+        with self.path.open("rb") as f:
+            while i < len(blocks) or pending:
+                while i < len(blocks) and (not pending or blocks[i][0] <= pending[0][0]):
+                    for item in self._read_block(f, blocks[i]).items():
+                        if not start or item[0] >= start:
+                            heapq.heappush(pending, item)
+                    i += 1
+                if pending:
+                    yield heapq.heappop(pending)
+
+
+class ReplayEngine:
+    """多数据文件的流式回放：各文件按时间排序后做惰性 k 路归并
+
+    若数据文件旁存在不旧于它的列式归档（*.col，见 archive.py），优先读取归档。
+    """
+
+    def __init__(self, files: Dict[str, Path]):
+        self.files = files
+        self._indexes: Dict[str, FileIndex] = {}
+
+    def _index(self, dtype: str) -> FileIndex:
+        path = self.files[dtype]
+        index = self._indexes.get(dtype)
+        if index is None or index.path != Path(path):
+            index = FileIndex(path)
+            self._indexes[dtype] = index
+        return index.ensure()
+
+    def _archive(self, dtype: str):
+        """返回该类型可用的列式归档（需要 numpy），不可用时返回 None"""
+        try:
+            from .archive import open_archive
+        except ImportError:
+            return None
+        return open_archive(self.files[dtype])
+
+    def _sources(self) -> Dict[str, object]:
+        """可用的数据类型 -> 列式归档（无可用归档时为 None，读取 txt），每种类型只打开一次"""
+        sources = {}
+        for dtype, path in self.files.items():
+            archive = self._archive(dtype)
+            if archive is not None or Path(path).exists():
+                sources[dtype] = archive
+        return sources
+
+    def count(self) -> int:
+        """记录总数（来自索引或归档头，不读取数据内容）"""
+        total = 0
+        for dtype, archive in self._sources().items():
+            if archive is not None:
+                total += len(archive)
+            elif Path(self.files[dtype]).exists():
+                total += self._index(dtype).count
+        return total
+
+    def _iter_type(self, dtype: str, archive, start: str = None) -> Iterator[Tuple[str, str, object]]:
+        if archive is not None:
+            source = archive.iter_records(start)
+        elif Path(self.files[dtype]).exists():
+            source = self._index(dtype).iter_records(start)
+        else:
+            return
+        for ts, val in source:
+            yield ts, dtype, val
+
+    def iter_records(self, start: str = None) -> Iterator[Tuple[str, str, object]]:
+        """按时间顺序产出 (时间戳, 数据类型, 值)，同一时间戳按文件顺序排列
+
+        start: 起始 ISO 时间戳，通过索引直接定位，不扫描之前的数据
+        """
+        streams = [self._iter_type(dtype, archive, start) for dtype, archive in self._sources().items()]
+        return heapq.merge(*streams, key=lambda r: r[0])
+
+
+__all__ = ["FileIndex", "ReplayEngine", "iso_seconds", "check_start_at"]
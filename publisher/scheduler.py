@@ -0,0 +1,114 @@
+# publisher/scheduler.py
+# 发布速率控制：基于绝对时间线的令牌桶，每次唤醒可批量发放多个令牌
+
+import math
+import time
+from typing import Callable, Optional, Tuple
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    第 n 个令牌（从 0 计）在绝对时刻 start + n / rate 发放，发布本身的耗时不会累积成漂移；
+    桶容量即单次唤醒最多发放的令牌数（批量大小），落后过多时丢弃超出容量的欠账。
+    rate 为 math.inf 时不做任何等待。
+    """
+
+    # 单次睡眠上限，保证停止请求能被及时响应
+    MAX_SLEEP = 0.05
+
+    def __init__(self, rate: float, burst: int = 1,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self._clock = clock
+        self._sleep = sleep
+        self._start: Optional[float] = None
+        self._issued = 0
+
+    def reset(self):
+        """以当前时刻为时间线起点重新计数"""
+        self._start = self._clock()
+        self._issued = 0
+
+    def acquire(self, max_tokens: int = None,
+                should_stop: Callable[[], bool] = None) -> int:
+        """阻塞直到至少有一个令牌可用，返回本次获得的令牌数
+
+        返回 0 表示等待期间收到了停止请求。
+        """
+        limit = self.burst if max_tokens is None else max(1, min(int(max_tokens), self.burst))
+        if math.isinf(self.rate):
+            return limit
+        if self._start is None:
+            self.reset()
+
+        while True:
+            if should_stop and should_stop():
+                return 0
+            now = self._clock()
+            available = int((now - self._start) * self.rate) + 1 - self._issued
+            if available > self.burst:
+                # 落后超过桶容量：放弃欠账，避免恢复后瞬间突发
+                self._issued += available - self.burst
+                available = self.burst
+            if available > 0:
+                granted = min(available, limit)
+                self._issued += granted
+                return granted
+            deadline = self._start + self._issued / self.rate
+            self._sleep(min(max(deadline - now, 0.0), self.MAX_SLEEP))
+
+
+class ReplayClock:
+    """按档案时间回放：相邻记录的档案时间差除以 speed 映射为墙钟间隔
+
+    第一条记录立即发出并作为锚点，之后每条记录的截止时刻都从锚点计算，
+    因而误差不会累积。speed 为 math.inf 时不做任何等待。
+    """
+
+    MAX_SLEEP = TokenBucket.MAX_SLEEP
+
+    def __init__(self, speed: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if speed <= 0:
+            raise ValueError("speed 必须大于 0")
+        self.speed = speed
+        self._clock = clock
+        self._sleep = sleep
+        self._anchor: Optional[Tuple[float, float]] = None
+
+    def reset(self):
+        """清除锚点，下一条记录重新作为回放起点"""
+        self._anchor = None
+
+    def wait_until(self, archive_time: float,
+                   should_stop: Callable[[], bool] = None) -> bool:
+        """等待到档案时刻 archive_time 对应的墙钟时刻，收到停止请求时返回 False"""
+        if self._anchor is None:
+            self._anchor = (archive_time, self._clock())
+            return True
+        if math.isinf(self.speed):
+            return True
+        deadline = self._anchor[1] + (archive_time - self._anchor[0]) / self.speed
+        while True:
+            if should_stop and should_stop():
+                return False
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                return True
+            self._sleep(min(remaining, self.MAX_SLEEP))
+
+
+def default_batch_size(rate: float) -> int:
+    """按速率估算批量大小：唤醒频率约 100 次/秒"""
+    if math.isinf(rate):
+        return 256
+    return max(1, int(rate // 100))
+
+
+__all__ = ["TokenBucket", "ReplayClock", "default_batch_size"]
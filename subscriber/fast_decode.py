@@ -0,0 +1,85 @@
+# subscriber/fast_decode.py
+# 快速载荷解码：直接从 bytes/memoryview 解析，识别发布端固定格式并生成紧凑记录
+
+import json
+from typing import Dict, Union
+
+from common.reading import SensorReading
+
+# 可选的高性能 JSON 后端：orjson > msgspec > 标准库 json
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+try:
+    import msgspec as _msgspec
+except ImportError:
+    _msgspec = None
+
+if _orjson is not None:
+    JSON_BACKEND = "orjson"
+    _loads = _orjson.loads
+elif _msgspec is not None:
+    JSON_BACKEND = "msgspec"
+    _loads = _msgspec.json.Decoder().decode
+else:
+    JSON_BACKEND = "json"
+
+    def _loads(data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+# 发布端载荷字段（见 SensorReading.PAYLOAD_FIELDS）
+SCHEMA_FIELDS = SensorReading.PAYLOAD_FIELDS
+_SCHEMA_SET = frozenset(SCHEMA_FIELDS)
+
+
+# 订阅端解析出的记录即公共的 SensorReading（保留旧名以兼容）
+SensorMessage = SensorReading
+
+
+def decode_message(topic: str, payload: Union[bytes, memoryview]):
+    """解码一条 MQTT 消息
+
+    符合发布端固定格式（至少含 type 与 value，且没有多余字段）时返回
+    SensorReading；否则返回与旧版一致的 dict（含 topic、payload 及解析出的字段）。
+    """
+    data = None
+    try:
+        data = _loads(payload)
+    except Exception:
+        pass
+
+    if (isinstance(data, dict) and "type" in data and "value" in data
+            and _SCHEMA_SET.issuperset(data)):
+        return SensorReading(
+            data["type"],
+            data["value"],
+            data.get("timestamp"),
+            data.get("sensor_id"),
+            data.get("location"),
+            data.get("extra"),
+            topic,
+            payload,
+        )
+
+    payload_text = bytes(payload).decode("utf-8", errors="ignore").strip()
+    if data is None:
+        # 后端拒绝的输入（如非法 UTF-8）按旧逻辑宽松解码后再试一次
+        try:
+            data = json.loads(payload_text)
+        except ValueError:
+            pass
+
+    parsed: Dict = {
+        "topic": topic,
+        "payload": payload_text,
+    }
+    if isinstance(data, dict):
+        parsed.update(data)
+    return parsed
+
+
+__all__ = ["SensorReading", "SensorMessage", "decode_message", "JSON_BACKEND", "SCHEMA_FIELDS"]
@@ -0,0 +1,166 @@
+# subscriber/ingest.py
+# 订阅端接收流水线：有界队列 + 解析/分发工作线程，避免慢消费者阻塞 paho 网络线程
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 队列满时的处理策略
+OVERFLOW_BLOCK = "block"              # 阻塞网络线程直到有空位（不丢消息）
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # 丢弃队首最旧的消息
+OVERFLOW_DROP_NEWEST = "drop_newest"  # 丢弃新到达的消息
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+# 队列元素：(topic, payload_bytes, 接收时刻 monotonic)
+IngestItem = Tuple[str, bytes, float]
+
+
+class IngestPipeline:
+    """有界接收队列与工作线程池
+
+    put() 在 paho 网络线程中调用，只做入队；workers 个工作线程取出消息，
+    调用 handler 完成解析与回调，并统计从接收到回调返回的端到端延迟。
+    """
+
+    def __init__(self, handler: Callable[[str, bytes], None],
+                 maxsize: int = 1000, workers: int = 1,
+                 overflow: str = OVERFLOW_BLOCK):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow}")
+        self.handler = handler
+        self.maxsize = max(1, int(maxsize))
+        self.workers = max(1, int(workers))
+        self.overflow = overflow
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+        # 统计信息（均在 _cond 保护下更新）
+        self._enqueued = 0
+        self._processed = 0
+        self._dropped_oldest = 0
+        self._dropped_newest = 0
+        self._errors = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+        self._max_depth = 0
+
+    # -------- 生命周期 --------
+    def start(self):
+        """启动工作线程（重复调用无副作用）"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"ingest-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """停止工作线程，未处理的消息被丢弃"""
+        with self._cond:
+            self._running = False
+            self._queue.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def is_running(self) -> bool:
+        return self._running
+
+    # -------- 生产端 --------
+    def put(self, topic: str, payload: bytes) -> bool:
+        """入队一条消息，返回是否被接受（drop_newest 丢弃时返回 False）"""
+        item = (topic, payload, time.monotonic())
+        with self._cond:
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    self._dropped_newest += 1
+                    return False
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    self._queue.popleft()
+                    self._dropped_oldest += 1
+                else:
+                    while self._running and len(self._queue) >= self.maxsize:
+                        self._cond.wait()
+                    if not self._running:
+                        return False
+            self._queue.append(item)
+            self._enqueued += 1
+            if len(self._queue) > self._max_depth:
+                self._max_depth = len(self._queue)
+            self._cond.notify_all()
+            return True
+
+    # -------- 消费端 --------
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                topic, payload, received = self._queue.popleft()
+                # 唤醒可能在等待空位的网络线程
+                self._cond.notify_all()
+
+            failed = False
+            try:
+                self.handler(topic, payload)
+            except Exception:
+                failed = True
+
+            latency = time.monotonic() - received
+            with self._cond:
+                self._processed += 1
+                if failed:
+                    self._errors += 1
+                self._latency_total += latency
+                self._latency_last = latency
+                if latency > self._latency_max:
+                    self._latency_max = latency
+
+    # -------- 统计 --------
+    def stats(self) -> Dict:
+        """返回队列深度、丢弃计数与端到端延迟（毫秒）"""
+        with self._cond:
+            processed = self._processed
+            return {
+                "depth": len(self._queue),
+                "max_depth": self._max_depth,
+                "capacity": self.maxsize,
+                "workers": self.workers,
+                "overflow": self.overflow,
+                "enqueued": self._enqueued,
+                "processed": processed,
+                "dropped_oldest": self._dropped_oldest,
+                "dropped_newest": self._dropped_newest,
+                "errors": self._errors,
+                "latency_avg_ms": (self._latency_total / processed * 1000) if processed else 0.0,
+                "latency_max_ms": self._latency_max * 1000,
+                "latency_last_ms": self._latency_last * 1000,
+            }
+
+    def reset_stats(self):
+        """清零统计信息（不影响队列内容）"""
+        with self._cond:
+            self._enqueued = self._processed = 0
+            self._dropped_oldest = self._dropped_newest = self._errors = 0
+            self._latency_total = self._latency_max = self._latency_last = 0.0
+            self._max_depth = len(self._queue)
+
+
+__all__ = [
+    "IngestPipeline",
+    "OVERFLOW_BLOCK",
+    "OVERFLOW_DROP_OLDEST",
+    "OVERFLOW_DROP_NEWEST",
+]
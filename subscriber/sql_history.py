@@ -0,0 +1,343 @@
+# subscriber/sql_history.py
+# SQLite 历史库：WAL 模式 + 后台线程批量写入，增量维护 1 分钟 / 1 小时 / 1 天汇总表
+#
+# 表结构：
+#   readings(ts, sensor_id, location, type, value)        原始读数，ts 为毫秒（编码同 storage.to_epoch_ms）
+#   rollup_1m / rollup_1h / rollup_1d                      汇总表，主键 (sensor_id, type, bucket)
+#       bucket 为时间段起点（秒，编码同 readings.ts），count/sum/min/max 随每批写入增量累加
+# 时间与 subscriber.storage 一致：无时区的时间按原样（本地时间）存储，因此日汇总按本地自然日划分。
+
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .storage import now_ms, to_epoch_ms
+
+DEFAULT_HISTORY_DB = Path(__file__).resolve().parent.parent / "data" / "history.db"
+
+# 汇总级别：(表名, 时间段长度秒)，从细到粗
+ROLLUP_LEVELS = (("rollup_1m", 60), ("rollup_1h", 3600), ("rollup_1d", 86400))
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS readings (
+           ts INTEGER NOT NULL,
+           sensor_id TEXT NOT NULL,
+           location TEXT,
+           type TEXT NOT NULL,
+           value REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS idx_readings_sensor ON readings (sensor_id, type, ts)",
+] + [
+    f"""CREATE TABLE IF NOT EXISTS {table} (
+           sensor_id TEXT NOT NULL,
+           type TEXT NOT NULL,
+           bucket INTEGER NOT NULL,
+           count INTEGER NOT NULL,
+           sum REAL NOT NULL,
+           min REAL NOT NULL,
+           max REAL NOT NULL,
+           PRIMARY KEY (sensor_id, type, bucket)) WITHOUT ROWID"""
+    for table, _ in ROLLUP_LEVELS
+]
+
+_UPSERT = """INSERT INTO {table} (sensor_id, type, bucket, count, sum, min, max)
+             VALUES (?, ?, ?, ?, ?, ?, ?)
+             ON CONFLICT (sensor_id, type, bucket) DO UPDATE SET
+                 count = count + excluded.count,
+                 sum = sum + excluded.sum,
+                 min = min(min, excluded.min),
+                 max = max(max, excluded.max)"""
+
+_SENSOR_TYPES = ("temperature", "humidity", "pressure")
+
+
+class SQLiteHistory:
+    """把订阅端收到的读数写入 SQLite，并提供基于汇总表的历史查询
+
+    append() 只把读数放入队列；后台写线程每攒够 batch_size 条或每隔 flush_interval 秒
+    用一个事务 executemany 写入原始表，并把这一批按时间段聚合后 upsert 到三张汇总表。
+    raw_retention_days 设置后，写线程每小时删除一次过期的原始读数（汇总表保留）。
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_DB, batch_size: int = 1000,
+                 flush_interval: float = 0.5, queue_size: int = 100000,
+                 raw_retention_days: float = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.raw_retention_days = raw_retention_days
+
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        with self._writer:
+            for statement in _SCHEMA:
+                self._writer.execute(statement)
+        # 查询使用独立连接：WAL 模式下读不阻塞写线程
+        self._reader = self._connect()
+        self._reader.execute("PRAGMA query_only=1")
+        self._read_lock = threading.Lock()
+
+        self._queue: "queue.Queue" = queue.Queue(queue_size)
+        self._flushed = threading.Condition()
+        self._count_lock = threading.Lock()   # 多个接收线程并发 append 时保护计数
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._errors = 0
+        self.last_batch_ms = 0.0
+        self._ts_cache: Tuple[Optional[str], int] = (None, 0)
+        self._last_prune = 0.0
+
+        self._closed = False
+        self._abort = False   # close() 超时未能放入结束标记时，写线程写完当前批次即退出
+        self._thread = threading.Thread(target=self._run, name="sqlite-history", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+
+    # -------- 写入 --------
+    def append(self, sensor_id: str, data_type: str, value: float,
+               timestamp=None, location: str = None) -> bool:
+        """放入写入队列（队列满时丢弃并返回 False，不阻塞接收线程）"""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait((timestamp, sensor_id, location, data_type, float(value)))
+        except queue.Full:
+            with self._count_lock:
+                self._dropped += 1
+            return False
+        with self._count_lock:
+            self._enqueued += 1
+        return True
+
+    def append_message(self, message) -> bool:
+        """追加订阅端解析出的消息（SensorReading 或 dict），不是读数时返回 False"""
+        data_type = message.get("type")
+        value = message.get("value")
+        if data_type not in _SENSOR_TYPES or value is None:
+            return False
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        return self.append(message.get("sensor_id") or "unknown", data_type, value,
+                           message.get("timestamp"), message.get("location"))
+
+    def _timestamp_ms(self, timestamp) -> int:
+        if timestamp is None or (isinstance(timestamp, str) and not timestamp):
+            return now_ms()
+        if isinstance(timestamp, str):
+            cached, value = self._ts_cache
+            if cached == timestamp:
+                return value
+            value = to_epoch_ms(timestamp)
+            self._ts_cache = (timestamp, value)
+            return value
+        return to_epoch_ms(timestamp)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            batch = [] if item is None else [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(entry is None for entry in batch)
+            batch = [entry for entry in batch if entry is not None]
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self._errors += 1
+                    print(f"SQLite 历史写入失败: {e}")
+            self._maybe_prune()
+            with self._flushed:
+                self._written += len(batch)
+                self._flushed.notify_all()
+            if stop or self._abort:
+                return
+
+    def _write_batch(self, batch: List[tuple]):
+        started = time.perf_counter()
+        rows = []
+        rollups: List[Dict[tuple, list]] = [{} for _ in ROLLUP_LEVELS]
+        for timestamp, sensor_id, location, data_type, value in batch:
+            try:
+                ts = self._timestamp_ms(timestamp)
+            except (TypeError, ValueError):
+                continue
+            rows.append((ts, sensor_id, location, data_type, value))
+            seconds = ts // 1000
+            for level, (_, width) in enumerate(ROLLUP_LEVELS):
+                key = (sensor_id, data_type, seconds - seconds % width)
+                agg = rollups[level].get(key)
+                if agg is None:
+                    rollups[level][key] = [1, value, value, value]
+                else:
+                    agg[0] += 1
+                    agg[1] += value
+                    if value < agg[2]:
+                        agg[2] = value
+                    if value > agg[3]:
+                        agg[3] = value
+        if not rows:
+            return
+        with self._writer:
+            self._writer.executemany(
+                "INSERT INTO readings (ts, sensor_id, location, type, value) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            for (table, _), aggregates in zip(ROLLUP_LEVELS, rollups):
+                self._writer.executemany(
+                    _UPSERT.format(table=table),
+                    [key + tuple(agg) for key, agg in aggregates.items()])
+        self._batches += 1
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+
+    def _maybe_prune(self):
+        if not self.raw_retention_days or time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = to_epoch_ms(time.time() - self.raw_retention_days * 86400)
+        with self._writer:
+            self._writer.execute("DELETE FROM readings WHERE ts < ?", (cutoff,))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """等待已入队的读数全部写入，返回是否在超时前完成"""
+        with self._count_lock:
+            target = self._enqueued
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while self._written < target and self._thread.is_alive():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    # -------- 查询 --------
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    @staticmethod
+    def choose_level(span: float, points: int) -> Tuple[str, int]:
+        """选择每个输出点至少覆盖一个汇总时间段的最粗级别"""
+        target = span / max(1, points)
+        chosen = ROLLUP_LEVELS[0]
+        for level in ROLLUP_LEVELS:
+            if level[1] <= target:
+                chosen = level
+        return chosen
+
+    def latest_time(self, sensor_id: str, data_type: str) -> Optional[int]:
+        """该传感器该类数据最后一个分钟段的起点（秒）"""
+        rows = self._query("SELECT max(bucket) FROM rollup_1m WHERE sensor_id = ? AND type = ?",
+                           (sensor_id, data_type))
+        return rows[0][0] if rows else None
+
+    def rollup(self, sensor_id: str, data_type: str, start=None, end=None,
+               points: int = 30, span: float = 86400.0) -> Dict:
+        """按汇总表查询 [start, end] 内的历史，合并为最多 points 个等宽时间段
+
+        未给出 end 时取该传感器最后一个数据点，未给出 start 时取 end 之前 span 秒。
+        返回 {"timestamps": [...秒], "avg": [...], "min": [...], "max": [...],
+        "count": [...], "resolution": 汇总表名}。
+        """
+        end_s = to_epoch_ms(end) // 1000 if end is not None else self.latest_time(sensor_id, data_type)
+        result = {"timestamps": [], "avg": [], "min": [], "max": [], "count": [], "resolution": None}
+        if end_s is None:
+            return result
+        points = max(1, int(points))
+        start_s = to_epoch_ms(start) // 1000 if start is not None else end_s - int(span)
+        table, width = self.choose_level(end_s - start_s, points)
+        # 最后一个时间段在 end 所在汇总时间段的末尾结束，向前排列 points 个等宽时间段；
+        # 时间段宽度取汇总时间段的整数倍
+        stop = end_s - end_s % width + width
+        start_bucket = start_s - start_s % width
+        if start is None:
+            step = max(1, int(span) // points // width) * width
+        else:
+            step = max(1, -(-(stop - start_bucket) // (points * width))) * width
+        first = stop - points * step
+        rows = self._query(
+            f"""SELECT (bucket - ?) / ? AS slot, min(bucket), sum(sum) / sum(count),
+                       min(min), max(max), sum(count)
+                FROM {table}
+                WHERE sensor_id = ? AND type = ? AND bucket >= ? AND bucket < ?
+                GROUP BY slot ORDER BY slot""",
+            (first, step, sensor_id, data_type, max(first, start_bucket), stop))
+        for _, bucket, avg, low, high, count in rows:
+            result["timestamps"].append(bucket)
+            result["avg"].append(avg)
+            result["min"].append(low)
+            result["max"].append(high)
+            result["count"].append(count)
+        result["resolution"] = table
+        return result
+
+    def raw(self, sensor_id: str, data_type: str, start=None, end=None,
+            limit: int = None) -> List[Tuple[int, float]]:
+        """原始读数 [(毫秒, 数值), ...]，按时间升序；limit 只取最近 limit 条"""
+        start_ms = to_epoch_ms(start) if start is not None else -(1 << 62)
+        end_ms = to_epoch_ms(end) if end is not None else 1 << 62
+        sql = ("SELECT ts, value FROM readings WHERE sensor_id = ? AND type = ? "
+               "AND ts >= ? AND ts <= ? ORDER BY ts DESC")
+        params = (sensor_id, data_type, start_ms, end_ms)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        return self._query(sql, params)[::-1]
+
+    def sensors(self) -> List[Tuple[str, Optional[str]]]:
+        """[(sensor_id, 最近的 location)]"""
+        return self._query(
+            "SELECT sensor_id, location FROM readings WHERE rowid IN "
+            "(SELECT max(rowid) FROM readings GROUP BY sensor_id) ORDER BY sensor_id", ())
+
+    # -------- 统计与生命周期 --------
+    def stats(self) -> Dict:
+        return {
+            "path": str(self.path),
+            "queued": self._queue.qsize(),
+            "enqueued": self._enqueued,
+            "written": self._written,
+            "dropped": self._dropped,
+            "batches": self._batches,
+            "errors": self._errors,
+            "last_batch_ms": self.last_batch_ms,
+        }
+
+    def close(self, timeout: float = 10.0):
+        """写完队列中剩余的读数后关闭连接（整体不超过 timeout 秒）
+
+        队列一直满、结束标记放不进去时，写线程写完当前批次即退出，剩余读数被丢弃。
+        """
+        if self._closed:
+            return
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            self._abort = True
+            print("SQLite 历史队列已满，关闭时丢弃未写入的读数")
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        with self._read_lock:
+            self._reader.close()
+        if not self._thread.is_alive():
+            self._writer.close()
+
+
+__all__ = ["SQLiteHistory", "ROLLUP_LEVELS", "DEFAULT_HISTORY_DB"]
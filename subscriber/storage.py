@@ -0,0 +1,832 @@
+# subscriber/storage.py
+# 嵌入式时序存储：只追加的分段列式文件 + 段级时间/数值索引，批量 fsync，后台合并
+#
+# 目录布局：
+#   manifest.json         已封存段的清单与段级索引（时间范围、各类型数值的 min/max、行数）
+#   sensors.log           传感器字典（只追加，每行 [编码, sensor_id, location]）
+#   active-<seq>.wal      活动段的行日志（定长记录，内存缓冲 + 定期批量写入并 fsync）
+#   seg-<seq>.xjs         已封存的列式段（小端）：
+#     [0:40)              魔数 b"XJSEG002"、行数 N、传感器数 K、最小/最大时间戳（毫秒）
+#     int64[N]            时间戳（本地挂钟时间按 UTC 编码的毫秒数，见 to_epoch_ms）
+#     uint64[K+1]         各传感器的起始行
+#     uint32[K]           传感器编码（升序）
+#     float64[N]          数值（旧版 b"XJSEG001" 段为 float32，仍可读取）
+#     uint8[N]            类型编码（common.reading.TYPE_CODES）
+#   段内按 (传感器, 时间) 排序：单个传感器的时间范围查询只需两次二分查找。
+
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.reading import SENSOR_TYPES, TYPE_CODES
+
+SEGMENT_MAGIC = b"XJSEG002"
+# 魔数 -> 数值列类型
+_SEG_VALUE_DTYPES = {SEGMENT_MAGIC: "<f8", b"XJSEG001": "<f4"}
+_SEG_HEADER = struct.Struct("<8sQQqq")
+
+# 活动日志的定长行记录（21 字节，无对齐填充）；数值保存为 float64，读出与写入完全一致
+ROW_DTYPE = np.dtype([("ts", "<i8"), ("sensor", "<u4"), ("type", "u1"), ("value", "<f8")])
+# 旧版活动日志（active-<seq>.log，数值为 float32），仅用于恢复
+_LEGACY_ROW_DTYPE = np.dtype([("ts", "<i8"), ("sensor", "<u4"), ("type", "u1"), ("value", "<f4")])
+
+# 查询结果
+RESULT_DTYPE = np.dtype([
+    ("timestamp", "datetime64[ms]"),
+    ("value", "f8"),
+    ("type", "u1"),
+    ("sensor", "u4"),
+])
+
+DEFAULT_STORE_DIR = Path(__file__).resolve().parent.parent / "data" / "tsdb"
+DEFAULT_SEGMENT_ROWS = 1 << 18      # 活动段达到该行数时封存（即内存缓冲的行数）
+DEFAULT_COMPACT_ROWS = 8 << 20      # 合并后单个段的目标行数
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_ms(value) -> int:
+    """ISO 字符串 / datetime / datetime64 / epoch 秒 -> 毫秒
+
+    统一按本地挂钟时间编码（与发布端无时区的 ISO 时间戳一致）：无时区的时间按原样
+    存储，带时区的时间与 epoch 秒（如 time.time()）先换算为本地时间。
+    """
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = datetime.fromtimestamp(float(value))
+    elif isinstance(value, np.datetime64):
+        return int(value.astype("datetime64[ms]").astype(np.int64))
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return int(np.datetime64(value, "ms").astype(np.int64))
+
+
+def now_ms() -> int:
+    """当前时刻（编码同 to_epoch_ms）"""
+    return to_epoch_ms(datetime.now())
+
+
+def to_unix_seconds(values) -> np.ndarray:
+    """to_epoch_ms 编码的毫秒数组 -> Unix 秒（按各时刻的本地时区偏移换算）"""
+    ms = np.asarray(values, dtype=np.int64)
+    hours = ms // 3600000
+    unique = np.unique(hours)
+    # 本地时区偏移每小时求一次，覆盖夏令时切换
+    offsets = np.array([(_EPOCH + timedelta(hours=int(h))).timestamp() - int(h) * 3600
+                        for h in unique], dtype=np.float64)
+    return ms / 1000.0 + offsets[np.searchsorted(unique, hours)]
+
+
+class _Buffer:
+    """活动段（或等待封存的段）的内存列与对应的行日志"""
+
+    __slots__ = ("seq", "ts", "sensor", "type", "value", "rows", "logged", "log_path", "log")
+
+    def __init__(self, seq: int, capacity: int, log_path: Path):
+        self.seq = seq
+        self.ts = np.empty(capacity, dtype=np.int64)
+        self.sensor = np.empty(capacity, dtype=np.uint32)
+        self.type = np.empty(capacity, dtype=np.uint8)
+        self.value = np.empty(capacity, dtype=np.float64)
+        self.rows = 0
+        self.logged = 0
+        self.log_path = log_path
+        self.log = None
+
+    @property
+    def capacity(self) -> int:
+        return len(self.ts)
+
+    def load(self, rows: np.ndarray):
+        n = len(rows)
+        self.ts[:n] = rows["ts"]
+        self.sensor[:n] = rows["sensor"]
+        self.type[:n] = rows["type"]
+        self.value[:n] = rows["value"]
+        self.rows = self.logged = n
+
+    def columns(self, rows: int = None) -> Tuple[np.ndarray, ...]:
+        n = self.rows if rows is None else rows
+        return self.ts[:n], self.sensor[:n], self.type[:n], self.value[:n]
+
+
+class _Segment:
+    """已封存段的只读映射"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as f:
+            magic, rows, sensors, self.min_ts, self.max_ts = _SEG_HEADER.unpack(f.read(_SEG_HEADER.size))
+        value_dtype = _SEG_VALUE_DTYPES.get(magic)
+        if value_dtype is None:
+            raise ValueError(f"不是有效的段文件: {path}")
+        self.rows = rows
+        offset = _SEG_HEADER.size
+
+        def column(dtype, count):
+            nonlocal offset
+            if count == 0:
+                return np.empty(0, dtype=dtype)
+            array = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+            offset += np.dtype(dtype).itemsize * count
+            return array
+
+        self.ts = column("<i8", rows)
+        self.starts = column("<u8", sensors + 1) if rows else np.zeros(1, dtype=np.uint64)
+        self.codes = column("<u4", sensors)
+        self.value = column(value_dtype, rows)
+        self.type = column("u1", rows)
+
+    def sensors_of(self, rows: np.ndarray) -> np.ndarray:
+        """行号 -> 传感器编码"""
+        owner = np.searchsorted(self.starts, rows.astype(np.uint64), "right") - 1
+        return np.asarray(self.codes)[owner]
+
+    def select(self, codes: Optional[np.ndarray], type_code: Optional[int],
+               start: int, end: int) -> np.ndarray:
+        """返回满足条件的行号（codes 为 None 时不按传感器过滤）"""
+        if codes is None:
+            mask = (self.ts >= start) & (self.ts <= end)
+            if type_code is not None:
+                mask &= self.type == type_code
+            return np.flatnonzero(mask)
+        parts = []
+        for code in codes:
+            pos = int(np.searchsorted(self.codes, code))
+            if pos >= len(self.codes) or self.codes[pos] != code:
+                continue
+            lo, hi = int(self.starts[pos]), int(self.starts[pos + 1])
+            ts = self.ts[lo:hi]
+            first = lo + int(np.searchsorted(ts, start, "left"))
+            last = lo + int(np.searchsorted(ts, end, "right"))
+            if first >= last:
+                continue
+            rows = np.arange(first, last)
+            if type_code is not None:
+                rows = rows[self.type[first:last] == type_code]
+            parts.append(rows)
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+def _write_segment(path: Path, ts: np.ndarray, sensor: np.ndarray,
+                   types: np.ndarray, values: np.ndarray) -> Dict:
+    """按 (传感器, 时间) 排序后写出段文件（先写临时文件再原子替换），返回段级索引"""
+    order = np.lexsort((ts, sensor))
+    ts, sensor, types, values = ts[order], sensor[order], types[order], values[order]
+    codes, starts = np.unique(sensor, return_index=True)
+    starts = np.append(starts, len(ts)).astype("<u8")
+    min_ts = int(ts.min()) if len(ts) else 0
+    max_ts = int(ts.max()) if len(ts) else 0
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(_SEG_HEADER.pack(SEGMENT_MAGIC, len(ts), len(codes), min_ts, max_ts))
+        for array, dtype in ((ts, "<i8"), (starts, "<u8"), (codes, "<u4"),
+                             (values, "<f8"), (types, "u1")):
+            f.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    tmp_path.replace(path)
+
+    index = {"name": path.name, "rows": int(len(ts)), "sensors": int(len(codes)),
+             "min_ts": min_ts, "max_ts": max_ts, "types": {}}
+    for name, code in TYPE_CODES.items():
+        selected = values[types == code]
+        if len(selected):
+            index["types"][name] = {"count": int(len(selected)),
+                                    "min": float(selected.min()),
+                                    "max": float(selected.max())}
+    return index
+
+
+class SegmentStore:
+    """只追加的分段列式时序存储
+
+    append() 只写内存缓冲（O(1)）；后台线程每 sync_interval 秒把新增的行批量写入
+    活动日志并 fsync，活动段满 segment_rows 行后封存为列式段文件；小段数量达到
+    compact_threshold 时自动合并。崩溃后最多丢失最近 sync_interval 秒的数据。
+    替换用的缓冲由后台线程预先分配并打开日志，活动段写满时 append() 只交换引用。
+    查询可在任意线程中进行，不阻塞写入。
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, segment_rows: int = DEFAULT_SEGMENT_ROWS,
+                 sync_interval: float = 1.0, compact_rows: int = DEFAULT_COMPACT_ROWS,
+                 compact_threshold: int = 4, retention_days: float = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_rows = max(1, int(segment_rows))
+        self.sync_interval = sync_interval
+        self.compact_rows = max(self.segment_rows, int(compact_rows))
+        self.compact_threshold = max(2, int(compact_threshold))
+        self.retention_days = retention_days
+
+        self._lock = threading.Lock()          # 内存缓冲、传感器字典、段清单引用与已打开的段
+        self._io_lock = threading.Lock()       # 日志写入与封存
+        self._manifest_lock = threading.Lock() # 段清单的修改与落盘
+        self._compact_lock = threading.Lock()
+
+        # 传感器字典
+        self._sensor_ids: List[str] = []
+        self._sensor_locations: List[Optional[str]] = []
+        self._sensor_codes: Dict[str, int] = {}
+        self._catalog_pending: List[str] = []
+        self._catalog_file = None
+
+        # 段清单（写时复制：修改时整体替换列表）
+        self._segments: List[Dict] = []
+        self._open_segments: Dict[str, _Segment] = {}
+        self._next_seq = 1
+        self._garbage: List[Path] = []
+
+        self._active: Optional[_Buffer] = None
+        self._spare: Optional[_Buffer] = None   # 预先分配的下一个活动段
+        self._sealing: List[_Buffer] = []
+        self._ts_cache: Tuple[Optional[str], int] = (None, 0)
+
+        # 统计
+        self.appended = 0
+        self.syncs = 0
+        self.last_sync_ms = 0.0
+        self.compactions = 0
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._refs = 0
+        self._closed = False
+
+        self._open()
+
+    # -------- 打开与恢复 --------
+    def _open(self):
+        manifest_path = self.root / "manifest.json"
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            self._segments = [entry for entry in manifest.get("segments", [])
+                              if (self.root / entry["name"]).exists()]
+            self._next_seq = int(manifest.get("next_seq", 1))
+        self._load_catalog()
+
+        # 上次未封存的日志直接封存为段（截断的尾部记录与未知传感器的行被丢弃）
+        logs = sorted(list(self.root.glob("active-*.wal")) + list(self.root.glob("active-*.log")))
+        for log_path in logs:
+            seq = int(log_path.stem.split("-")[1])
+            self._next_seq = max(self._next_seq, seq + 1)
+            dtype = ROW_DTYPE if log_path.suffix == ".wal" else _LEGACY_ROW_DTYPE
+            data = log_path.read_bytes()
+            rows = np.frombuffer(data[:len(data) // dtype.itemsize * dtype.itemsize], dtype=dtype)
+            rows = rows[rows["sensor"] < len(self._sensor_ids)]
+            if len(rows):
+                buffer = _Buffer(seq, len(rows), log_path)
+                buffer.load(rows)
+                self._seal(buffer)
+            else:
+                log_path.unlink()
+        for tmp_path in self.root.glob("*.tmp"):
+            tmp_path.unlink()
+
+        self._active = self._new_buffer()
+        self._spare = self._new_buffer()
+        self._catalog_file = (self.root / "sensors.log").open("a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="segment-store", daemon=True)
+        self._thread.start()
+
+    def _load_catalog(self):
+        path = self.root / "sensors.log"
+        if not path.exists():
+            return
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    code, sensor_id, location = json.loads(line)
+                except ValueError:
+                    break  # 未写完的尾行
+                if code == len(self._sensor_ids):
+                    self._sensor_ids.append(sensor_id)
+                    self._sensor_locations.append(location)
+                    self._sensor_codes[sensor_id] = code
+                elif code < len(self._sensor_ids):
+                    self._sensor_locations[code] = location
+
+    def _new_buffer(self) -> _Buffer:
+        """分配缓冲并打开其日志（不持有 _lock 时调用，只在取序号时短暂加锁）"""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        buffer = _Buffer(seq, self.segment_rows, self.root / f"active-{seq:08d}.wal")
+        buffer.log = buffer.log_path.open("ab")
+        return buffer
+
+    def _prepare_spare(self):
+        """后台线程：备好下一个活动段，活动段写满时 append() 直接换入"""
+        if self._spare is None and not self._closed:
+            spare = self._new_buffer()
+            with self._lock:
+                self._spare = spare
+
+    # -------- 写入 --------
+    def _sensor_code(self, sensor_id: str, location: Optional[str]) -> int:
+        """调用方持有 _lock"""
+        code = self._sensor_codes.get(sensor_id)
+        if code is None:
+            code = len(self._sensor_ids)
+            self._sensor_ids.append(sensor_id)
+            self._sensor_locations.append(location)
+            self._sensor_codes[sensor_id] = code
+        elif not location or self._sensor_locations[code] == location:
+            return code
+        else:
+            self._sensor_locations[code] = location
+        self._catalog_pending.append(json.dumps([code, sensor_id, location], ensure_ascii=False))
+        return code
+
+    def _timestamp_ms(self, timestamp) -> int:
+        if timestamp is None or (isinstance(timestamp, str) and not timestamp):
+            return now_ms()
+        if isinstance(timestamp, str):
+            # 同一时刻的三类读数共用时间戳字符串
+            cached, value = self._ts_cache
+            if cached == timestamp:
+                return value
+            value = to_epoch_ms(timestamp)
+            self._ts_cache = (timestamp, value)
+            return value
+        return to_epoch_ms(timestamp)
+
+    def append(self, sensor_id: str, data_type: str, value: float,
+               timestamp=None, location: str = None):
+        """追加一条读数（只写内存，持久化由后台线程批量完成）"""
+        type_code = TYPE_CODES[data_type]
+        ts = self._timestamp_ms(timestamp)
+        written = False
+        while not written:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("存储已关闭")
+                buffer = self._active
+                if buffer.rows < buffer.capacity:
+                    code = self._sensor_code(sensor_id, location)
+                    i = buffer.rows
+                    buffer.ts[i] = ts
+                    buffer.sensor[i] = code
+                    buffer.type[i] = type_code
+                    buffer.value[i] = value
+                    buffer.rows = i + 1
+                    self.appended += 1
+                    written = True
+                if buffer.rows >= buffer.capacity:
+                    # 活动段已满：换入后台线程备好的缓冲，旧段交给后台线程封存
+                    if self._spare is not None:
+                        self._sealing.append(buffer)
+                        self._active, self._spare = self._spare, None
+                    self._wake.set()
+                spare_ready = self._spare is not None or self._active.rows < self._active.capacity
+            if not written and not spare_ready:
+                # 后台线程尚未备好缓冲：在锁外分配，不阻塞读者与其他写入
+                spare = self._new_buffer()
+                with self._lock:
+                    if self._spare is None:
+                        self._spare, spare = spare, None
+                if spare is not None:
+                    self._discard_buffer(spare)
+
+    def append_message(self, message) -> bool:
+        """追加订阅端解析出的消息（SensorReading 或 dict），不是读数时返回 False"""
+        data_type = message.get("type")
+        value = message.get("value")
+        if data_type not in TYPE_CODES or value is None:
+            return False
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        try:
+            self.append(message.get("sensor_id") or "unknown", data_type, value,
+                        message.get("timestamp"), message.get("location"))
+        except ValueError:
+            return False  # 无法解析的时间戳
+        return True
+
+    # -------- 持久化 --------
+    def sync(self):
+        """把新增的行写入活动日志并 fsync（传感器字典先落盘）"""
+        with self._io_lock:
+            started = time.perf_counter()
+            with self._lock:
+                catalog, self._catalog_pending = self._catalog_pending, []
+                pending = []
+                for buffer in self._sealing + [self._active]:
+                    if buffer.logged < buffer.rows and buffer.log is not None:
+                        pending.append((buffer, buffer.logged, buffer.rows))
+                        buffer.logged = buffer.rows
+            if not catalog and not pending:
+                return
+            if catalog:
+                self._catalog_file.write("\n".join(catalog) + "\n")
+                self._catalog_file.flush()
+                os.fsync(self._catalog_file.fileno())
+            for buffer, first, last in pending:
+                rows = np.empty(last - first, dtype=ROW_DTYPE)
+                rows["ts"] = buffer.ts[first:last]
+                rows["sensor"] = buffer.sensor[first:last]
+                rows["type"] = buffer.type[first:last]
+                rows["value"] = buffer.value[first:last]
+                buffer.log.write(rows.tobytes())
+                buffer.log.flush()
+                os.fsync(buffer.log.fileno())
+            self.syncs += 1
+            self.last_sync_ms = (time.perf_counter() - started) * 1000
+
+    def _seal(self, buffer: _Buffer):
+        """把缓冲写成段文件并登记到清单，然后删除其日志（调用方持有 _io_lock 或处于初始化）
+
+        新段登记与缓冲移出 _sealing 在同一次 _lock 内完成，查询不会同时看到两者。
+        """
+        if buffer.rows:
+            path = self.root / f"seg-{buffer.seq:08d}.xjs"
+            index = _write_segment(path, *[np.array(c) for c in buffer.columns()])
+            self._update_manifest(add=[index], retire=buffer)
+        else:
+            with self._lock:
+                if buffer in self._sealing:
+                    self._sealing.remove(buffer)
+        self._discard_buffer(buffer)
+
+    @staticmethod
+    def _discard_buffer(buffer: _Buffer):
+        """关闭并删除缓冲的日志"""
+        if buffer.log is not None:
+            buffer.log.close()
+            buffer.log = None
+        try:
+            buffer.log_path.unlink()
+        except OSError:
+            pass
+
+    def _seal_pending(self):
+        with self._io_lock:
+            # 先确保传感器字典已落盘，段内的编码才能在重启后解析
+            if self._catalog_pending:
+                with self._lock:
+                    catalog, self._catalog_pending = self._catalog_pending, []
+                self._catalog_file.write("\n".join(catalog) + "\n")
+                self._catalog_file.flush()
+                os.fsync(self._catalog_file.fileno())
+            while self._sealing:
+                self._seal(self._sealing[0])
+
+    def _update_manifest(self, add: List[Dict] = (), remove: List[str] = (),
+                         retire: _Buffer = None):
+        """替换段清单；retire 为已写成新段的缓冲，与新清单一起生效"""
+        with self._manifest_lock:
+            removed = set(remove)
+            segments = [entry for entry in self._segments if entry["name"] not in removed]
+            segments.extend(add)
+            segments.sort(key=lambda entry: (entry["min_ts"], entry["name"]))
+            manifest = {"version": 1, "next_seq": self._next_seq, "segments": segments}
+            tmp_path = self.root / "manifest.json.tmp"
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            tmp_path.replace(self.root / "manifest.json")
+            with self._lock:
+                self._segments = segments
+                if retire is not None and retire in self._sealing:
+                    self._sealing.remove(retire)
+                for name in removed:
+                    self._open_segments.pop(name, None)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            try:
+                self.sync()
+                self._seal_pending()
+                self._prepare_spare()
+                if self._should_compact():
+                    self.compact()
+            except Exception as e:
+                print(f"时序存储后台任务失败: {e}")
+
+    # -------- 合并 --------
+    def _should_compact(self) -> bool:
+        small = sum(1 for entry in self._segments if entry["rows"] < self.compact_rows // 2)
+        return small >= self.compact_threshold or bool(self.retention_days) or bool(self._garbage)
+
+    def compact(self, retention_days: float = None) -> int:
+        """合并相邻的小段、删除超过保留期的段，返回减少的段数"""
+        retention_days = self.retention_days if retention_days is None else retention_days
+        with self._compact_lock:
+            before = len(self._segments)
+            segments = list(self._segments)
+            if retention_days:
+                cutoff = to_epoch_ms(time.time() - retention_days * 86400)
+                expired = [entry["name"] for entry in segments if entry["max_ts"] < cutoff]
+                if expired:
+                    self._update_manifest(remove=expired)
+                    self._delete_files(expired)
+                    segments = list(self._segments)
+
+            # 按时间顺序把相邻的小段分组，每组不超过 compact_rows 行
+            groups, group, rows = [], [], 0
+            for entry in segments:
+                if entry["rows"] >= self.compact_rows // 2 or rows + entry["rows"] > self.compact_rows:
+                    if len(group) > 1:
+                        groups.append(group)
+                    group, rows = [], 0
+                    if entry["rows"] >= self.compact_rows // 2:
+                        continue
+                group.append(entry)
+                rows += entry["rows"]
+            if len(group) > 1:
+                groups.append(group)
+
+            for group in groups:
+                columns = [[], [], [], []]
+                for entry in group:
+                    segment = self._segment(entry["name"])
+                    sensor = segment.sensors_of(np.arange(segment.rows))
+                    for target, column in zip(columns, (segment.ts, sensor, segment.type, segment.value)):
+                        target.append(np.asarray(column))
+                with self._lock:
+                    seq = self._next_seq
+                    self._next_seq += 1
+                path = self.root / f"seg-{seq:08d}.xjs"
+                index = _write_segment(path, *[np.concatenate(column) for column in columns])
+                names = [entry["name"] for entry in group]
+                self._update_manifest(add=[index], remove=names)
+                self._delete_files(names)
+                self.compactions += 1
+            self._delete_files([])
+            return before - len(self._segments)
+
+    def _delete_files(self, names: List[str]):
+        # 仍被映射的文件在部分平台上无法删除，留到下次再试
+        pending, self._garbage = self._garbage + [self.root / name for name in names], []
+        for path in pending:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self._garbage.append(path)
+
+    # -------- 查询 --------
+    def _segment(self, name: str) -> _Segment:
+        with self._lock:
+            return self._pin(name)
+
+    def _pin(self, name: str) -> _Segment:
+        """调用方持有 _lock：打开（或取得已打开的）段
+
+        与段清单在同一把锁下取得，之后即使合并从清单中移除并删除该文件，
+        已建立的映射仍然有效，查询不会因文件被删除而失败。
+        """
+        segment = self._open_segments.get(name)
+        if segment is None:
+            segment = _Segment(self.root / name)
+            self._open_segments[name] = segment
+        return segment
+
+    def _resolve_codes(self, sensor_id, location) -> Optional[np.ndarray]:
+        """调用方持有 _lock；不按传感器过滤时返回 None"""
+        codes = None
+        if sensor_id is not None:
+            ids = [sensor_id] if isinstance(sensor_id, str) else list(sensor_id)
+            codes = {self._sensor_codes[s] for s in ids if s in self._sensor_codes}
+        if location is not None:
+            at_location = {code for code, loc in enumerate(self._sensor_locations) if loc == location}
+            codes = at_location if codes is None else codes & at_location
+        return None if codes is None else np.array(sorted(codes), dtype=np.uint32)
+
+    @staticmethod
+    def _may_match(entry: Dict, data_type: Optional[str], start_ms: int, end_ms: int,
+                   value_min: float = None, value_max: float = None) -> bool:
+        """按段级索引判断该段是否可能有命中的行"""
+        if entry["max_ts"] < start_ms or entry["min_ts"] > end_ms:
+            return False
+        if data_type:
+            stats = entry["types"].get(data_type)
+            if stats is None:
+                return False
+            if value_min is not None and stats["max"] < value_min:
+                return False
+            if value_max is not None and stats["min"] > value_max:
+                return False
+        return True
+
+    def query(self, sensor_id=None, data_type: str = None, start=None, end=None,
+              location: str = None, value_min: float = None, value_max: float = None) -> np.ndarray:
+        """查询 [start, end]（含两端）内的读数，返回按时间排序的 RESULT_DTYPE 数组
+
+        sensor_id 可为单个 ID 或 ID 列表；location 按传感器最近一次上报的位置过滤。
+        段级索引（时间范围、各类型数值的 min/max）用于跳过不可能命中的段。
+        """
+        start_ms = to_epoch_ms(start) if start is not None else np.iinfo(np.int64).min
+        end_ms = to_epoch_ms(end) if end is not None else np.iinfo(np.int64).max
+        type_code = TYPE_CODES[data_type] if data_type else None
+        with self._lock:
+            codes = self._resolve_codes(sensor_id, location)
+            if codes is not None and not len(codes):
+                return np.empty(0, dtype=RESULT_DTYPE)
+            segments = [self._pin(entry["name"]) for entry in self._segments
+                        if self._may_match(entry, data_type, start_ms, end_ms, value_min, value_max)]
+            buffers = [(buffer, buffer.rows) for buffer in self._sealing + [self._active]]
+
+        parts = []
+        for segment in segments:
+            rows = segment.select(codes, type_code, start_ms, end_ms)
+            if len(rows):
+                parts.append((segment.ts[rows], segment.value[rows], segment.type[rows],
+                              segment.sensors_of(rows)))
+        for buffer, count in buffers:
+            ts, sensor, types, values = buffer.columns(count)
+            mask = (ts >= start_ms) & (ts <= end_ms)
+            if type_code is not None:
+                mask &= types == type_code
+            if codes is not None:
+                mask &= np.isin(sensor, codes)
+            if mask.any():
+                parts.append((ts[mask], values[mask], types[mask], sensor[mask]))
+
+        total = sum(len(part[0]) for part in parts)
+        result = np.empty(total, dtype=RESULT_DTYPE)
+        pos = 0
+        for ts, values, types, sensor in parts:
+            n = len(ts)
+            result["timestamp"][pos:pos + n] = ts.astype("datetime64[ms]")
+            result["value"][pos:pos + n] = values
+            result["type"][pos:pos + n] = types
+            result["sensor"][pos:pos + n] = sensor
+            pos += n
+        if value_min is not None:
+            result = result[result["value"] >= value_min]
+        if value_max is not None:
+            result = result[result["value"] <= value_max]
+        if len(parts) > 1 or codes is None or len(codes) > 1:
+            result = result[np.argsort(result["timestamp"], kind="stable")]
+        return result
+
+    def series(self, sensor_id: str, data_type: str, start=None, end=None,
+               last: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """单个传感器某类数据的 (时间戳 datetime64[ms], 数值) 序列；last 只取最近 last 个点"""
+        result = self.query(sensor_id, data_type, start, end)
+        if last is not None:
+            result = result[-last:]
+        return result["timestamp"], result["value"]
+
+    def latest(self, data_type: str, n: int = 50, sensor_id: str = None) -> np.ndarray:
+        """最近 n 条某类读数（不限传感器时为全部传感器），按时间排序"""
+        parts = []
+        found = 0
+        with self._lock:
+            segments = [self._pin(entry["name"])
+                        for entry in sorted(self._segments, key=lambda entry: entry["max_ts"], reverse=True)
+                        if data_type in entry["types"]]
+            buffers = [(buffer, buffer.rows) for buffer in self._sealing + [self._active]]
+            codes = self._resolve_codes(sensor_id, None)
+        type_code = TYPE_CODES[data_type]
+        for buffer, count in reversed(buffers):
+            ts, sensor, types, values = buffer.columns(count)
+            mask = types == type_code
+            if codes is not None:
+                mask &= np.isin(sensor, codes)
+            parts.append((ts[mask], values[mask], sensor[mask]))
+            found += int(mask.sum())
+        for segment in segments:
+            if found >= n:
+                break
+            rows = segment.select(codes, type_code, np.iinfo(np.int64).min, np.iinfo(np.int64).max)
+            parts.append((segment.ts[rows], segment.value[rows], segment.sensors_of(rows)))
+            found += len(rows)
+        if not parts:
+            return np.empty(0, dtype=RESULT_DTYPE)
+        ts = np.concatenate([part[0] for part in parts])
+        order = np.argsort(ts, kind="stable")[-n:]
+        result = np.empty(len(order), dtype=RESULT_DTYPE)
+        result["timestamp"] = ts[order].astype("datetime64[ms]")
+        result["value"] = np.concatenate([part[1] for part in parts])[order]
+        result["type"] = type_code
+        result["sensor"] = np.concatenate([part[2] for part in parts])[order]
+        return result
+
+    def sensor_name(self, code: int) -> str:
+        return self._sensor_ids[int(code)]
+
+    def sensors(self, location: str = None) -> List[str]:
+        with self._lock:
+            return [sensor_id for sensor_id, loc in zip(self._sensor_ids, self._sensor_locations)
+                    if location is None or loc == location]
+
+    def to_readings(self, result: np.ndarray) -> np.ndarray:
+        """查询结果 -> common.reading 的 READING_DTYPE 批量数组"""
+        from common.reading import check_text_width, empty_batch
+
+        batch = empty_batch(len(result))
+        batch["timestamp"] = result["timestamp"].astype("datetime64[s]")
+        batch["value"] = result["value"]
+        batch["type"] = result["type"]
+        with self._lock:
+            ids = np.array(self._sensor_ids or [""], dtype=object)
+            locations = np.array([loc or "" for loc in self._sensor_locations] or [""], dtype=object)
+        used = np.unique(result["sensor"])
+        check_text_width("sensor_id", ids[used])
+        check_text_width("location", locations[used])
+        batch["sensor_id"] = ids[result["sensor"]]
+        batch["location"] = locations[result["sensor"]]
+        return batch
+
+    # -------- 统计与生命周期 --------
+    def __len__(self) -> int:
+        with self._lock:
+            return (sum(entry["rows"] for entry in self._segments)
+                    + sum(buffer.rows for buffer in self._sealing) + self._active.rows)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            segments = self._segments
+            return {
+                "root": str(self.root),
+                "segments": len(segments),
+                "segment_rows": sum(entry["rows"] for entry in segments),
+                "active_rows": self._active.rows if self._active else 0,
+                "unsynced_rows": sum(buffer.rows - buffer.logged
+                                     for buffer in self._sealing + ([self._active] if self._active else [])),
+                "sealing": len(self._sealing),
+                "sensors": len(self._sensor_ids),
+                "appended": self.appended,
+                "syncs": self.syncs,
+                "last_sync_ms": self.last_sync_ms,
+                "compactions": self.compactions,
+                "time_range": ((min(entry["min_ts"] for entry in segments),
+                                max(entry["max_ts"] for entry in segments)) if segments else None),
+            }
+
+    def close(self):
+        """同步剩余数据并停止后台线程（open_store() 打开的实例按引用计数关闭）"""
+        with self._lock:
+            if self._closed:
+                return
+            if self._refs > 1:
+                self._refs -= 1
+                return
+            self._closed = True
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self.sync()
+        self._seal_pending()
+        with self._io_lock:
+            if self._active.log is not None:
+                self._active.log.close()
+                self._active.log = None
+            if not self._active.rows:
+                self._active.log_path.unlink()
+            if self._spare is not None:
+                self._discard_buffer(self._spare)
+                self._spare = None
+        if self._catalog_file:
+            self._catalog_file.close()
+        with _STORES_LOCK:
+            if _STORES.get(self.root.resolve()) is self:
+                del _STORES[self.root.resolve()]
+
+
+_STORES: Dict[Path, SegmentStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def open_store(root=DEFAULT_STORE_DIR, **options) -> SegmentStore:
+    """打开（或共享同一进程中已打开的）存储；每次调用都需要对应一次 close()"""
+    key = Path(root).resolve()
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None or store._closed:
+            store = _STORES[key] = SegmentStore(key, **options)
+        store._refs += 1
+        return store
+
+
+__all__ = [
+    "SegmentStore",
+    "open_store",
+    "to_epoch_ms",
+    "now_ms",
+    "to_unix_seconds",
+    "RESULT_DTYPE",
+    "DEFAULT_STORE_DIR",
+]
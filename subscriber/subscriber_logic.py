@@ -1,20 +1,39 @@
 # subscriber/subscriber_logic.py
 # MQTT 订阅端逻辑封装，供 GUI 调用
 
-import json
 import threading
-from typing import Callable, Dict, Optional
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
 
 import paho.mqtt.client as mqtt
 
+from .fast_decode import decode_message
+from .ingest import IngestPipeline, OVERFLOW_BLOCK
+from .sql_history import SQLiteHistory
+from .storage import SegmentStore, open_store
+
+# 以这些后缀结尾的存储路径按 SQLite 历史库打开，其余按时序存储目录打开
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
 
 class SubscriberLogic:
-    """封装 paho-mqtt，提供基础的连接、订阅与回调接口。"""
+    """封装 paho-mqtt，提供基础的连接、订阅与回调接口。
+
+    收到的消息先进入有界队列，由工作线程解析并调用回调，慢消费者不会阻塞
+    paho 网络线程。queue_size=0 时退化为在网络线程中直接解析与回调。
+    storage 为 SegmentStore / SQLiteHistory 实例或路径时，解析出的读数在回调前写入存储；
+    storage_options 为按路径打开存储时的参数（如 segment_rows）。
+    """
 
     def __init__(self,
                  broker: str = "127.0.0.1",
                  port: int = 1883,
-                 keepalive: int = 60):
+                 keepalive: int = 60,
+                 queue_size: int = 1000,
+                 workers: int = 1,
+                 overflow: str = OVERFLOW_BLOCK,
+                 storage: Union[SegmentStore, SQLiteHistory, str, Path, None] = None,
+                 storage_options: Optional[Dict] = None):
         self.broker = broker
         self.port = port
         self.keepalive = keepalive
@@ -33,11 +52,41 @@ class SubscriberLogic:
         self._auto_reconnect = True  # 自动重连标志
         self._last_connect_attempt = 0  # 上次连接尝试时间
 
+        # 接收流水线：overflow 可选 block / drop_oldest / drop_newest
+        self._ingest: Optional[IngestPipeline] = None
+        if queue_size > 0:
+            self._ingest = IngestPipeline(self._dispatch, queue_size, workers, overflow)
+
+        self.storage: Union[SegmentStore, SQLiteHistory, None] = None
+        self._owns_storage = False
+        if storage is not None:
+            self.set_storage(storage, **(storage_options or {}))
+
     # -------- 对外接口 --------
     def set_on_message(self, callback: Callable[[Dict], None]):
-        """设置消息回调，参数为解析后的 dict。"""
+        """设置消息回调。
+
+        符合发布端格式的消息以 SensorMessage 传入（支持 dict 式的 get/[] 访问），
+        其他消息仍为解析后的 dict。
+        """
         self._on_message_cb = callback
 
+    def set_storage(self, storage: Union[SegmentStore, SQLiteHistory, str, Path, None],
+                    **options):
+        """设置读数存储（实例或路径；传入路径时由本对象打开并在 close() 时关闭）
+
+        路径以 .db/.sqlite/.sqlite3 结尾时打开 SQLite 历史库，否则打开时序存储目录；
+        options 传给 SQLiteHistory / open_store。
+        """
+        if self._owns_storage and self.storage is not None:
+            self.storage.close()
+        if storage is None or isinstance(storage, (SegmentStore, SQLiteHistory)):
+            self.storage, self._owns_storage = storage, False
+        elif Path(storage).suffix.lower() in SQLITE_SUFFIXES:
+            self.storage, self._owns_storage = SQLiteHistory(storage, **options), True
+        else:
+            self.storage, self._owns_storage = open_store(storage, **options), True
+
     def set_on_connection(self, callback: Callable[[bool], None]):
         """设置连接状态回调，参数为 True/False。"""
         self._on_connection_cb = callback
@@ -135,6 +184,21 @@ class SubscriberLogic:
             self._client.unsubscribe(topic)
             self._subscriptions.discard(topic)
 
+    def get_ingest_stats(self) -> Dict:
+        """接收队列统计：深度、丢弃计数与端到端延迟（毫秒）"""
+        if not self._ingest:
+            return {}
+        return self._ingest.stats()
+
+    def close(self):
+        """断开连接并停止接收工作线程"""
+        self.disconnect()
+        if self._ingest:
+            self._ingest.stop()
+        if self._owns_storage and self.storage is not None:
+            self.storage.close()
+            self.storage = None
+
     def list_subscriptions(self):
         return sorted(list(self._subscriptions))
     
@@ -189,19 +253,19 @@ class SubscriberLogic:
                 pass
 
     def _on_message(self, client, userdata, msg):
-        payload_text = msg.payload.decode("utf-8", errors="ignore").strip()
-        parsed: Dict = {
-            "topic": msg.topic,
-            "payload": payload_text,
-        }
-        # 尝试解析 JSON
-        try:
-            data = json.loads(payload_text)
-            if isinstance(data, dict):
-                parsed.update(data)
-        except json.JSONDecodeError:
-            pass
+        if self._ingest:
+            if not self._ingest.is_running():
+                self._ingest.start()
+            self._ingest.put(msg.topic, msg.payload)
+        else:
+            self._dispatch(msg.topic, msg.payload)
 
+    def _dispatch(self, topic: str, payload: bytes):
+        """解析消息并调用用户回调（在接收工作线程中执行）"""
+        parsed = decode_message(topic, payload)
+        storage = self.storage
+        if storage is not None:
+            storage.append_message(parsed)
         if self._on_message_cb:
             self._on_message_cb(parsed)
 
@@ -0,0 +1,61 @@
+# tests/test_storage.py
+# 时序存储：封存过程中的查询不应重复返回行
+
+import threading
+
+from subscriber.storage import SegmentStore
+
+ROWS = 1000
+
+
+def _fill(store):
+    for i in range(ROWS):
+        store.append("S1", "temperature", float(i), f"2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}")
+
+
+def test_query_during_seal(tmp_path):
+    store = SegmentStore(tmp_path, segment_rows=100, sync_interval=3600)
+    seen = []
+    discard = store._discard_buffer
+
+    def probe(buffer):
+        # 段已登记到清单、缓冲日志尚未删除时查询
+        seen.append((len(store.query()), len(store.latest("temperature", ROWS * 2)), len(store)))
+        discard(buffer)
+
+    store._discard_buffer = probe
+    with store._io_lock:  # 先写满若干缓冲，再统一封存
+        _fill(store)
+    store._seal_pending()
+    store._discard_buffer = discard
+    try:
+        assert seen
+        assert all(counts == (ROWS, ROWS, ROWS) for counts in seen)
+        assert len(store.query()) == ROWS
+    finally:
+        store.close()
+
+
+def test_concurrent_query_row_count(tmp_path):
+    store = SegmentStore(tmp_path, segment_rows=50, sync_interval=0.01)
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            rows = store.query()
+            if len(rows) > store.appended or len(set(rows["value"])) != len(rows):
+                errors.append(len(rows))
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        _fill(store)
+    finally:
+        done.set()
+        thread.join()
+    try:
+        assert not errors
+        assert len(store.query()) == ROWS
+    finally:
+        store.close()
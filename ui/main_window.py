@@ -10,6 +10,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from ui.base_window import BaseWindow
+from ui.update_scheduler import ui_scheduler
 
 # 导入各个页面（由团队成员实现）
 from ui.pages.publisher_page import PublisherPage
@@ -152,6 +153,9 @@ class MainWindow(BaseWindow):
         # 当发布端连接状态变化时，驱动订阅端和分析端的连接
         if hasattr(self.publisher_page, 'connection_changed'):
             self.publisher_page.connection_changed.connect(self._on_publisher_connection_changed)
+        # 重新开始发布时，分析端把后续读数当作新的数据流
+        if hasattr(self.publisher_page, 'publish_started'):
+            self.publisher_page.publish_started.connect(self.analyzer_page.on_publish_started)
 
     def switch_page(self, index: int):
         """切换页面"""
@@ -254,6 +258,7 @@ class MainWindow(BaseWindow):
             for page in self.pages.values():
                 if hasattr(page, 'cleanup'):
                     page.cleanup()
+            ui_scheduler().stop()
             event.accept()
         else:
             event.ignore()
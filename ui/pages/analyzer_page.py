@@ -6,6 +6,8 @@
 
 import sys
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import numpy as np
 from PyQt5.QtWidgets import (
@@ -13,13 +15,14 @@ from PyQt5.QtWidgets import (
     QPushButton, QGridLayout, QSplitter, QProgressBar,
     QTableWidget, QTableWidgetItem, QHeaderView
 )
-from PyQt5.QtCore import Qt, QTimer, QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtCore import Qt, QTimer, QObject, QThread, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QColor
 
 from .base_page import BasePage
 from ui.widgets.data_card import MiniCard, StatusCard
 from ui.widgets.chart_widget import LineChart
 from ui.widgets.gauge_widget import DashboardGauge
+from ui.update_scheduler import ui_scheduler, set_style_sheet
 
 
 # ========== 添加分析模块路径 ==========
@@ -41,15 +44,41 @@ except ImportError as e:
 
 
 class AnalyzerWorker(QObject):
-    """分析工作线程（非真正线程，只是避免在回调中更新UI）"""
+    """分析工作线程：在独立的 QThread 中运行 XiaojiaBrain.process_sensor_data
+
+    读数按传感器合并，处理不过来时同一传感器只保留最新一条（较旧的计入 dropped）；
+    分析结果按帧合并，每 FRAME_INTERVAL_MS 最多发出一次 analysis_complete，
+    且上一次结果被界面取走（frame_done）之前不再发出新的结果。
+    """
+    
+    # 结果合并的帧间隔（毫秒）
+    FRAME_INTERVAL_MS = 33
     
     # 定义信号
-    data_received = pyqtSignal(dict, str, str)  # 传感器数据，地点，传感器ID
-    analysis_complete = pyqtSignal(dict)  # 分析完成
+    data_received = pyqtSignal(object, str, str)  # 传感器数据（CombinedReading），地点，传感器ID
+    analysis_complete = pyqtSignal(dict)  # 分析完成（每帧最多一次，取最新的结果）
+    _wake = pyqtSignal()  # 有新的待处理读数（跨线程排队投递）
     
     def __init__(self):
         super().__init__()
         self.xiaojia_brain = None
+        self._thread = None
+        self._frame_timer = None
+        
+        # 待处理读数：sensor_id -> (数据, 地点, 传感器ID)，按到达顺序
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()
+        self._scheduled = False
+        # 每个传感器最近一次处理过的读数（定时器据此跳过已处理的数据）
+        self._handled = {}
+        self._latest_result = None
+        self._in_flight = False
+        
+        self.processed = 0
+        self.dropped = 0
+        self.frames = 0
+        
+        self._wake.connect(self._drain)
         
     def init_brain(self):
         """初始化小嘉大脑"""
@@ -60,19 +89,111 @@ class AnalyzerWorker(QObject):
         except Exception as e:
             return False
     
-    def _on_realtime_data(self, sensor_data: dict, location: str, sensor_id: str):
-        """实时数据回调 - 通过信号传递到主线程"""
-        # 不在此处处理数据，只是转发信号
+    def start(self):
+        """把工作器移到独立线程并启动"""
+        if self._thread is not None:
+            return
+        self._thread = QThread()
+        self._thread.setObjectName("analyzer-worker")
+        self.moveToThread(self._thread)
+        self._thread.started.connect(self._on_thread_started)
+        self._thread.start()
+    
+    def stop(self):
+        """停止线程（未处理的读数被丢弃）"""
+        if self._thread is None:
+            return
+        with self._lock:
+            self._pending.clear()
+        self._thread.quit()
+        self._thread.wait(2000)
+        self._thread = None
+    
+    @pyqtSlot()
+    def _on_thread_started(self):
+        # 帧定时器必须在工作线程中创建
+        self._frame_timer = QTimer()
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._emit_frame)
+    
+    def _on_realtime_data(self, sensor_data, location: str, sensor_id: str):
+        """实时数据回调（在 MQTT 接收线程中调用）：转发状态信号并排队分析"""
         self.data_received.emit(sensor_data, location, sensor_id)
+        self.process_data(sensor_data, location, sensor_id)
     
-    def process_data(self, sensor_data: dict, location: str = None, sensor_id: str = None):
-        """处理数据"""
-        try:
-            if self.xiaojia_brain:
+    def process_data(self, sensor_data, location: str = None, sensor_id: str = None) -> bool:
+        """提交数据（任意线程可调用），已处理或已在排队的同一条读数会被跳过"""
+        key = sensor_id or (sensor_data.get("sensor_id") if sensor_data else None)
+        with self._lock:
+            if self._handled.get(key) is sensor_data:
+                return False
+            previous = self._pending.pop(key, None)
+            if previous is not None:
+                if previous[0] is sensor_data:
+                    self._pending[key] = previous
+                    return False
+                self.dropped += 1
+            self._pending[key] = (sensor_data, location, sensor_id)
+            if self._scheduled:
+                return True
+            self._scheduled = True
+        self._wake.emit()
+        return True
+    
+    @pyqtSlot()
+    def _drain(self):
+        """处理当前排队的全部读数（在工作线程中执行）"""
+        with self._lock:
+            pending = list(self._pending.items())
+            self._pending.clear()
+            self._scheduled = False
+        if not self.xiaojia_brain:
+            return
+        for key, (sensor_data, location, sensor_id) in pending:
+            try:
                 result = self.xiaojia_brain.process_sensor_data(sensor_data, location, sensor_id)
-                self.analysis_complete.emit(result)
-        except Exception as e:
-            pass
+            except Exception:
+                continue
+            with self._lock:
+                self._handled[key] = sensor_data
+                self._latest_result = result
+                self.processed += 1
+        self._schedule_frame()
+    
+    def _schedule_frame(self):
+        if self._latest_result is None or self._frame_timer is None:
+            return
+        if not self._frame_timer.isActive():
+            self._frame_timer.start(self.FRAME_INTERVAL_MS)
+    
+    @pyqtSlot()
+    def _emit_frame(self):
+        with self._lock:
+            if self._in_flight:
+                # 界面尚未处理完上一帧，推迟到下一帧
+                result = None
+            else:
+                result, self._latest_result = self._latest_result, None
+                self._in_flight = result is not None
+        if result is None:
+            self._schedule_frame()
+            return
+        self.frames += 1
+        self.analysis_complete.emit(result)
+    
+    def frame_done(self):
+        """界面处理完一帧结果后调用（主线程）"""
+        with self._lock:
+            self._in_flight = False
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "frames": self.frames,
+            }
 
 
 class ComfortGauge(DashboardGauge):
@@ -248,6 +369,9 @@ class AnalyzerPage(BasePage):
         # 预测状态
         self.prediction_ready = False
         
+        # 历史对比的时间跨度（秒），从历史库的汇总表中查询
+        self.comparison_span = 24 * 3600
+        
         # 调用父类初始化
         super().__init__(parent)
         
@@ -262,12 +386,14 @@ class AnalyzerPage(BasePage):
         success = self.worker.init_brain()
         if not success:
             raise RuntimeError("无法初始化分析引擎")
+        # 分析在独立线程中进行，结果按帧合并后回到主线程
+        self.worker.start()
 
         # 默认不自动连接 MQTT，等待发布端连接后再触发
         self.mqtt_enabled = False
     
-    @pyqtSlot(dict, str, str)
-    def _on_data_received(self, sensor_data: dict, location: str, sensor_id: str):
+    @pyqtSlot(object, str, str)
+    def _on_data_received(self, sensor_data, location: str, sensor_id: str):
         """接收到实时数据（在主线程中执行）"""
         # 更新数据收集状态
         if "temperature" in sensor_data:
@@ -280,17 +406,21 @@ class AnalyzerPage(BasePage):
             self.data_collection_status["pressure"] = True
             self.data_collection_count["pressure"] += 1
         
-        # 更新数据收集状态显示
-        self._update_data_collection_status()
-        
-        # 处理数据
-        self.worker.process_data(sensor_data, location, sensor_id)
+        # 数据收集状态显示在下一帧统一刷新（分析已由工作线程排队处理）
+        ui_scheduler().post((self, "collection"), self._update_data_collection_status)
     
     @pyqtSlot(dict)
     def _on_analysis_complete(self, analysis_result: dict):
-        """分析完成（在主线程中执行）"""
+        """分析完成（在主线程中执行）：结果在下一帧与其他界面更新一起应用"""
+        ui_scheduler().post((self, "analysis"), self._apply_analysis, analysis_result)
+
+    def _apply_analysis(self, analysis_result: dict):
+        """应用一次分析结果，并通知工作线程可以发出下一帧"""
         # 更新UI
-        self._update_ui_with_analysis(analysis_result)
+        try:
+            self._update_ui_with_analysis(analysis_result)
+        finally:
+            self.worker.frame_done()
         
         # 检查预测状态
         prediction_available = analysis_result.get("prediction_available", False)
@@ -352,15 +482,17 @@ class AnalyzerPage(BasePage):
             
             status_text += f" [{' '.join(details)}]"
             self.source_status_label.setText(status_text)
-            self.source_status_label.setStyleSheet(status_style)
+            # 样式只在状态级别变化时重设（重设样式表代价较高）
+            set_style_sheet(self.source_status_label, status_style)
     
     def _on_timer(self):
-        """定时器槽函数 - 检查是否有实时数据"""
+        """定时器槽函数 - 补充处理尚未经过分析的实时数据"""
         # 尝试获取最新的实时数据
         try:
             if hasattr(self.worker.xiaojia_brain, 'get_realtime_data'):
                 realtime_data = self.worker.xiaojia_brain.get_realtime_data()
-                if realtime_data:
+                # 已分析过（或已在排队）的读数不再重复处理
+                if realtime_data and self.worker.process_data(realtime_data):
                     # 更新数据收集状态
                     if "temperature" in realtime_data:
                         self.data_collection_status["temperature"] = True
@@ -370,8 +502,6 @@ class AnalyzerPage(BasePage):
                         self.data_collection_status["pressure"] = True
                     
                     self._update_data_collection_status()
-                    
-                    self.worker.process_data(realtime_data)
         except Exception as e:
             # 忽略数据不完整的错误，定时器只是尝试处理
             if "传感器数据不完整" not in str(e):
@@ -509,7 +639,7 @@ class AnalyzerPage(BasePage):
         comp_layout.addWidget(self.comparison_chart)
         
         # 图表说明
-        chart_info = QLabel("📊 图表显示最近30个数据点（采样显示），虚线为上海参考值")
+        chart_info = QLabel("📊 图表显示最近24小时的30段均值（来自历史汇总表），虚线为上海参考值")
         chart_info.setStyleSheet("color: #aaddff; font-size: 11px; padding: 5px;")
         comp_layout.addWidget(chart_info)
         
@@ -679,7 +809,8 @@ class AnalyzerPage(BasePage):
         """更新对比图表 - 显示实际数据和上海参考数据"""
         try:
             if hasattr(self.worker.xiaojia_brain, 'get_historical_data'):
-                history = self.worker.xiaojia_brain.get_historical_data(data_type)
+                history = self.worker.xiaojia_brain.get_historical_data(
+                    data_type, span=self.comparison_span)
                 if history and data_type in history:
                     data = history[data_type]
                     if data:
@@ -857,12 +988,12 @@ class AnalyzerPage(BasePage):
                 
                 if has_sufficient_data:
                     self.label_pred_status.setText(f"📊 {prediction_type} | 置信度: {confidence:.0f}%")
-                    self.label_pred_status.setStyleSheet("color: #00ff88; font-size: 12px;")
+                    set_style_sheet(self.label_pred_status, "color: #00ff88; font-size: 12px;")
                 else:
                     data_count = prediction_stats.get("temperature_history", 0)
                     window_size = prediction_stats.get("window_size", 20)
                     self.label_pred_status.setText(f"⏳ {prediction_type} ({data_count}/{window_size})")
-                    self.label_pred_status.setStyleSheet("color: #ffaa00; font-size: 12px;")
+                    set_style_sheet(self.label_pred_status, "color: #ffaa00; font-size: 12px;")
                 
                 # 更新预测图表
                 if "predictions" in prediction_result and self.prediction_chart:
@@ -1036,14 +1167,23 @@ class AnalyzerPage(BasePage):
         except Exception:
             pass
     
+    def on_publish_started(self):
+        """发布端重新开始发布：事件时间将从头开始，重置对齐水位线"""
+        brain = getattr(self.worker, "xiaojia_brain", None)
+        if brain and hasattr(brain, "reset_stream"):
+            brain.reset_stream()
+    
     def cleanup(self):
         """清理资源"""
         if self.timer and self.timer.isActive():
             self.timer.stop()
-        # 断开按需连接的MQTT
+        ui_scheduler().cancel((self, "collection"))
+        ui_scheduler().cancel((self, "analysis"))
+        self.worker.stop()
+        # 断开按需连接的MQTT并关闭历史库
         brain = getattr(self.worker, "xiaojia_brain", None)
-        if brain and hasattr(brain, "disconnect_mqtt"):
+        if brain and hasattr(brain, "close"):
             try:
-                brain.disconnect_mqtt()
+                brain.close()
             except Exception:
                 pass
\ No newline at end of file
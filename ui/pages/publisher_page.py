@@ -24,8 +24,9 @@ from ui.widgets.data_card import MiniCard, StatusCard
 class PublisherPage(BasePage):
     """发布界面"""
 
-    message_published = pyqtSignal(str, dict)
+    message_published = pyqtSignal(str, object)  # 主题，SensorReading
     connection_changed = pyqtSignal(bool)
+    publish_started = pyqtSignal()  # 开始（或重新开始）从文件发布
 
     def init_ui(self):
         """初始化UI"""
@@ -398,7 +399,7 @@ class PublisherPage(BasePage):
         # 设置按钮动画（在所有控件创建后）
         self._setup_animations()
 
-    def _emit_message(self, topic: str, payload: dict):
+    def _emit_message(self, topic: str, payload):
         """触发消息发送信号"""
         self.message_published.emit(topic, payload)
 
@@ -488,8 +489,7 @@ class PublisherPage(BasePage):
         )
         
         interval = self.interval_input.value()
-        records = self.logic.load_records()
-        total_records = len(records)
+        total_records = self.logic.count_records()
         
         if total_records == 0:
             self.send_status("⚠️ 没有可发布的数据文件")
@@ -502,6 +502,7 @@ class PublisherPage(BasePage):
             self.progress_bar.setVisible(True)
             self.progress_bar.setMaximum(total_records)
             self.progress_bar.setValue(0)
+            self.publish_started.emit()
             self.send_status(f"🚀 开始发布数据（共 {total_records} 条，间隔 {interval}s）...")
             self._log(f"🚀 开始从文件发布数据（间隔 {interval}s，共 {total_records} 条）")
         else:
@@ -534,7 +535,7 @@ class PublisherPage(BasePage):
         else:
             self.send_status("❌ 发布失败，请先连接MQTT Broker")
 
-    def _on_message_published(self, topic: str, payload: dict):
+    def _on_message_published(self, topic: str, payload):
         """消息发布回调"""
         self.pub_count += 1
         self.count_card.set_value(str(self.pub_count))
@@ -592,8 +593,7 @@ class PublisherPage(BasePage):
         self.send_status("发布页面已刷新")
         
         # 检查数据文件
-        records = self.logic.load_records()
-        self.file_card.set_value(f"{len(records)} 条")
+        self.file_card.set_value(f"{self.logic.count_records()} 条")
 
     def closeEvent(self, event):
         """窗口关闭时清理"""
@@ -4,6 +4,8 @@
 """
 
 import json
+import threading
+from collections import deque
 from datetime import datetime
 
 from PyQt5.QtWidgets import (
@@ -15,29 +17,38 @@ from PyQt5.QtGui import QColor
 
 from .base_page import BasePage
 from subscriber.subscriber_logic import SubscriberLogic
+from subscriber.storage import DEFAULT_STORE_DIR
 from subscriber.location_widget import LocationWidget
 from subscriber.xiaojia_display import XiaojiaDisplay
 from ui.widgets.data_card import MiniCard, StatusCard, DataCard
 from ui.widgets.chart_widget import LineChart
 from ui.widgets.map_widget import MapWidget
+from ui.update_scheduler import ui_scheduler
 
 
 class SubscriberPage(BasePage):
     """订阅界面"""
 
-    message_received = pyqtSignal(dict)
+    messages_received = pyqtSignal(list)  # 一帧内收到的全部消息（SensorMessage 或 dict），每帧发出一次
     connection_changed = pyqtSignal(bool)
 
     def init_ui(self):
         """初始化UI"""
-        # 逻辑
-        self.logic = SubscriberLogic()
+        # 逻辑（收到的读数写入本地时序存储；存储目录不可用时仅在内存中展示）
+        try:
+            self.logic = SubscriberLogic(storage=DEFAULT_STORE_DIR)
+        except OSError as e:
+            print(f"时序存储不可用: {e}")
+            self.logic = SubscriberLogic()
         self.logic.set_on_message(self._emit_message)
         self.logic.set_on_connection(self._emit_connection)
 
-        self.message_received.connect(self._on_message)
         self.connection_changed.connect(self._on_connection)
 
+        # 收到的消息先放入收件箱，每帧由界面刷新调度器批量处理一次
+        self._inbox = deque()
+        self._inbox_lock = threading.Lock()
+
         self.msg_count = 0
         
         # 存储三类数据的历史值
@@ -235,6 +246,8 @@ class SubscriberPage(BasePage):
         self.content_layout.addWidget(data_container_widget)
         self.content_layout.addStretch()
 
+        self._restore_history()
+
         # 初始状态：不自动连接，由发布端连接成功后触发
         self._refresh_sub_list()
         self.send_status("ℹ️ 订阅端已就绪，等待发布端连接后再连接 MQTT")
@@ -266,6 +279,7 @@ class SubscriberPage(BasePage):
         # 右侧：趋势图
         chart = LineChart(f"{label}趋势")
         chart.setMinimumHeight(200)
+        chart.set_max_points(50)
         
         # 根据数据类型设置图表颜色
         color_map = {
@@ -397,8 +411,17 @@ class SubscriberPage(BasePage):
                 pass
 
     # -------- 信号桥接 --------
-    def _emit_message(self, data: dict):
-        self.message_received.emit(data)
+    def _emit_message(self, data):
+        """MQTT 线程回调：只入队并标记待刷新，界面在下一帧统一更新"""
+        with self._inbox_lock:
+            self._inbox.append(data)
+        ui_scheduler().post((self, "messages"), self._drain_messages)
+
+    def _drain_messages(self):
+        with self._inbox_lock:
+            batch, self._inbox = self._inbox, deque()
+        if batch:
+            self._on_messages(batch)
 
     def _emit_connection(self, connected: bool):
         self.connection_changed.emit(connected)
@@ -413,31 +436,70 @@ class SubscriberPage(BasePage):
             self.status_card.set_status("未连接", "offline")
             self.send_status("❌ 已断开连接")
 
-    def _on_message(self, data: dict):
-        self.msg_count += 1
+    def _on_message(self, data):
+        self._on_messages([data])
+
+    def _on_messages(self, batch):
+        """处理一帧内收到的全部消息：每个点都进入历史与趋势图，
+        卡片、小嘉提示、地图标记与位置只按各自的最新值更新一次"""
+        self.msg_count += len(batch)
         self._update_cards()
 
-        val = data.get("value", data.get("payload", "-"))
-        dtype = data.get("type", "-")
-        loc = data.get("location", "-")
-        sensor_id = data.get("sensor_id", "-")
+        changed = set()
+        latest = {}  # sensor_id -> 该传感器最新的 (dtype, val, loc, sensor_id)
+        last = None
+        for data in batch:
+            val = data.get("value", data.get("payload", "-"))
+            dtype = data.get("type", "-")
+            loc = data.get("location", "-")
+            sensor_id = data.get("sensor_id", "-")
 
-        # 更新对应类型的数据面板
-        if dtype in ["temperature", "humidity", "pressure"]:
-            try:
-                num_val = float(val)
-                self._update_data_panel(dtype, num_val)
-            except (ValueError, TypeError):
-                pass
-        
-        self._update_xiaojia(dtype, val, loc, sensor_id)
+            # 记录对应类型的数据
+            if dtype in self.data_panels:
+                try:
+                    self._record_value(dtype, float(val))
+                    changed.add(dtype)
+                except (ValueError, TypeError):
+                    pass
+
+            last = (dtype, val, loc, sensor_id)
+            if loc or sensor_id:
+                latest[sensor_id] = last
+
+        for dtype in changed:
+            self._refresh_panel(dtype)
+        # 每个传感器只按最新读数更新一次地图标记；最后一条消息的传感器由小嘉一并更新
+        for sensor_id, (dtype, val, loc, _) in latest.items():
+            if sensor_id != last[3]:
+                self.map_widget.update_marker(sensor_id, loc, self._classify(dtype, val, loc)[2])
+        if last is not None:
+            self._update_xiaojia(*last)
+        self.messages_received.emit(list(batch))
 
     # -------- 辅助 --------
+    def _restore_history(self):
+        """从时序存储恢复各类数据最近 50 个点"""
+        storage = self.logic.storage
+        if storage is None:
+            return
+        for dtype in self.data_history:
+            values = storage.latest(dtype, 50)["value"]
+            if not len(values):
+                continue
+            self.data_history[dtype] = [float(v) for v in values]
+            self.current_values[dtype] = self.data_history[dtype][-1]
+            self.data_panels[dtype]["card"].set_value(f"{self.current_values[dtype]:.1f}")
+            self.data_panels[dtype]["chart"].set_data(self.data_history[dtype])
+
     def _update_data_panel(self, dtype: str, value: float):
         """更新指定类型的数据面板"""
         if dtype not in self.data_panels:
             return
-        
+        self._record_value(dtype, value)
+        self._refresh_panel(dtype)
+
+    def _record_value(self, dtype: str, value: float):
+        """记录一个新值：更新当前值、历史数据，并向趋势图追加新点"""
         # 更新当前值
         self.current_values[dtype] = value
         
@@ -446,13 +508,15 @@ class SubscriberPage(BasePage):
         if len(self.data_history[dtype]) > 50:
             self.data_history[dtype].pop(0)
         
-        # 更新数据卡片
+        # 更新趋势图（只追加新点，重绘由调度器按帧合并）
+        self.data_panels[dtype]["chart"].add_point(value)
+
+    def _refresh_panel(self, dtype: str):
+        """按当前值更新数据卡片的数值与状态"""
+        value = self.current_values[dtype]
         panel = self.data_panels[dtype]
         panel["card"].set_value(f"{value:.1f}")
         
-        # 更新趋势图
-        panel["chart"].set_data(self.data_history[dtype])
-        
         # 根据数值设置状态
         status = "normal"
         if dtype == "temperature":
@@ -470,6 +534,17 @@ class SubscriberPage(BasePage):
         panel["card"].set_status(status)
 
     def _update_xiaojia(self, dtype, val, loc, sensor_id):
+        mood, tip, status_for_map = self._classify(dtype, val, loc)
+        self.xiaojia.set_tip(tip, mood)
+        # 更新位置/地图标记
+        if loc or sensor_id:
+            self.map_widget.update_marker(sensor_id, loc, status_for_map)
+        if loc:
+            self.loc_widget.set_location(sensor_id or "-", loc, "实时更新")
+
+    @staticmethod
+    def _classify(dtype, val, loc):
+        """根据读数得到小嘉表情、提示文字与地图标记状态"""
         mood = "normal"
         tip = f"来自 {loc or '未知位置'} 的 {dtype or '数据'}: {val}"
         status_for_map = "normal"
@@ -490,12 +565,7 @@ class SubscriberPage(BasePage):
                 status_for_map = "warning"
         except Exception:
             pass
-        self.xiaojia.set_tip(tip, mood)
-        # 更新位置/地图标记
-        if loc or sensor_id:
-            self.map_widget.update_marker(sensor_id, loc, status_for_map)
-        if loc:
-            self.loc_widget.set_location(sensor_id or "-", loc, "实时更新")
+        return mood, tip, status_for_map
 
     def _update_cards(self):
         self.count_card.set_value(str(self.msg_count))
@@ -549,4 +619,5 @@ class SubscriberPage(BasePage):
         """清理资源"""
         if hasattr(self, 'connection_check_timer'):
             self.connection_check_timer.stop()
-        self.logic.disconnect()
+        ui_scheduler().cancel((self, "messages"))
+        self.logic.close()
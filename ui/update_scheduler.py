@@ -0,0 +1,137 @@
+# ui/update_scheduler.py
+"""
+界面刷新调度器 - 收集各部件的脏状态，每帧通过同一个 QTimer 统一刷新一次
+
+消息到达时只调用 post(key, fn, *args) 记录"这个部件需要刷新"，同一 key 在一帧内
+多次提交时只保留最后一次的参数；定时器每帧（默认 30 Hz）依次执行一遍。界面开销
+因此取决于帧率而不是消息速率。post() 可在任意线程中调用，刷新总在主线程中执行。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from PyQt5.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal, pyqtSlot
+
+DEFAULT_FPS = 30
+
+
+class UpdateScheduler(QObject):
+    """按帧合并的界面刷新调度器"""
+
+    _wake = pyqtSignal()  # 从空闲变为有待刷新项（跨线程时排队投递到主线程）
+
+    def __init__(self, fps: int = DEFAULT_FPS, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._dirty: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._armed = False
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        self.set_fps(fps)
+        self._wake.connect(self._start_timer)
+
+        # 统计
+        self.frames = 0
+        self.posted = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def set_fps(self, fps: int):
+        """设置刷新帧率（例如 30 或 60）"""
+        self.fps = max(1, int(fps))
+        self._timer.setInterval(max(1, round(1000 / self.fps)))
+
+    def post(self, key: Hashable, fn: Callable, *args):
+        """登记一次刷新：下一帧调用 fn(*args)；同一 key 只保留最后一次提交"""
+        with self._lock:
+            self.posted += 1
+            if key in self._dirty:
+                self.coalesced += 1
+            self._dirty[key] = (fn, args)
+            if self._armed or QCoreApplication.instance() is None:
+                return
+            self._armed = True
+        # 在主线程中直接启动定时器，其他线程中排队投递
+        self._wake.emit()
+
+    def cancel(self, key: Hashable):
+        """撤销尚未执行的刷新"""
+        with self._lock:
+            self._dirty.pop(key, None)
+
+    @pyqtSlot()
+    def _start_timer(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @pyqtSlot()
+    def flush(self):
+        """执行本帧全部待刷新项；刷新中新提交的项留到下一帧"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, OrderedDict()
+            if not dirty:
+                # 连续一帧没有新提交时停止定时器，空闲时不占用主线程
+                self._armed = False
+                self._timer.stop()
+                return
+        started = time.perf_counter()
+        for fn, args in dirty.values():
+            try:
+                fn(*args)
+            except Exception as e:
+                self.errors += 1
+                print(f"界面刷新失败: {e}")
+        self.frames += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._dirty)
+
+    def stats(self) -> Dict:
+        return {
+            "fps": self.fps,
+            "frames": self.frames,
+            "posted": self.posted,
+            "coalesced": self.coalesced,
+            "pending": self.pending(),
+            "errors": self.errors,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+        }
+
+    def stop(self):
+        """执行剩余的刷新并停止定时器"""
+        self.flush()
+        self._timer.stop()
+
+
+_scheduler: Optional[UpdateScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def ui_scheduler() -> UpdateScheduler:
+    """进程内共享的调度器（首次调用时创建并归属主线程）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            app = QCoreApplication.instance()
+            _scheduler = UpdateScheduler()
+            if app is not None:
+                _scheduler.moveToThread(app.thread())
+        return _scheduler
+
+
+def set_style_sheet(widget, style: str):
+    """只在样式表变化时重设（重设样式表会触发整棵子树重新解析与布局）"""
+    if widget.styleSheet() != style:
+        widget.setStyleSheet(style)
+
+
+__all__ = ["UpdateScheduler", "ui_scheduler", "set_style_sheet", "DEFAULT_FPS"]
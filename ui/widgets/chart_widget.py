@@ -8,13 +8,19 @@ from PyQt5.QtWidgets import (
     QFrame, QVBoxLayout, QHBoxLayout, QLabel,
     QSizePolicy, QWidget
 )
-from PyQt5.QtCore import Qt, QTimer, QPointF, QRectF
+from PyQt5.QtCore import Qt, QPointF, QRectF
 from PyQt5.QtGui import (
     QPainter, QPen, QColor, QLinearGradient,
-    QPainterPath, QFont, QBrush, QConicalGradient
+    QPainterPath, QFont, QBrush, QConicalGradient, QPolygonF,
+    QPixmap, QTransform
 )
 import math
 
+import numpy as np
+
+from common.downsample import DownsampleCache, METHOD_MINMAX
+from ui.update_scheduler import ui_scheduler
+
 
 class LineChart(QFrame):
     """
@@ -24,22 +30,62 @@ class LineChart(QFrame):
         chart = LineChart("温度趋势")
         chart.set_data([20, 22, 25, 23, 26, 28, 27])
         chart.add_point(29)  # 动态添加点
+
+    数据保存在 NumPy 缓冲区中；点数多于绘图区宽度时按像素降采样（默认 min-max，
+    可用 set_downsample_method("lttb") 切换），降采样结果按缩放级别缓存。
+
+    背景、网格与 Y 轴刻度绘制在缓存的 QPixmap 中，只在尺寸或显示范围变化时重绘；
+    折线在数据坐标中增量追加新点，绘制时整体映射到像素坐标。数据更新后的重绘
+    交给界面刷新调度器，每帧最多一次。
     """
 
+    # 窗口不超过该点数时增量维护折线（更长的窗口总是经过降采样）
+    INCREMENTAL_LIMIT = 2048
+
+    MARGIN_LEFT = 50
+    MARGIN_RIGHT = 20
+    MARGIN_TOP = 55
+    MARGIN_BOTTOM = 35
+
     def __init__(self, title: str = "数据趋势", parent=None):
         super().__init__(parent)
         self.setObjectName("chartWidget")
 
         self.title = title
-        self.data_points = []
         self.max_points = 30
 
+        # 数据窗口为 _buffer[_start:_end]，追加均摊 O(1)
+        self._buffer = np.empty(64, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        self._first = 0     # 窗口第一个点的序号（淘汰旧点时递增）
+        self._version = 0   # 数据每次变化加一，作为降采样缓存的版本号
+        self._downsample = DownsampleCache(METHOD_MINMAX)
+
+        # 折线（数据坐标：x 为点序号，y 为数值），None 表示需要重建
+        self._polyline: QPolygonF = None
+        self._sampled = (None, None)    # (版本, 降采样后的折线)
+        self._display_range = None      # 当前显示范围（含边距）
+
+        # 静态图层缓存
+        self._static: QPixmap = None
+        self._static_key = None
+        self._gradient = None
+
+        # 值标签在下一帧与重绘一起更新
+        self._pending_label = None
+
         # 样式设置
         self.line_color = QColor(0, 200, 255)
         self.fill_color_top = QColor(0, 200, 255, 80)
         self.fill_color_bottom = QColor(0, 200, 255, 10)
         self.grid_color = QColor(30, 60, 100)
         self.text_color = QColor(100, 140, 180)
+        self._grid_pen = QPen(self.grid_color, 1, Qt.DashLine)
+        self._line_pen = QPen(self.line_color, 2)
+        self._marker_pen = QPen(QColor(255, 255, 255), 2)
+        self._y_font = QFont("Arial", 9)
+        self._x_font = QFont("Arial", 8)
 
         self.setMinimumHeight(200)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -104,76 +150,143 @@ class LineChart(QFrame):
         layout.addWidget(header)
         layout.addStretch()
 
+    @property
+    def values(self) -> np.ndarray:
+        """当前数据窗口（只读视图）"""
+        view = self._buffer[self._start:self._end]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def data_points(self) -> list:
+        return self.values.tolist()
+
+    def set_max_points(self, max_points: int):
+        """设置保留的最大点数（例如按 1 Hz 显示一天的数据设为 86400）"""
+        self.max_points = max(2, int(max_points))
+        if self._end - self._start > self.max_points:
+            self._first += self._end - self._start - self.max_points
+            self._start = self._end - self.max_points
+            self._data_changed(rebuild=True)
+
+    def set_downsample_method(self, method: str):
+        """设置降采样方法："minmax"（保留峰谷）或 "lttb"（保留形状）"""
+        self._downsample = DownsampleCache(method)
+        self._sampled = (None, None)
+        self._schedule_repaint()
+
     def add_point(self, value: float):
-        """添加单个数据点"""
-        self.data_points.append(value)
-        if len(self.data_points) > self.max_points:
-            self.data_points.pop(0)
-        self.value_label.setText(f"{value:.1f}")
-        self.update()
+        """添加单个数据点（折线只追加新点，重绘按帧合并）"""
+        value = float(value)
+        if self._end == len(self._buffer):
+            self._reserve(self._end - self._start + 1)
+        self._buffer[self._end] = value
+        self._end += 1
+        polyline = self._polyline
+        if polyline is not None:
+            polyline.append(QPointF(self._first + self._end - self._start - 1, value))
+        if self._end - self._start > self.max_points:
+            self._start += 1
+            self._first += 1
+            if polyline is not None:
+                polyline.remove(0)
+        self._pending_label = f"{value:.1f}"
+        self._data_changed()
+
+    def _reserve(self, count: int):
+        """把数据窗口移到缓冲区开头，必要时扩容，保证能容纳 count 个点"""
+        window = self._buffer[self._start:self._end]
+        buffer = self._buffer
+        if count > len(buffer) // 2:
+            buffer = np.empty(max(64, 2 * min(count, self.max_points + 1), count), dtype=np.float64)
+        buffer[:len(window)] = window
+        self._buffer, self._start, self._end = buffer, 0, len(window)
 
     def set_data(self, data: list):
         """设置完整数据"""
-        self.data_points = list(data[-self.max_points:])
-        if self.data_points:
-            self.value_label.setText(f"{self.data_points[-1]:.1f}")
-        self.update()
+        values = np.asarray(data, dtype=np.float64)[-self.max_points:]
+        if len(values) > len(self._buffer):
+            self._buffer = np.empty(max(64, 2 * len(values)), dtype=np.float64)
+        self._buffer[:len(values)] = values
+        self._start, self._end, self._first = 0, len(values), 0
+        self._pending_label = f"{values[-1]:.1f}" if len(values) else "--"
+        self._data_changed(rebuild=True)
 
     def clear_data(self):
         """清空数据"""
-        self.data_points = []
-        self.value_label.setText("--")
-        self.update()
+        self._start = self._end = self._first = 0
+        self._display_range = None
+        self._pending_label = "--"
+        self._data_changed(rebuild=True)
+
+    def _data_changed(self, rebuild: bool = False):
+        self._version += 1
+        if rebuild:
+            self._polyline = None
+        self._schedule_repaint()
 
     def set_line_color(self, color: QColor):
         """设置线条颜色"""
         self.line_color = color
         self.fill_color_top = QColor(color.red(), color.green(), color.blue(), 80)
         self.fill_color_bottom = QColor(color.red(), color.green(), color.blue(), 10)
+        self._line_pen = QPen(self.line_color, 2)
+        self._static_key = None
         self.update()
 
-    def paintEvent(self, event):
-        """绘制图表"""
-        super().paintEvent(event)
-
-        if len(self.data_points) < 2:
-            return
-
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+    # -------- 按帧重绘 --------
+    def _schedule_repaint(self):
+        """一帧内的多次数据更新合并为一次重绘"""
+        ui_scheduler().post(self, self._flush)
 
-        # 计算绘图区域
-        margin_left = 50
-        margin_right = 20
-        margin_top = 55
-        margin_bottom = 35
+    def _flush(self):
+        if self._pending_label is not None:
+            self.value_label.setText(self._pending_label)
+            self._pending_label = None
+        self.update()
 
-        chart_rect = QRectF(
-            margin_left,
-            margin_top,
-            self.width() - margin_left - margin_right,
-            self.height() - margin_top - margin_bottom
+    # -------- 绘制 --------
+    def _chart_rect(self) -> QRectF:
+        return QRectF(
+            self.MARGIN_LEFT,
+            self.MARGIN_TOP,
+            self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT,
+            self.height() - self.MARGIN_TOP - self.MARGIN_BOTTOM
         )
 
-        if chart_rect.width() <= 0 or chart_rect.height() <= 0:
-            return
-
-        # 计算数据范围
-        min_val = min(self.data_points)
-        max_val = max(self.data_points)
-        value_range = max_val - min_val if max_val != min_val else 1
-
+    def _update_range(self, low: float, high: float):
+        """数据仍在显示范围内且占满一半以上时保持范围不变，避免静态图层频繁重绘"""
+        current = self._display_range
+        if current is not None:
+            bottom, top = current
+            if bottom <= low and high <= top and (high - low) * 2 >= top - bottom:
+                return current
+        value_range = high - low if high != low else 1
         # 留出10%边距
-        min_val -= value_range * 0.1
-        max_val += value_range * 0.1
+        self._display_range = (low - value_range * 0.1, high + value_range * 0.1)
+        return self._display_range
+
+    def _static_layer(self, chart_rect: QRectF, min_val: float, max_val: float) -> QPixmap:
+        """背景、网格、Y 轴刻度与填充渐变（按尺寸与显示范围缓存，与点数无关）"""
+        key = (self.width(), self.height(), min_val, max_val, self.devicePixelRatioF())
+        if key == self._static_key:
+            return self._static
+
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.drawFrame(painter)
         value_range = max_val - min_val
 
         # ===== 绘制网格线 =====
-        painter.setPen(QPen(self.grid_color, 1, Qt.DashLine))
         num_grid_lines = 5
-
+        painter.setFont(self._y_font)
         for i in range(num_grid_lines):
             y = chart_rect.top() + chart_rect.height() * i / (num_grid_lines - 1)
+            painter.setPen(self._grid_pen)
             painter.drawLine(
                 QPointF(chart_rect.left(), y),
                 QPointF(chart_rect.right(), y)
@@ -182,70 +295,98 @@ class LineChart(QFrame):
             # Y轴刻度值
             val = max_val - value_range * i / (num_grid_lines - 1)
             painter.setPen(self.text_color)
-            painter.setFont(QFont("Arial", 9))
             painter.drawText(
-                QRectF(5, y - 10, margin_left - 10, 20),
+                QRectF(5, y - 10, self.MARGIN_LEFT - 10, 20),
                 Qt.AlignRight | Qt.AlignVCenter,
                 f"{val:.1f}"
             )
-            painter.setPen(QPen(self.grid_color, 1, Qt.DashLine))
-
-        # ===== 计算数据点坐标 =====
-        points = []
-        for i, val in enumerate(self.data_points):
-            x = chart_rect.left() + chart_rect.width() * i / (len(self.data_points) - 1)
-            y = chart_rect.bottom() - chart_rect.height() * (val - min_val) / value_range
-            points.append(QPointF(x, y))
-
-        # ===== 绘制填充区域 =====
-        fill_path = QPainterPath()
-        fill_path.moveTo(QPointF(points[0].x(), chart_rect.bottom()))
-        fill_path.lineTo(points[0])
-
-        for p in points[1:]:
-            fill_path.lineTo(p)
-
-        fill_path.lineTo(QPointF(points[-1].x(), chart_rect.bottom()))
-        fill_path.closeSubpath()
+        painter.end()
 
         # 渐变填充
-        gradient = QLinearGradient(0, chart_rect.top(), 0, chart_rect.bottom())
-        gradient.setColorAt(0, self.fill_color_top)
-        gradient.setColorAt(1, self.fill_color_bottom)
-        painter.fillPath(fill_path, gradient)
-
-        # ===== 绘制折线 =====
-        line_path = QPainterPath()
-        line_path.moveTo(points[0])
-        for p in points[1:]:
-            line_path.lineTo(p)
+        self._gradient = QLinearGradient(0, chart_rect.top(), 0, chart_rect.bottom())
+        self._gradient.setColorAt(0, self.fill_color_top)
+        self._gradient.setColorAt(1, self.fill_color_bottom)
+
+        self._static, self._static_key = pixmap, key
+        return pixmap
+
+    def _data_polyline(self, values: np.ndarray, pixels: int):
+        """数据坐标下的折线与数值范围；点数多于像素数时使用降采样结果"""
+        count = len(values)
+        if count > pixels:
+            indices, low, high = self._downsample.get(values, pixels, self._version)
+            version, polyline = self._sampled
+            if version != self._version:
+                xs = (indices + self._first).tolist()
+                polyline = QPolygonF([QPointF(x, y) for x, y in zip(xs, values[indices].tolist())])
+                self._sampled = (self._version, polyline)
+            return polyline, low, high
+
+        if self._polyline is None or self._polyline.size() != count:
+            self._polyline = QPolygonF([QPointF(self._first + i, y)
+                                        for i, y in enumerate(values.tolist())])
+        polyline = self._polyline
+        if count > self.INCREMENTAL_LIMIT:
+            self._polyline = None
+        return polyline, float(values.min()), float(values.max())
 
-        painter.setPen(QPen(self.line_color, 2))
-        painter.drawPath(line_path)
+    def paintEvent(self, event):
+        """绘制图表"""
+        values = self._buffer[self._start:self._end]
+        count = len(values)
+        chart_rect = self._chart_rect()
+        if count < 2 or chart_rect.width() <= 0 or chart_rect.height() <= 0:
+            super().paintEvent(event)
+            return
 
-        # ===== 绘制数据点 =====
-        painter.setBrush(self.line_color)
-        painter.setPen(QPen(QColor(255, 255, 255), 2))
+        polyline, low, high = self._data_polyline(values, max(2, int(chart_rect.width())))
+        min_val, max_val = self._update_range(low, high)
 
-        # 只绘制最后一个点（当前值）
-        if points:
-            last_point = points[-1]
-            painter.drawEllipse(last_point, 5, 5)
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._static_layer(chart_rect, min_val, max_val))
+        painter.setRenderHint(QPainter.Antialiasing)
 
-        # ===== 绘制X轴标签 =====
+        # ===== 绘制X轴标签（随点数变化，不进入静态层缓存） =====
         painter.setPen(self.text_color)
-        painter.setFont(QFont("Arial", 8))
+        painter.setFont(self._x_font)
 
-        num_x_labels = min(6, len(self.data_points))
+        num_x_labels = min(6, count)
         for i in range(num_x_labels):
-            idx = int(i * (len(self.data_points) - 1) / (num_x_labels - 1)) if num_x_labels > 1 else 0
-            x = chart_rect.left() + chart_rect.width() * idx / (len(self.data_points) - 1)
+            idx = int(i * (count - 1) / (num_x_labels - 1)) if num_x_labels > 1 else 0
+            x = chart_rect.left() + chart_rect.width() * idx / (count - 1)
             painter.drawText(
                 QRectF(x - 20, chart_rect.bottom() + 5, 40, 20),
                 Qt.AlignCenter,
                 str(idx + 1)
             )
 
+        # ===== 数据坐标映射到像素坐标（按序号定位，降采样不改变横向位置） =====
+        scale_x = chart_rect.width() / (count - 1)
+        scale_y = chart_rect.height() / (max_val - min_val)
+        transform = QTransform(scale_x, 0, 0, -scale_y,
+                               chart_rect.left() - self._first * scale_x,
+                               chart_rect.bottom() + min_val * scale_y)
+        points = transform.map(polyline)
+        first_point, last_point = points.first(), points.last()
+
+        # ===== 绘制填充区域 =====
+        fill = QPolygonF(points)
+        fill.append(QPointF(last_point.x(), chart_rect.bottom()))
+        fill.append(QPointF(first_point.x(), chart_rect.bottom()))
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self._gradient)
+        painter.drawPolygon(fill)
+
+        # ===== 绘制折线 =====
+        painter.setPen(self._line_pen)
+        painter.drawPolyline(points)
+
+        # ===== 绘制数据点 =====
+        # 只绘制最后一个点（当前值）
+        painter.setBrush(self.line_color)
+        painter.setPen(self._marker_pen)
+        painter.drawEllipse(last_point, 5, 5)
+
 
 class BarChart(QFrame):
     """
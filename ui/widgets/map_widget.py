@@ -7,23 +7,8 @@ from PyQt5.QtWidgets import QFrame
 from PyQt5.QtGui import QPainter, QPixmap, QColor, QPen, QBrush, QFont
 from PyQt5.QtCore import Qt
 
+from common.map_points import DEFAULT_LOCATION_POINTS, DEFAULT_SENSOR_POINTS
 
-DEFAULT_LOCATION_POINTS: Dict[str, Tuple[float, float]] = {
-    # 教学楼 A-H，基于 map.png 尺寸 1592x1219 的归一化坐标
-    "教学楼A": (0.495, 0.481),
-    "教学楼B": (0.516, 0.432),
-    "教学楼C": (0.534, 0.391),
-    "教学楼D": (0.584, 0.558),
-    "教学楼E": (0.633, 0.598),
-    "教学楼F": (0.609, 0.509),
-    "教学楼G": (0.665, 0.550),
-    "教学楼H": (0.679, 0.516),
-}
-
-DEFAULT_SENSOR_POINTS: Dict[str, Tuple[float, float, str]] = {
-    # 传感器 ID -> (x_norm, y_norm, label)
-    "JX_Teach": (0.495, 0.481, "教学楼A"),
-}
 
 STATUS_COLORS = {
     "normal": QColor(0, 255, 136),